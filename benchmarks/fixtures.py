@@ -0,0 +1,114 @@
+import base64
+import os
+import random
+import time
+from typing import Dict
+
+import numpy as np
+
+import building as bu
+from smarket.stock import STOCK_DATA
+from vision.synthetic import SyntheticScreen
+
+SAVE_STAGES = {
+    # buildings owned, the highest level of a building, upgrade and achievement flags
+    "early": (4, 1, 80, 40),
+    "late": (len(bu.BUILDING_TYPES), 12, 700, 550),
+}
+"""The sizes of the fixture saves, from a new game to a long-running one."""
+
+
+def marketString(seed: int = 0, brokers: int = 20) -> str:
+    """
+    Build the save string of a stock market with every stock.
+
+    :param seed: Seed of the stock values and modes.
+    :param brokers: The amount of brokers hired.
+    :return: The market string, as found in the bank's minigame field.
+    """
+    rng = random.Random(seed)
+    stocks = []
+    for i in range(len(STOCK_DATA)):
+        value = rng.uniform(1, 10 * (i + 1) + 40)
+        stocks.append(f"{int(value * 100)}:{rng.randrange(6)}:{rng.uniform(-1, 1):.4f}:"
+                      f"{rng.randrange(10, 690)}:{rng.choice([0, 0, 10])}:0:0")
+    return f"3:{brokers}:1:0 " + "!".join(stocks) + "! 0 0"
+
+
+def gardenString(seed: int = 0, planted: float = 0.7) -> str:
+    """
+    Build the save string of a fully grown garden.
+
+    :param seed: Seed of the plants and their ages.
+    :param planted: The fraction of plots holding a plant.
+    :return: The garden string, as found in the farm's minigame field.
+    """
+    rng = random.Random(seed)
+    now = int(time.time() * 1000)
+    unlocked = "".join(rng.choice("01") for _ in range(34))
+    plots = "".join(f"{rng.randrange(1, 35) if rng.random() < planted else 0}:{rng.randrange(0, 100)}:"
+                    for _ in range(36))
+    return f"{now + 60000}:0:{now + 600000}:0:12:340:1:2:0: {unlocked} {plots}"
+
+
+def saveString(stage: str = "late", seed: int = 0) -> bytes:
+    """
+    Build the contents of a save file, encoded like the game does.
+
+    :param stage: One of `SAVE_STAGES`.
+    :param seed: Seed of the values in the save.
+    :return: The bytes of the save file.
+    """
+    owned, maxLevel, upgrades, achievements = SAVE_STAGES[stage]
+    rng = random.Random(seed)
+    cookies = 10 ** (6 if stage == "early" else 30)
+    game = [f"{cookies:.6e}", f"{cookies * 10:.6e}", str(rng.randrange(10 ** 6))] + \
+        [str(rng.randrange(1000)) for _ in range(48)] + [f"{cookies / 1000:.6e}"] + ["0"] * 30
+    rows = []
+    for i, typ in enumerate(bu.BUILDING_TYPES):
+        amount = rng.randrange(50, 600) if i < owned else 0
+        minigame = ""
+        if i < owned and typ is bu.Farms:
+            minigame = gardenString(seed)
+        elif i < owned and typ is bu.Banks:
+            minigame = marketString(seed)
+        rows.append(",".join([str(amount), str(amount), f"{amount * 1e9:.6e}",
+                              str(rng.randrange(1, maxLevel + 1) if i < owned else 0), minigame, "0", str(amount)]))
+    sections = ["2.048", "", f"{int(time.time() * 1000)};{int(time.time() * 1000)};Fixture Bakery;0",
+                "1" * 30, ";".join(game), ";".join(rows),
+                "".join(rng.choice("01") for _ in range(upgrades * 2)),
+                "".join(rng.choice("01") for _ in range(achievements)), "", ""]
+    return base64.b64encode("|".join(sections).encode()) + b"%21END%21"
+
+
+def writeSaves(directory: str) -> Dict[str, str]:
+    """
+    Write a save file of every stage.
+
+    :param directory: Where to write the saves.
+    :return: The paths of the saves, by stage.
+    """
+    paths = {}
+    for stage in SAVE_STAGES:
+        paths[stage] = os.path.join(directory, f"{stage}.cki")
+        with open(paths[stage], "wb") as f:
+            f.write(saveString(stage))
+    return paths
+
+
+def screens() -> Dict[str, SyntheticScreen]:
+    """
+    Build the fixture frames: an idle screen, one with golden cookies, the open garden and the open market.
+
+    :return: The synthetic screens, by name.
+    """
+    idle = SyntheticScreen(seed=1)
+    cookies = SyntheticScreen(seed=2)
+    cookies.spawnGoldenCookies(4, maxOcclusion=0.3)
+    garden = SyntheticScreen(seed=3, gardenOpen=True)
+    market = SyntheticScreen(seed=4, marketOpen=True, stockCount=len(STOCK_DATA))
+    return {"idle": idle, "goldenCookies": cookies, "garden": garden, "market": market}
+
+
+def frame(screen: SyntheticScreen) -> np.ndarray:
+    return screen.render()[0]
@@ -0,0 +1,342 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import cv2
+
+import controls
+import helpers
+from benchmarks import fixtures
+from config import Config
+from garden.garden import Garden
+from production import CPSCalculator
+from savestate import SaveState, getSaveState
+from smarket.history import PriceHistory
+from smarket.ledger import TradeLedger
+from smarket.market import Market
+from vision.changes import ChangeDetector
+from vision.goldcookie import GOLD_COOKIE_COLOR_1, GOLD_COOKIE_COLOR_2, GoldenCookieDetector
+from vision.ocr import GlyphOCR
+from vision.synthetic import SyntheticScreen
+from wafer import Wafer
+
+BASELINE_PATH = "benchmarks/baseline.json"
+
+
+class Benchmark(NamedTuple):
+    """
+    A function to time, with an optional untimed setup run before every call.
+    """
+    run: Callable[[], object]
+    setup: Optional[Callable[[], None]] = None
+
+
+class Result(NamedTuple):
+    median: float
+    """Median time of a call, in seconds."""
+    p95: float
+    """95th percentile time of a call, in seconds."""
+    peakMemory: int
+    """Peak memory allocated during one call, in bytes."""
+
+    def __str__(self):
+        return f"median {self.median * 1e6:10.1f}us  p95 {self.p95 * 1e6:10.1f}us  " \
+               f"peak {self.peakMemory / 1024:8.1f}KiB"
+
+
+_factories: Dict[str, Callable[["Fixtures"], Benchmark]] = {}
+
+
+def benchmark(name: str):
+    """
+    Register a function that builds a benchmark from the fixtures.
+
+    :param name: The name of the benchmark, used in the baseline.
+    """
+    def register(factory: Callable[["Fixtures"], Benchmark]):
+        _factories[name] = factory
+        return factory
+    return register
+
+
+class Fixtures:
+    """
+    Everything the benchmarks run on, built once. Files are written to a temporary folder so the bot's own
+    save, ledger and price history are never touched.
+    """
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="wafer-bench-")
+        self.saves = fixtures.writeSaves(self.directory)
+        self.screens = fixtures.screens()
+        self.config = Config()
+        self.config.saveLocation = self.saves["late"]
+        self.input = controls.setBackend(controls.RecordingBackend())
+        self.detector = GoldenCookieDetector((GOLD_COOKIE_COLOR_1, GOLD_COOKIE_COLOR_2),
+                                             tolerance=self.config.goldenCookieTolerance)
+        self.lateSave = getSaveState(self.saves["late"])
+        self.lateSave.refresh()
+
+    def show(self, screen: str) -> None:
+        """Capture the given fixture screen from now on."""
+        helpers.useFrameSource(self.screens[screen])
+        helpers.hints.forget()
+
+    def market(self) -> Market:
+        self.show("market")
+        save = self.lateSave
+        return Market(self.config, save.marketData, save.buildings,
+                      ledger=TradeLedger(os.path.join(self.directory, "ledger.sqlite3"),
+                                         os.path.join(self.directory, "ledger.toml")),
+                      history=PriceHistory(os.path.join(self.directory, "history")))
+
+
+@benchmark("findGoldenCookies")
+def _findGoldenCookies(f: Fixtures) -> Benchmark:
+    f.show("goldenCookies")
+    wafer = SimpleNamespace(goldenCookieDetector=f.detector, logger=logging.getLogger("wafer"))
+    return Benchmark(lambda: Wafer.findGoldenCookies(wafer), setup=helpers.invalidateFrames)
+
+
+@benchmark("goldenCookieDetector.detect")
+def _detect(f: Fixtures) -> Benchmark:
+    frame = fixtures.frame(f.screens["goldenCookies"])
+    return Benchmark(lambda: f.detector.detect(frame))
+
+
+@benchmark("goldenCookieDetector.detect (unchanged)")
+def _detectUnchanged(f: Fixtures) -> Benchmark:
+    # the scan of a screen that did not change: compare it with the previous frame and search nothing
+    frame = fixtures.frame(f.screens["goldenCookies"])
+    changes = ChangeDetector()
+    changes.update(frame.copy())
+
+    def run():
+        serial = changes.update(frame)
+        return f.detector.detect(frame, changes.regions(since=serial - 1))
+    return Benchmark(run)
+
+
+@benchmark("helpers.locate")
+def _locate(f: Fixtures) -> Benchmark:
+    f.show("idle")
+    return Benchmark(lambda: helpers.locate("mainCookie", useHint=False), setup=helpers.invalidateFrames)
+
+
+@benchmark("helpers.locate (hinted)")
+def _locateHinted(f: Fixtures) -> Benchmark:
+    f.show("idle")
+    # search around the hint every time, even though the screen does not change
+    helpers.hints.revalidateInterval = 0
+    helpers.locate("mainCookie")
+    return Benchmark(lambda: helpers.locate("mainCookie"), setup=helpers.invalidateFrames)
+
+
+@benchmark("helpers.locate (unchanged)")
+def _locateUnchanged(f: Fixtures) -> Benchmark:
+    f.show("idle")
+    helpers.hints.revalidateInterval = f.config.fullScanInterval
+    helpers.locate("mainCookie")
+    helpers.invalidateFrames()
+    helpers.locate("mainCookie")
+    return Benchmark(lambda: helpers.locate("mainCookie"), setup=helpers.invalidateFrames)
+
+
+@benchmark("GlyphOCR.read")
+def _glyphRead(f: Fixtures) -> Benchmark:
+    reader = GlyphOCR(path=None)
+    strips = {}
+    for text in ("0123456789", "1.234 million", "5,678", "9.87 quintillion", "42.5 million"):
+        screen = SyntheticScreen(cpsText=text)
+        frame = fixtures.frame(screen)
+        label = screen.truth().templates["cps"]
+        strip = frame[label.top:label.top + label.height + 6, label.left + label.width:label.left + 400]
+        strips[text] = cv2.cvtColor(strip, cv2.COLOR_BGRA2GRAY) >= 200
+    for text, strip in strips.items():
+        reader.learn(strip, text)
+    return Benchmark(lambda: reader.read(strips["42.5 million"]))
+
+
+def _loadSave(path: str) -> Benchmark:
+    wafer = SimpleNamespace()
+
+    def setup():
+        # a new state for every call, so the file is read and decoded each time
+        wafer.save = SaveState(path)
+    return Benchmark(lambda: Wafer.loadSave(wafer), setup=setup)
+
+
+@benchmark("Wafer.loadSave (early)")
+def _loadSaveEarly(f: Fixtures) -> Benchmark:
+    return _loadSave(f.saves["early"])
+
+
+@benchmark("Wafer.loadSave (late)")
+def _loadSaveLate(f: Fixtures) -> Benchmark:
+    return _loadSave(f.saves["late"])
+
+
+@benchmark("Wafer.loadSave (unchanged)")
+def _loadSaveUnchanged(f: Fixtures) -> Benchmark:
+    wafer = SimpleNamespace(save=f.lateSave)
+    return Benchmark(lambda: Wafer.loadSave(wafer))
+
+
+@benchmark("Garden.__init__")
+def _gardenInit(f: Fixtures) -> Benchmark:
+    data, level = f.lateSave.gardenData, f.lateSave.buildings["farm"].level
+    return Benchmark(lambda: Garden(data, level))
+
+
+@benchmark("Garden.update")
+def _gardenUpdate(f: Fixtures) -> Benchmark:
+    data, level = f.lateSave.gardenData, f.lateSave.buildings["farm"].level
+    garden = Garden(data, level)
+    return Benchmark(lambda: garden.update(data, level))
+
+
+@benchmark("CPSCalculator.update")
+def _cpsUpdate(f: Fixtures) -> Benchmark:
+    buildings = f.lateSave.buildings
+    calculator = CPSCalculator(minInterval=0)
+    calculator.update(buildings, 0)
+    timestamp = [0.0]
+
+    def run():
+        timestamp[0] += 30
+        return calculator.update(buildings, timestamp[0])
+    return Benchmark(run)
+
+
+@benchmark("Market.loadStocks")
+def _loadStocks(f: Fixtures) -> Benchmark:
+    market = f.market()
+    stockSaves = f.lateSave.marketData.split(" ")[1].split("!")
+    return Benchmark(lambda: market.loadStocks(stockSaves, f.lateSave.buildings))
+
+
+@benchmark("Market.getAmountCanPurchase")
+def _amountCanPurchase(f: Fixtures) -> Benchmark:
+    market = f.market()
+    economics = market.getEconomics()
+    return Benchmark(lambda: [market.getAmountCanPurchase(stock, economics) for stock in market.stocks])
+
+
+@benchmark("Market.evaluateStocks")
+def _evaluateStocks(f: Fixtures) -> Benchmark:
+    market = f.market()
+    stockSaves = f.lateSave.marketData.split(" ")[1].split("!")
+    # trade on every stock so the whole path runs, from sizing to clicking and recording
+    market.policy.buyLimit, market.policy.sellLimit = 1000.0, -1000.0
+
+    def setup():
+        market.stocks = market.loadStocks(stockSaves, f.lateSave.buildings)
+        f.input.clear()
+    return Benchmark(market.evaluateStocks, setup=setup)
+
+
+def measure(bench: Benchmark, repeat: int, minTime: float) -> Result:
+    """
+    Time a benchmark, then measure its memory in a separate call since tracing slows everything down.
+
+    :param bench: The benchmark.
+    :param repeat: The least amount of timed calls.
+    :param minTime: Keep calling until this many seconds were spent.
+    :return: The timings and memory of the benchmark.
+    """
+    if bench.setup:
+        bench.setup()
+    bench.run()  # warm up caches
+
+    times: List[float] = []
+    started = time.perf_counter()
+    while len(times) < repeat or time.perf_counter() - started < minTime:
+        if bench.setup:
+            bench.setup()
+        start = time.perf_counter()
+        bench.run()
+        times.append(time.perf_counter() - start)
+
+    if bench.setup:
+        bench.setup()
+    tracemalloc.start()
+    bench.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times.sort()
+    return Result(statistics.median(times), times[min(len(times) - 1, int(len(times) * 0.95))], peak)
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """
+    Find the benchmarks that got slower or use more memory than their baseline allows.
+
+    :param results: The new results.
+    :param baseline: The stored results.
+    :param threshold: The allowed relative increase, such as 0.25 for 25%.
+    :return: A description of every regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = Result(**baseline[name])
+        if result.median > old.median * (1 + threshold):
+            regressions.append(f"{name}: median {old.median * 1e6:.1f}us -> {result.median * 1e6:.1f}us")
+        if result.peakMemory > old.peakMemory * (1 + threshold) + 1024:
+            regressions.append(f"{name}: peak memory {old.peakMemory / 1024:.1f}KiB -> "
+                               f"{result.peakMemory / 1024:.1f}KiB")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time the bot's hot paths and compare them with a baseline.")
+    parser.add_argument("filter", nargs="*", help="only run benchmarks whose name contains one of these")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown allowed before a benchmark fails (default 0.25)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend timing each benchmark")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    f = Fixtures()
+    results: Dict[str, Result] = {}
+    for name, factory in _factories.items():
+        if args.filter and not any(part in name for part in args.filter):
+            continue
+        results[name] = measure(factory(f), args.repeat, args.min_time)
+        print(f"{name:32} {results[name]}")
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as file:
+                baseline = json.load(file)
+        baseline.update({name: result._asdict() for name, result in results.items()})
+        with open(args.baseline, "w") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}.")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to create one.")
+        return 0
+    with open(args.baseline, "r") as file:
+        regressions = compare(results, json.load(file), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
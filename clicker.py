@@ -0,0 +1,170 @@
+import bisect
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Iterator, Optional, Tuple
+
+import controls
+import metrics
+
+_pausedTime = metrics.histogram("wafer_clicker_paused_seconds",
+                                "How long the main cookie clicker stays paused for other tasks.")
+
+
+class MainCookieClicker:
+    """
+    Clicks the main cookie at a steady rate from its own thread.
+
+    Clicks are paced against a schedule rather than slept between, so the rate holds even when a click is slow,
+    and pausing blocks on an event instead of spinning. Every click sent is counted, which can be compared with
+    the save file's click counter to find clicks the game never registered.
+    """
+
+    def __init__(self, targetCPS: float = 50.0, sampleInterval: float = 1.0, sampleHistory: int = 600):
+        """
+        Initialize the clicker.
+
+        :param targetCPS: The clicks per second to aim for.
+        :param sampleInterval: Seconds between samples of the click counter, kept to match it against saves.
+        :param sampleHistory: How many samples are kept.
+        """
+        self.targetCPS = targetCPS
+        self.sampleInterval = sampleInterval
+        self.logger = logging.getLogger("wafer")
+        self.clicks = 0
+        """The amount of clicks sent since the clicker started."""
+        self.startedAt: Optional[float] = None
+        """When the clicker started, as a timestamp."""
+
+        self._resume = threading.Event()
+        self._resume.set()
+        self._stopped = threading.Event()
+        self._pauseLock = threading.Lock()
+        self._pauses = 0
+        self._samples: Deque[Tuple[float, int]] = deque(maxlen=sampleHistory)
+        self._saveBaseline: Optional[Tuple[float, int]] = None
+
+    def pause(self) -> None:
+        """
+        Stop clicking until `resume` is called as many times as `pause` was. Waits for a click being sent to
+        finish, so nothing is clicked once this returns.
+        """
+        with self._pauseLock:
+            self._pauses += 1
+            self._resume.clear()
+
+    def resume(self) -> None:
+        """
+        Undo one call to `pause`, clicking again once none are left.
+        """
+        with self._pauseLock:
+            self._pauses = max(0, self._pauses - 1)
+            if self._pauses == 0:
+                self._resume.set()
+
+    @contextlib.contextmanager
+    def paused(self) -> Iterator[None]:
+        """
+        Pause the clicker for the duration of a `with` block.
+        """
+        self.pause()
+        try:
+            with _pausedTime.time():
+                yield
+        finally:
+            self.resume()
+
+    @property
+    def isPaused(self) -> bool:
+        return not self._resume.is_set()
+
+    def stop(self) -> None:
+        """
+        Make `run` return, even if the clicker is paused.
+        """
+        self._stopped.set()
+        self._resume.set()
+
+    def run(self, point: controls.Point) -> None:
+        """
+        Click a point at the target rate until stopped. Failsafe exceptions are passed on to the caller.
+
+        :param point: The coordinates of the main cookie.
+        """
+        interval = 1 / self.targetCPS
+        self.startedAt = time.time()
+        self._sample()
+        nextClick = nextSample = time.monotonic()
+        while not self._stopped.is_set():
+            if not self._resume.is_set():
+                self._resume.wait()
+                # don't make up for the time spent paused with a burst of clicks
+                nextClick = time.monotonic()
+                continue
+            now = time.monotonic()
+            if now < nextClick:
+                self._stopped.wait(nextClick - now)
+                continue
+            # checked again under the lock, so a click is never sent after `pause` returns
+            with self._pauseLock:
+                if not self._resume.is_set():
+                    continue
+                # the backend's pause after each call would cap the rate, the schedule does the waiting instead
+                controls.click(point, pause=False)
+                self.clicks += 1
+            nextClick = max(nextClick + interval, now - interval)
+            if now >= nextSample:
+                self._sample()
+                nextSample = now + self.sampleInterval
+        self._sample()
+
+    def _sample(self) -> None:
+        self._samples.append((time.time(), self.clicks))
+
+    def clicksAt(self, timestamp: float) -> int:
+        """
+        Estimate how many clicks had been sent at a point in time, from the counter's samples.
+
+        :param timestamp: The time, as a timestamp.
+        :return: The amount of clicks sent by then.
+        """
+        samples = list(self._samples)
+        if not samples or timestamp >= time.time():
+            return self.clicks
+        index = bisect.bisect_right(samples, (timestamp, float("inf")))
+        if index == 0:
+            return samples[0][1]
+        if index == len(samples):
+            return samples[-1][1]
+        (t0, c0), (t1, c1) = samples[index - 1], samples[index]
+        return int(c0 + (c1 - c0) * (timestamp - t0) / (t1 - t0)) if t1 > t0 else c1
+
+    @property
+    def rate(self) -> float:
+        """The clicks per second sent over the last samples."""
+        samples = list(self._samples)
+        if len(samples) < 2 or samples[-1][0] <= samples[0][0]:
+            return 0.0
+        return (samples[-1][1] - samples[0][1]) / (samples[-1][0] - samples[0][0])
+
+    def checkSave(self, saveClicks: int, saveTime: float) -> Optional[int]:
+        """
+        Compare the clicks sent with the clicks the game recorded in its save.
+
+        The first save seen is used as the baseline, since the save also counts clicks from before the bot ran.
+
+        :param saveClicks: The click counter of the save.
+        :param saveTime: When the save was written, as a timestamp.
+        :return: How many clicks sent since the baseline the game did not register, or None for the baseline.
+        """
+        sent = self.clicksAt(saveTime)
+        if self._saveBaseline is None:
+            self._saveBaseline = (saveClicks, sent)
+            return None
+        baseClicks, baseSent = self._saveBaseline
+        missed = (sent - baseSent) - (saveClicks - baseClicks)
+        self.logger.info(f"Main cookie: {sent - baseSent} clicks sent and {saveClicks - baseClicks} registered "
+                         f"since the first save ({missed} missed), {self.rate:.1f} clicks per second.")
+        return missed
@@ -22,6 +22,18 @@ class Config:
         self.buyLimit = -90.0
         self.sellLimit = 40.0
 
+        self.goldenCookieTolerance = 8
+        self.goldenCookieScanInterval = 0.1
+        self.frameCacheTTL = 0.05
+        self.fullScanInterval = 2.0
+        self.saveWatchDebounce = 0.5
+        self.saveWatchPollInterval = 1.0
+        self.mainClickerCPS = 50.0
+        self.inputBackend = "pyautogui"
+        self.metricsEnabled = False
+        self.metricsPort = 9464
+        self.metricsLogInterval = 300.0
+
         if ALWAYS_DELETE:
             self.save()
         else:
@@ -46,6 +58,19 @@ class Config:
                     self.gardenEnabled = c["gardenEnabled"]
                     self.buyLimit = c["buyLimit"]
                     self.sellLimit = c["sellLimit"]
+                    # options added after the first release fall back to their defaults
+                    self.goldenCookieTolerance = c.get("goldenCookieTolerance", self.goldenCookieTolerance)
+                    self.goldenCookieScanInterval = c.get("goldenCookieScanInterval",
+                                                          self.goldenCookieScanInterval)
+                    self.frameCacheTTL = c.get("frameCacheTTL", self.frameCacheTTL)
+                    self.fullScanInterval = c.get("fullScanInterval", self.fullScanInterval)
+                    self.saveWatchDebounce = c.get("saveWatchDebounce", self.saveWatchDebounce)
+                    self.saveWatchPollInterval = c.get("saveWatchPollInterval", self.saveWatchPollInterval)
+                    self.mainClickerCPS = c.get("mainClickerCPS", self.mainClickerCPS)
+                    self.inputBackend = c.get("inputBackend", self.inputBackend)
+                    self.metricsEnabled = c.get("metricsEnabled", self.metricsEnabled)
+                    self.metricsPort = c.get("metricsPort", self.metricsPort)
+                    self.metricsLogInterval = c.get("metricsLogInterval", self.metricsLogInterval)
 
                 except (TypeError, toml.TomlDecodeError, KeyError):
                     self.logger.info("Error: Could not decode config file. Re-generating.")
@@ -63,7 +88,18 @@ class Config:
                 "stockMarketEnabled": self.stockMarketEnabled,
                 "gardenEnabled": self.gardenEnabled,
                 "buyLimit": self.buyLimit,
-                "sellLimit": self.sellLimit
+                "sellLimit": self.sellLimit,
+                "goldenCookieTolerance": self.goldenCookieTolerance,
+                "goldenCookieScanInterval": self.goldenCookieScanInterval,
+                "frameCacheTTL": self.frameCacheTTL,
+                "fullScanInterval": self.fullScanInterval,
+                "saveWatchDebounce": self.saveWatchDebounce,
+                "saveWatchPollInterval": self.saveWatchPollInterval,
+                "mainClickerCPS": self.mainClickerCPS,
+                "inputBackend": self.inputBackend,
+                "metricsEnabled": self.metricsEnabled,
+                "metricsPort": self.metricsPort,
+                "metricsLogInterval": self.metricsLogInterval
             })
             data = _insert(data, "mainAutoClick", "# Toggles whether the main cookie is automatically clicked.\n")
             data = _insert(data, "goldenCookieClick", "\n# Toggles whether golden cookies are automatically clicked.\n")
@@ -77,6 +113,35 @@ class Config:
             # Used with the stock minigame. The threshold at which the bot will sell a specific stock, relative
             # to its resting price.
             """))
+            data = _insert(data, "goldenCookieTolerance", textwrap.dedent("""
+            # How far (per color channel, 0-255) a pixel may be from the golden cookie colors and still count.
+            """))
+            data = _insert(data, "goldenCookieScanInterval", "\n# Seconds between golden cookie scans.\n")
+            data = _insert(data, "frameCacheTTL", textwrap.dedent("""
+            # Seconds a screen capture is reused for, so that everything done in the same tick reads the same frame.
+            """))
+            data = _insert(data, "fullScanInterval", textwrap.dedent("""
+            # Seconds between searches of the whole screen. In between, golden cookies are only searched for and
+            # known buttons only checked again where the screen changed.
+            """))
+            data = _insert(data, "saveWatchDebounce", textwrap.dedent("""
+            # Seconds the save file must stay unchanged after a write before it is read.
+            """))
+            data = _insert(data, "saveWatchPollInterval", textwrap.dedent("""
+            # Seconds between checks of the save file on systems without inotify.
+            """))
+            data = _insert(data, "mainClickerCPS", "\n# Clicks per second the main cookie auto clicker aims for.\n")
+            data = _insert(data, "inputBackend", textwrap.dedent("""
+            # How mouse input is sent: "pyautogui" works everywhere, "xtest" is faster on Linux with X11 and
+            # "recording" only records input, for testing.
+            """))
+            data = _insert(data, "metricsEnabled", textwrap.dedent("""
+            # Records timings of captures, detection, OCR, save parsing, lock waits, clicks and tasks.
+            """))
+            data = _insert(data, "metricsPort", textwrap.dedent("""
+            # Port of the local Prometheus endpoint serving the metrics at /metrics. 0 disables it.
+            """))
+            data = _insert(data, "metricsLogInterval", "\n# Seconds between metrics summaries in the log.\n")
             f.write(data)
 
 
@@ -0,0 +1,382 @@
+import abc
+import ctypes
+import ctypes.util
+import logging
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional
+
+import metrics
+from config import Config
+
+_clicksSent = metrics.counter("wafer_clicks_total", "Clicks sent to the game.")
+_dispatchTime = {action: metrics.histogram("wafer_input_dispatch_seconds", "Time spent sending input to the game.",
+                                           action=action) for action in ("click", "move", "scroll")}
+
+
+class Point(NamedTuple):
+    """
+    Coordinates on the screen. Interchangeable with `pyautogui.Point`.
+    """
+    x: float
+    y: float
+
+
+class FailSafeException(Exception):
+    """
+    Raised by every backend when the mouse is moved to a corner of the screen, so the bot can be stopped by hand.
+    """
+
+
+class InputBackend(abc.ABC):
+    """
+    Sends mouse input to the game. Subclasses implement `clickMany`, `moveTo` and `scroll`.
+
+    Every call ends with a short pause, like pyautogui does, to give the game time to react. Pass `pause=False`
+    when the caller does its own pacing.
+    """
+
+    def __init__(self, pause: float = 0.1):
+        """
+        :param pause: Seconds waited after each call.
+        """
+        self.pause = pause
+        self.logger = logging.getLogger("wafer")
+
+    def click(self, point: Optional[Point] = None, clicks: int = 1, interval: float = 0.0,
+              pause: bool = True) -> None:
+        """
+        Click the left mouse button.
+
+        :param point: Where to click. Clicks where the mouse is if None.
+        :param clicks: The amount of clicks.
+        :param interval: Seconds between clicks.
+        :param pause: Whether to wait `pause` seconds afterwards.
+        """
+        self.clickMany([point] * clicks, interval, pause)
+
+    @abc.abstractmethod
+    def clickMany(self, points: Iterable[Optional[Point]], interval: float = 0.0, pause: bool = True) -> None:
+        """
+        Click several points in one batch.
+
+        :param points: Where to click, in order. None clicks where the mouse is.
+        :param interval: Seconds between clicks.
+        :param pause: Whether to wait `pause` seconds afterwards.
+        """
+
+    @abc.abstractmethod
+    def moveTo(self, point: Point, pause: bool = True) -> None:
+        """
+        Move the mouse.
+
+        :param point: Where to move to.
+        :param pause: Whether to wait `pause` seconds afterwards.
+        """
+
+    @abc.abstractmethod
+    def scroll(self, amount: int, pause: bool = True) -> None:
+        """
+        Scroll the mouse wheel where the mouse is.
+
+        :param amount: How far to scroll. Positive scrolls up, negative scrolls down.
+        :param pause: Whether to wait `pause` seconds afterwards.
+        """
+
+    def close(self) -> None:
+        """
+        Release anything the backend holds.
+        """
+
+    def _pause(self, pause: bool) -> None:
+        if pause and self.pause > 0:
+            time.sleep(self.pause)
+
+
+class PyAutoGUIBackend(InputBackend):
+    """
+    Sends input with pyautogui. Works on every platform, but each call has noticeable overhead.
+    """
+
+    def __init__(self, pause: float = 0.1):
+        super().__init__(pause)
+        # imported here so the rest of the bot can be imported without a display
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def clickMany(self, points: Iterable[Optional[Point]], interval: float = 0.0, pause: bool = True) -> None:
+        try:
+            for i, point in enumerate(points):
+                if i and interval:
+                    time.sleep(interval)
+                if point is None:
+                    self._pyautogui.click(_pause=False)
+                else:
+                    self._pyautogui.click(point.x, point.y, _pause=False)
+        except self._pyautogui.FailSafeException as e:
+            raise FailSafeException(str(e)) from e
+        self._pause(pause)
+
+    def moveTo(self, point: Point, pause: bool = True) -> None:
+        try:
+            self._pyautogui.moveTo(point.x, point.y, _pause=False)
+        except self._pyautogui.FailSafeException as e:
+            raise FailSafeException(str(e)) from e
+        self._pause(pause)
+
+    def scroll(self, amount: int, pause: bool = True) -> None:
+        try:
+            self._pyautogui.scroll(amount, _pause=False)
+        except self._pyautogui.FailSafeException as e:
+            raise FailSafeException(str(e)) from e
+        self._pause(pause)
+
+
+class XTestBackend(InputBackend):
+    """
+    Sends input straight to an X11 server with the XTest extension.
+
+    Events of a batch are queued and flushed to the server together, which makes clicks far cheaper than with
+    pyautogui. Moving the mouse to a corner of the screen stops the bot, as with pyautogui.
+    """
+
+    _WHEEL_UP = 4
+    _WHEEL_DOWN = 5
+
+    def __init__(self, pause: float = 0.1, displayName: Optional[str] = None):
+        """
+        :param pause: Seconds waited after each call.
+        :param displayName: The X display to use. Defaults to $DISPLAY.
+        """
+        super().__init__(pause)
+        x11Path, xtstPath = ctypes.util.find_library("X11"), ctypes.util.find_library("Xtst")
+        if not x11Path or not xtstPath:
+            raise OSError("The X11 and XTest libraries are required for the xtest input backend.")
+        self._x11 = ctypes.CDLL(x11Path)
+        self._xtst = ctypes.CDLL(xtstPath)
+        self._x11.XOpenDisplay.restype = ctypes.c_void_p
+        self._x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        self._x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self._x11.XFlush.argtypes = [ctypes.c_void_p]
+        self._x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self._x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        self._x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self._x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self._x11.XQueryPointer.argtypes = [ctypes.c_void_p, ctypes.c_ulong] + \
+            [ctypes.POINTER(ctypes.c_ulong)] * 2 + [ctypes.POINTER(ctypes.c_int)] * 4 + \
+            [ctypes.POINTER(ctypes.c_uint)]
+        self._xtst.XTestFakeMotionEvent.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                                    ctypes.c_ulong]
+        self._xtst.XTestFakeButtonEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+
+        self._display = self._x11.XOpenDisplay(displayName.encode() if displayName else None)
+        if not self._display:
+            raise OSError("Could not open the X display.")
+        screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XDefaultRootWindow(self._display)
+        self._width = self._x11.XDisplayWidth(self._display, screen)
+        self._height = self._x11.XDisplayHeight(self._display, screen)
+        # Xlib connections are not thread safe, and the main cookie clicker has its own thread
+        self._lock = threading.Lock()
+
+    def _position(self) -> Point:
+        rootRet, childRet = ctypes.c_ulong(), ctypes.c_ulong()
+        rootX, rootY, winX, winY = (ctypes.c_int() for _ in range(4))
+        mask = ctypes.c_uint()
+        self._x11.XQueryPointer(self._display, self._root, ctypes.byref(rootRet), ctypes.byref(childRet),
+                                ctypes.byref(rootX), ctypes.byref(rootY), ctypes.byref(winX), ctypes.byref(winY),
+                                ctypes.byref(mask))
+        return Point(rootX.value, rootY.value)
+
+    def _checkFailSafe(self) -> None:
+        x, y = self._position()
+        if x in (0, self._width - 1) and y in (0, self._height - 1):
+            raise FailSafeException("The mouse was moved to a corner of the screen.")
+
+    def _move(self, point: Point) -> None:
+        self._xtst.XTestFakeMotionEvent(self._display, -1, int(point.x), int(point.y), 0)
+
+    def _button(self, button: int) -> None:
+        self._xtst.XTestFakeButtonEvent(self._display, button, 1, 0)
+        self._xtst.XTestFakeButtonEvent(self._display, button, 0, 0)
+
+    def clickMany(self, points: Iterable[Optional[Point]], interval: float = 0.0, pause: bool = True) -> None:
+        with self._lock:
+            self._checkFailSafe()
+            for i, point in enumerate(points):
+                if i and interval:
+                    self._x11.XFlush(self._display)
+                    time.sleep(interval)
+                if point is not None:
+                    self._move(point)
+                self._button(1)
+            self._x11.XFlush(self._display)
+        self._pause(pause)
+
+    def moveTo(self, point: Point, pause: bool = True) -> None:
+        with self._lock:
+            self._checkFailSafe()
+            self._move(point)
+            self._x11.XFlush(self._display)
+        self._pause(pause)
+
+    def scroll(self, amount: int, pause: bool = True) -> None:
+        with self._lock:
+            self._checkFailSafe()
+            for _ in range(abs(int(amount))):
+                self._button(self._WHEEL_UP if amount > 0 else self._WHEEL_DOWN)
+            self._x11.XFlush(self._display)
+        self._pause(pause)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._display:
+                self._x11.XCloseDisplay(self._display)
+                self._display = None
+
+
+class Action(NamedTuple):
+    """
+    An input recorded by `RecordingBackend`.
+    """
+    time: float
+    """When the input was sent, from `time.monotonic`."""
+    kind: str
+    """"click", "move" or "scroll"."""
+    x: float
+    y: float
+    amount: int = 0
+    """How far was scrolled, for scroll actions."""
+
+
+class RecordingBackend(InputBackend):
+    """
+    Records input in memory instead of sending it, for tests and benchmarks without a display.
+    """
+
+    def __init__(self, pause: float = 0.0, screenSize: Optional[Point] = None):
+        """
+        :param pause: Seconds waited after each call. Nothing is waited by default.
+        :param screenSize: If given, moving to a corner of this screen raises `FailSafeException`.
+        """
+        super().__init__(pause)
+        self.screenSize = screenSize
+        self.position = Point(0, 0)
+        """Where the mouse would be."""
+        self.actions: List[Action] = []
+        """Every input sent, oldest first."""
+        self._lock = threading.Lock()
+
+    def _record(self, kind: str, point: Optional[Point], amount: int = 0) -> None:
+        if point is not None:
+            self.position = Point(point.x, point.y)
+            if self.screenSize and self.position.x in (0, self.screenSize.x - 1) \
+                    and self.position.y in (0, self.screenSize.y - 1):
+                raise FailSafeException("The mouse was moved to a corner of the screen.")
+        self.actions.append(Action(time.monotonic(), kind, self.position.x, self.position.y, amount))
+
+    def clickMany(self, points: Iterable[Optional[Point]], interval: float = 0.0, pause: bool = True) -> None:
+        with self._lock:
+            for i, point in enumerate(points):
+                if i and interval:
+                    time.sleep(interval)
+                self._record("click", point)
+        self._pause(pause)
+
+    def moveTo(self, point: Point, pause: bool = True) -> None:
+        with self._lock:
+            self._record("move", point)
+        self._pause(pause)
+
+    def scroll(self, amount: int, pause: bool = True) -> None:
+        with self._lock:
+            self._record("scroll", None, amount)
+        self._pause(pause)
+
+    @property
+    def clicks(self) -> List[Action]:
+        """The recorded clicks."""
+        return [action for action in self.actions if action.kind == "click"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.actions.clear()
+
+
+BACKENDS = {
+    "pyautogui": PyAutoGUIBackend,
+    "xtest": XTestBackend,
+    "recording": RecordingBackend,
+}
+"""The input backends that can be picked with the `inputBackend` config option."""
+
+_backend: Optional[InputBackend] = None
+
+
+def configureInput(config: Config) -> InputBackend:
+    """
+    Create the input backend chosen in the config, falling back to pyautogui if it cannot be used.
+
+    :param config: The configuration.
+    :return: The backend now in use.
+    """
+    name = config.inputBackend.lower()
+    if name not in BACKENDS:
+        logging.getLogger("wafer").error(f"Unknown input backend {config.inputBackend}, using pyautogui.")
+        name = "pyautogui"
+    try:
+        return setBackend(BACKENDS[name]())
+    except OSError as e:
+        logging.getLogger("wafer").error(f"Could not use the {name} input backend ({e}), using pyautogui.")
+        return setBackend(PyAutoGUIBackend())
+
+
+def setBackend(backend: InputBackend) -> InputBackend:
+    """
+    Replace the input backend, closing the previous one.
+
+    :param backend: The new backend.
+    :return: The new backend.
+    """
+    global _backend
+    if _backend is not None and _backend is not backend:
+        _backend.close()
+    _backend = backend
+    return backend
+
+
+def getBackend() -> InputBackend:
+    """
+    Get the input backend in use, creating a pyautogui one if none was configured.
+    """
+    if _backend is None:
+        setBackend(PyAutoGUIBackend())
+    return _backend
+
+
+def click(point: Optional[Point] = None, clicks: int = 1, interval: float = 0.0, pause: bool = True) -> None:
+    """Click with the current backend. See `InputBackend.click`."""
+    with _dispatchTime["click"].time():
+        getBackend().click(point, clicks, interval, pause)
+    _clicksSent.inc(clicks)
+
+
+def clickMany(points: Iterable[Optional[Point]], interval: float = 0.0, pause: bool = True) -> None:
+    """Click several points with the current backend. See `InputBackend.clickMany`."""
+    points = list(points)
+    with _dispatchTime["click"].time():
+        getBackend().clickMany(points, interval, pause)
+    _clicksSent.inc(len(points))
+
+
+def moveTo(point: Point, pause: bool = True) -> None:
+    """Move the mouse with the current backend. See `InputBackend.moveTo`."""
+    with _dispatchTime["move"].time():
+        getBackend().moveTo(point, pause)
+
+
+def scroll(amount: int, pause: bool = True) -> None:
+    """Scroll with the current backend. See `InputBackend.scroll`."""
+    with _dispatchTime["scroll"].time():
+        getBackend().scroll(amount, pause)
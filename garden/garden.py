@@ -1,12 +1,14 @@
 import csv
+import functools
 import logging
 import re
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Tuple
 
-import pyautogui
+import controls
 
 import helpers
+from .mutations import RECIPES, parents
 from .plant import Plant
 from .plantData import PlantData
 
@@ -26,11 +28,68 @@ _PLOT_LIMITS = [
     [0, 1, 6, 6],
     [0, 0, 6, 6],
 ]
+_GRID_SIZE = 6
+_PLOT_SPACING = 60
+
+
+def plotLimits(farmLevel: int) -> List[int]:
+    """
+    Get the part of the 6x6 grid that is usable at a farm level.
+
+    :param farmLevel: The level of the farm.
+    :return: The limits as x1, y1, x2, y2.
+    """
+    return _PLOT_LIMITS[max(1, min(farmLevel, len(_PLOT_LIMITS))) - 1]
+
+
+def plotSize(farmLevel: int) -> Tuple[int, int]:
+    """
+    Get the size of the garden at a farm level.
+
+    :param farmLevel: The level of the farm.
+    :return: The width and height, in plots.
+    """
+    x1, y1, x2, y2 = plotLimits(farmLevel)
+    return x2 - x1, y2 - y1
+
+
+@functools.lru_cache(maxsize=None)
+def loadPlantCatalog() -> Tuple[PlantData, ...]:
+    """
+    Load information for all plants from the .csv file. The file is only parsed once per run.
+
+    :return: Every plant, ordered by ID.
+    """
+    plants = []
+    with open(_CSV_FILENAME, 'r') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            plants.append(PlantData(
+                name=row["Name"],
+                id=int(row["ID"]),
+                cost=int(row["Cost"]),
+                ageTick=float(row["AgeTick"]),
+                ageTickR=float(row["AgeTickR"]),
+                mature=int(row["Mature"]),
+                children=[int(plantID) for plantID in row["Children"].split('|') if row["Children"]],
+                immortal=row["Immortal"] == "yes",
+                fungus=row["Fungus"] == "yes",
+                weed=row["Weed"] == "yes",
+                plantable=row["Plantable"] == "yes"
+            ))
+    for recipe in RECIPES:
+        for parent in parents(recipe):
+            if recipe.result not in plants[parent].mutations:
+                plants[parent].mutations.append(recipe.result)
+    return tuple(plants)
 
 
 class Garden:
     """
     Class representing the Garden minigame unlocked when you use a sugar lump to level up the Farm.
+
+    One garden lives for the whole run and is updated in place from each new save, so the plant catalog and the
+    on-screen position of the grid are kept between ticks.
     """
     nextStep: datetime
     soil: int
@@ -39,8 +98,8 @@ class Garden:
     matureHarvests: int
     totalHarvests: int
     timesSacrificed: int
-    unlockedPlants: list[PlantData]
-    plots: list[Plant]
+    unlockedPlants: List[PlantData]
+    plots: List[Plant]
     farmLevel: int
 
     # Garden information starts before the first colon.
@@ -53,7 +112,25 @@ class Garden:
         :type dataString: str
         :type farmLevel: int
         """
+        self.logger = logging.getLogger("wafer")
+        self.plantCatalog = loadPlantCatalog()
+        self.farmLevel = 0
+        self.farmPlotCoords: Optional[controls.Point] = None
+        self._grid: List[Optional[Plant]] = [None] * (_GRID_SIZE * _GRID_SIZE)
+        self.update(dataString, farmLevel)
+
+    def update(self, dataString: str, farmLevel: int) -> None:
+        """
+        Update the garden from new save data, reusing the plot objects that already exist.
+
+        :param dataString: The save information for the garden.
+        :param farmLevel: The level of the farm.
+        :rtype: None
+        """
         data = re.split(r'[\s:]', dataString)
+        if farmLevel != self.farmLevel:
+            # the grid grows with the farm level, which moves the top-left plot on screen
+            self.farmPlotCoords = None
         self.farmLevel = farmLevel
         self.nextStep = datetime.fromtimestamp(float(data[0]) / 1000)
         self.soil = int(data[1])
@@ -67,65 +144,56 @@ class Garden:
         self.loadAllPlantData(data[10])
         self.loadAllPlotData(':'.join(data[11:len(data)]))
 
-        self.farmPlotCoords = None
-        self.logger = logging.getLogger("wafer")
+    def calibrate(self) -> bool:
+        """
+        Locate the top-left plot of the grid on screen. The garden must be open.
 
-    def getPlotCoords(self, plant: Plant) -> Optional[pyautogui.Point]:
+        :return: True if the grid was found.
+        :rtype: bool
+        """
+        #  This is necessary since hovered tooltips can block the identification.
+        controls.moveTo(controls.Point(50, 50))
+        helpers.invalidateFrames()
+        for i in range(3):
+            farmPlotCoords = helpers.locate("gardenPlot", grayscale=False, confidence=0.9)
+
+            if farmPlotCoords:
+                self.logger.info(f"Located top-left farm plot at ({farmPlotCoords.x}, {farmPlotCoords.y}).")
+                # farmPlotCoords holds location of [0, 0] plot
+                self.farmPlotCoords = farmPlotCoords
+                return True
+            helpers.invalidateFrames()
+        return False
+
+    def getPlotCoords(self, plant: Plant) -> Optional[controls.Point]:
         """
         Take a Plant object as input and locate its position on the game screen.
 
+        The grid is located the first time this is called, which requires the garden to be open.
+
         :param plant: A Plant object containing the information for the plot you are looking for.
-        :return: The coordinates in a pyautogui.Point object, or None if not found.
-        :rtype: pyautogui.Point
+        :return: The coordinates in a controls.Point object, or None if not found.
+        :rtype: controls.Point
         """
-        #  This is necessary since hovered tooltips can block the identification.
-        pyautogui.moveTo(x=50, y=50)
-
-        if not self.farmPlotCoords:
-            for i in range(3):
-                farmPlotCoords = helpers.locate("img/gardenPlot.png", grayscale=False, confidence=0.9)
-
-                if farmPlotCoords:
-                    self.logger.info(f"Located top-left farm plot at ({farmPlotCoords.x}, {farmPlotCoords.y}).")
-                    self.farmPlotCoords = farmPlotCoords
-                    break
-            # farmPlotCoords holds location of [0, 0] plot
-        if self.farmPlotCoords:
-            point = pyautogui.Point(self.farmPlotCoords.x + (60*plant.x), self.farmPlotCoords.y + (60*plant.y))
-            return point
-        return None
+        if not self.farmPlotCoords and not self.calibrate():
+            return None
+        return controls.Point(self.farmPlotCoords.x + (_PLOT_SPACING*plant.x),
+                               self.farmPlotCoords.y + (_PLOT_SPACING*plant.y))
 
     def loadAllPlantData(self, unlockedStr: str) -> None:
         """
-        Load information for all plants from a .csv file and store it in a class variable.
+        Store which plants have been unlocked in a class variable.
 
         :param unlockedStr: A series of 0s and 1s corresponding to each plant's unlocked status.
         :type unlockedStr: str
         :rtype: None
         """
-        index = 0
-        self.unlockedPlants = []
-        with open(_CSV_FILENAME, 'r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                data = PlantData()
-                data.unlocked = unlockedStr[index] == "1"
-                data.name = row["Name"]
-                data.id = int(row["ID"])
-                data.cost = int(row["Cost"])
-                data.ageTick = float(row["AgeTick"])
-                data.ageTickR = float(row["AgeTickR"])
-                data.mature = int(row["Mature"])
-                data.children = [int(plantID) for plantID in row["Children"].split('|') if row["Children"]]
-                data.immortal = row["Immortal"] == "yes"
-                data.fungus = row["Fungus"] == "yes"
-                data.weed = row["Weed"] == "yes"
-                data.plantable = row["Plantable"] == "yes"
-                self.unlockedPlants.append(data)
+        self.unlockedPlants = [data for data in self.plantCatalog
+                               if data.id < len(unlockedStr) and unlockedStr[data.id] == "1"]
 
     def loadAllPlotData(self, plotStr: str) -> None:
         """
-        Create a grid of plants based on save data and store it in a class variable.
+        Update the grid of plants based on save data and store it in a class variable.
 
         :param plotStr: The string consisting of the plant data and growth stage for every grid space.
         :rtype: None
@@ -133,16 +201,21 @@ class Garden:
         p = plotStr.split(':')
         p.pop()
         p = iter(p)
-        self.plots = []
         index = 0
-        limits = _PLOT_LIMITS[self.farmLevel-1]
+        limits = plotLimits(self.farmLevel)
         for plantID in p:
             life = next(p)
+            x = int(index % _GRID_SIZE) - limits[0]
+            y = int(index / _GRID_SIZE) - limits[1]
+            plant = self._grid[index]
             if int(plantID) > 0:
-                plantInfo = self.unlockedPlants[int(plantID)-1]
-                plant = Plant(plantInfo, int(life))
-
-                plant.x = int(index%6) - limits[0]
-                plant.y = int(index/6) - limits[1]
-                self.plots.append(plant)
+                plantInfo = self.plantCatalog[int(plantID)-1]
+                if plant is None:
+                    self._grid[index] = Plant(plantInfo, int(life), x, y)
+                else:
+                    plant.update(plantInfo, int(life))
+                    plant.x, plant.y = x, y
+            else:
+                self._grid[index] = None
             index += 1
+        self.plots = [plant for plant in self._grid if plant is not None]
@@ -0,0 +1,101 @@
+from typing import Dict, NamedTuple, Tuple
+
+# Plant IDs, matching the rows of cookieClickerPlants.csv.
+BAKERS_WHEAT, THUMBCORN, CRONERICE, GILDMILLET, CLOVER, GOLDEN_CLOVER, SHIMMERLILY, ELDERWORT, BAKEBERRY, \
+    CHOCOROOT, WHITE_CHOCOROOT, WHITE_MILDEW, BROWN_MOLD, MEDDLEWEED, WHISKERBLOOM, CHIMEROSE, NURSETULIP, \
+    DROWSYFERN, WARDLICHEN, KEENMOSS, QUEENBEET, JUICY_QUEENBEET, DUKETATER, CRUMBSPORE, DOUGHSHROOM, GLOVEMOREL, \
+    CHEAPCAP, FOOLS_BOLETE, WRINKLEGILL, GREEN_ROT, SHRIEKBULB, TIDYGRASS, EVERDAISY, ICHORPUFF = range(34)
+
+
+class Recipe(NamedTuple):
+    """
+    One way for an empty plot to mutate into a plant, depending on its eight neighbours.
+    """
+    result: int
+    """The ID of the plant that may grow."""
+    chance: float
+    """The chance per tick of the mutation being rolled when the conditions are met."""
+    mature: Tuple[Tuple[int, int], ...]
+    """Pairs of (plant ID, minimum amount) of mature neighbours required."""
+    anyAge: Tuple[Tuple[int, int], ...] = ()
+    """Pairs of (plant ID, minimum amount) of neighbours of any age required."""
+    atMost: Tuple[Tuple[int, int], ...] = ()
+    """Pairs of (plant ID, maximum amount) of neighbours of any age allowed."""
+
+    def applies(self, mature: Dict[int, int], anyAge: Dict[int, int]) -> bool:
+        """
+        Check whether a neighbourhood meets the conditions of this recipe.
+
+        :param mature: The amount of mature neighbours of each plant ID.
+        :param anyAge: The amount of neighbours of any age of each plant ID.
+        :return: True if the mutation can be rolled.
+        """
+        return all(mature.get(p, 0) >= n for p, n in self.mature) \
+            and all(anyAge.get(p, 0) >= n for p, n in self.anyAge) \
+            and all(anyAge.get(p, 0) <= n for p, n in self.atMost)
+
+
+RECIPES = (
+    Recipe(BAKERS_WHEAT, 0.2, ((BAKERS_WHEAT, 2),)),
+    Recipe(THUMBCORN, 0.05, ((BAKERS_WHEAT, 2),)),
+    Recipe(BAKEBERRY, 0.001, ((BAKERS_WHEAT, 2),)),
+    Recipe(CRONERICE, 0.01, ((BAKERS_WHEAT, 1), (THUMBCORN, 1))),
+    Recipe(THUMBCORN, 0.1, ((THUMBCORN, 2),)),
+    Recipe(BAKERS_WHEAT, 0.05, ((THUMBCORN, 2),)),
+    Recipe(GILDMILLET, 0.03, ((CRONERICE, 1), (THUMBCORN, 1))),
+    Recipe(THUMBCORN, 0.02, ((CRONERICE, 2),)),
+    Recipe(CLOVER, 0.03, ((BAKERS_WHEAT, 1), (GILDMILLET, 1))),
+    Recipe(GOLDEN_CLOVER, 0.0007, ((BAKERS_WHEAT, 1), (GILDMILLET, 1))),
+    Recipe(SHIMMERLILY, 0.02, ((CLOVER, 1), (GILDMILLET, 1))),
+    Recipe(CLOVER, 0.007, ((CLOVER, 2),), atMost=((CLOVER, 4),)),
+    Recipe(GOLDEN_CLOVER, 0.0001, ((CLOVER, 2),), atMost=((CLOVER, 4),)),
+    Recipe(GOLDEN_CLOVER, 0.0007, ((CLOVER, 4),)),
+    Recipe(ELDERWORT, 0.01, ((SHIMMERLILY, 1), (CRONERICE, 1))),
+    Recipe(ELDERWORT, 0.002, ((WRINKLEGILL, 1), (CRONERICE, 1))),
+    Recipe(CHOCOROOT, 0.1, ((BAKERS_WHEAT, 1),), anyAge=((BROWN_MOLD, 1),)),
+    Recipe(WHITE_CHOCOROOT, 0.1, ((CHOCOROOT, 1),), anyAge=((WHITE_MILDEW, 1),)),
+    Recipe(BROWN_MOLD, 0.5, ((WHITE_MILDEW, 1),), atMost=((BROWN_MOLD, 1),)),
+    Recipe(WHITE_MILDEW, 0.5, ((BROWN_MOLD, 1),), atMost=((WHITE_MILDEW, 1),)),
+    Recipe(MEDDLEWEED, 0.15, ((MEDDLEWEED, 1),), atMost=((MEDDLEWEED, 3),)),
+    Recipe(WHISKERBLOOM, 0.01, ((SHIMMERLILY, 1), (WHITE_CHOCOROOT, 1))),
+    Recipe(CHIMEROSE, 0.05, ((SHIMMERLILY, 1), (WHISKERBLOOM, 1))),
+    Recipe(CHIMEROSE, 0.005, ((CHIMEROSE, 2),)),
+    Recipe(NURSETULIP, 0.05, ((WHISKERBLOOM, 2),)),
+    Recipe(DROWSYFERN, 0.005, ((CHOCOROOT, 1), (KEENMOSS, 1))),
+    Recipe(WARDLICHEN, 0.005, ((CRONERICE, 1), (KEENMOSS, 1))),
+    Recipe(WARDLICHEN, 0.005, ((CRONERICE, 1), (WHITE_MILDEW, 1))),
+    Recipe(WARDLICHEN, 0.05, ((WARDLICHEN, 1),), atMost=((WARDLICHEN, 1),)),
+    Recipe(KEENMOSS, 0.1, ((GREEN_ROT, 1), (BROWN_MOLD, 1))),
+    Recipe(KEENMOSS, 0.05, ((KEENMOSS, 1),), atMost=((KEENMOSS, 1),)),
+    Recipe(QUEENBEET, 0.01, ((CHOCOROOT, 1), (BAKEBERRY, 1))),
+    Recipe(JUICY_QUEENBEET, 0.001, ((QUEENBEET, 8),)),
+    Recipe(DUKETATER, 0.001, ((QUEENBEET, 2),)),
+    Recipe(CRUMBSPORE, 0.07, ((CRUMBSPORE, 1),), atMost=((CRUMBSPORE, 1),)),
+    Recipe(GLOVEMOREL, 0.02, ((CRUMBSPORE, 1), (THUMBCORN, 1)), atMost=((GLOVEMOREL, 1),)),
+    Recipe(CHEAPCAP, 0.04, ((CRUMBSPORE, 1), (SHIMMERLILY, 1)), atMost=((CHEAPCAP, 1),)),
+    Recipe(FOOLS_BOLETE, 0.04, ((DOUGHSHROOM, 1), (GREEN_ROT, 1)), atMost=((FOOLS_BOLETE, 1),)),
+    Recipe(DOUGHSHROOM, 0.005, ((CRUMBSPORE, 2),)),
+    Recipe(DOUGHSHROOM, 0.07, ((DOUGHSHROOM, 1),), atMost=((DOUGHSHROOM, 1),)),
+    Recipe(CRUMBSPORE, 0.005, ((DOUGHSHROOM, 2),)),
+    Recipe(WRINKLEGILL, 0.06, ((CRUMBSPORE, 1), (DOUGHSHROOM, 1))),
+    Recipe(GREEN_ROT, 0.05, ((WHITE_MILDEW, 1), (CLOVER, 1)), atMost=((GREEN_ROT, 1),)),
+    Recipe(SHRIEKBULB, 0.001, ((WRINKLEGILL, 1), (ELDERWORT, 1)), atMost=((SHRIEKBULB, 0),)),
+    Recipe(SHRIEKBULB, 0.001, ((ELDERWORT, 5),)),
+    Recipe(SHRIEKBULB, 0.005, ((DUKETATER, 3),)),
+    Recipe(SHRIEKBULB, 0.002, ((DOUGHSHROOM, 4),)),
+    Recipe(SHRIEKBULB, 0.001, ((QUEENBEET, 5),)),
+    Recipe(TIDYGRASS, 0.002, ((BAKERS_WHEAT, 1), (WHITE_CHOCOROOT, 1))),
+    Recipe(EVERDAISY, 0.002, ((TIDYGRASS, 3), (ELDERWORT, 3))),
+    Recipe(ICHORPUFF, 0.002, ((ELDERWORT, 1), (CRUMBSPORE, 1))),
+)
+"""Every mutation of the garden, in the order the game checks them."""
+
+
+def parents(recipe: Recipe) -> Tuple[int, ...]:
+    """
+    Get the plants that must be planted around an empty plot for a recipe to apply.
+
+    :param recipe: The recipe.
+    :return: The IDs of the required plants.
+    """
+    return tuple(sorted({p for p, _ in recipe.mature} | {p for p, _ in recipe.anyAge}))
@@ -0,0 +1,226 @@
+import argparse
+import functools
+import logging
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .garden import Garden, loadPlantCatalog, plotSize
+from .mutations import RECIPES, parents
+
+SOIL_MUTATION_MULTIPLIER = [1.0, 1.0, 1.0, 1.0, 3.0]
+"""How much each soil multiplies mutation chances: dirt, fertilizer, clay, pebbles and wood chips."""
+_EMPTY = -1
+
+
+@functools.lru_cache(maxsize=None)
+def tileChance(target: int, neighbours: Tuple[int, ...]) -> float:
+    """
+    Get the chance per tick of an empty plot growing a plant, given its neighbours.
+
+    Every applicable mutation is rolled independently and one of the successful rolls is picked at random,
+    so the result is the chance of the target's roll succeeding and then being picked. Results are memoized on
+    the sorted neighbours, which is what lets the layout search rescore plots cheaply.
+
+    :param target: The ID of the plant wanted.
+    :param neighbours: The sorted IDs of the (mature) plants around the plot.
+    :return: The chance per tick, before soil modifiers.
+    """
+    counts = Counter(neighbours)
+    rolls = [r for r in RECIPES if r.applies(counts, counts)]
+    chance = 0.0
+    for i, recipe in enumerate(rolls):
+        if recipe.result != target:
+            continue
+        # distribution of the amount of other successful rolls, to know how likely this one gets picked
+        others = [0.0] * len(rolls)
+        others[0] = 1.0
+        for j, other in enumerate(rolls):
+            if j == i:
+                continue
+            for k in range(len(rolls) - 1, 0, -1):
+                others[k] = others[k] * (1 - other.chance) + others[k - 1] * other.chance
+            others[0] *= 1 - other.chance
+        chance += recipe.chance * sum(p / (k + 1) for k, p in enumerate(others))
+    return chance
+
+
+class MutationPlan(NamedTuple):
+    """
+    A garden layout that grows a target plant through mutation.
+    """
+    target: int
+    """The ID of the plant the layout is meant to unlock."""
+    layout: Tuple[Tuple[Optional[int], ...], ...]
+    """Rows of plant IDs to plant, with None for plots left empty."""
+    score: float
+    """The expected amount of the target plant growing per tick."""
+
+    def __str__(self):
+        catalog = loadPlantCatalog()
+        width = max(len(p.name) for p in catalog)
+        rows = [" ".join((catalog[p].name if p is not None else ".").ljust(width) for p in row)
+                for row in self.layout]
+        return f"{catalog[self.target].name}: {self.score:.5f} expected per tick\n" + "\n".join(rows)
+
+
+def _neighbours(grid: Sequence[int], width: int, height: int, index: int) -> Tuple[int, ...]:
+    y, x = divmod(index, width)
+    found = []
+    for ny in range(max(0, y - 1), min(height, y + 2)):
+        for nx in range(max(0, x - 1), min(width, x + 2)):
+            p = grid[ny * width + nx]
+            if p != _EMPTY and (nx, ny) != (x, y):
+                found.append(p)
+    return tuple(sorted(found))
+
+
+def _search(args) -> Tuple[float, List[int]]:
+    """
+    Hill-climb from a random layout by changing one plot at a time, keeping the best change of each plot until
+    no change improves the score. Only the 3x3 area around a changed plot is rescored.
+    """
+    target, symbols, width, height, seed = args
+    rng = random.Random(seed)
+    size = width * height
+    grid = [rng.choice(symbols) for _ in range(size)]
+    areas = [[ny * width + nx
+              for ny in range(max(0, i // width - 1), min(height, i // width + 2))
+              for nx in range(max(0, i % width - 1), min(width, i % width + 2))] for i in range(size)]
+
+    def local(index: int) -> float:
+        return sum(tileChance(target, _neighbours(grid, width, height, j))
+                   for j in areas[index] if grid[j] == _EMPTY)
+
+    improved = True
+    while improved:
+        improved = False
+        for index in rng.sample(range(size), size):
+            old = grid[index]
+            base = local(index)
+            best, bestSymbol = 1e-12, old
+            for symbol in symbols:
+                if symbol == old:
+                    continue
+                grid[index] = symbol
+                gain = local(index) - base
+                if gain > best:
+                    best, bestSymbol = gain, symbol
+            grid[index] = bestSymbol
+            improved = improved or bestSymbol != old
+    score = sum(tileChance(target, _neighbours(grid, width, height, j)) for j in range(size) if grid[j] == _EMPTY)
+    return score, grid
+
+
+class MutationPlanner:
+    """
+    Searches for garden layouts that unlock new seeds through mutation.
+    """
+
+    def __init__(self, restarts: int = 32, workers: Optional[int] = None, seed: int = 0):
+        """
+        Initialize the planner.
+
+        :param restarts: The amount of random layouts the search starts from.
+        :param workers: The amount of processes to search with. Defaults to the amount of CPUs; 1 searches inline.
+        :param seed: Seed of the search, for reproducible plans.
+        """
+        self.restarts = restarts
+        self.workers = workers
+        self.seed = seed
+
+    @staticmethod
+    def parentsFor(target: int, unlocked: Iterable[int]) -> Tuple[int, ...]:
+        """
+        Get every plant that takes part in a mutation into the target and can be planted.
+
+        :param target: The ID of the plant wanted.
+        :param unlocked: The IDs of the unlocked plants.
+        :return: The IDs of the usable parents. Empty if no recipe can be completed.
+        """
+        catalog = loadPlantCatalog()
+        usable = {p for p in unlocked if catalog[p].plantable}
+        found = set()
+        for recipe in RECIPES:
+            required = parents(recipe)
+            if recipe.result == target and set(required) <= usable:
+                found.update(required)
+        return tuple(sorted(found))
+
+    def plan(self, target: int, width: int, height: int, unlocked: Iterable[int], soil: int = 0) \
+            -> Optional[MutationPlan]:
+        """
+        Find the layout with the highest expected yield of a plant.
+
+        :param target: The ID of the plant wanted.
+        :param width: The width of the garden, in plots.
+        :param height: The height of the garden, in plots.
+        :param unlocked: The IDs of the unlocked plants.
+        :param soil: The soil in use, which can multiply mutation chances.
+        :return: The best plan found, or None if the target cannot be reached with the unlocked plants.
+        """
+        if self.workers == 1:
+            return self._plan(map, target, width, height, unlocked, soil)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            return self._plan(executor.map, target, width, height, unlocked, soil)
+
+    def _plan(self, mapper: Callable, target: int, width: int, height: int, unlocked: Iterable[int],
+              soil: int) -> Optional[MutationPlan]:
+        symbols = (_EMPTY,) + self.parentsFor(target, unlocked)
+        if len(symbols) == 1:
+            return None
+        jobs = [(target, symbols, width, height, self.seed + i) for i in range(self.restarts)]
+        score, grid = max(mapper(_search, jobs), key=lambda r: r[0])
+        multiplier = SOIL_MUTATION_MULTIPLIER[soil] if soil < len(SOIL_MUTATION_MULTIPLIER) else 1.0
+        layout = tuple(tuple(None if p == _EMPTY else p for p in grid[y * width:(y + 1) * width])
+                       for y in range(height))
+        return MutationPlan(target, layout, score * multiplier)
+
+    def suggest(self, garden: Garden) -> List[MutationPlan]:
+        """
+        Plan every locked seed that can be reached with the plants unlocked in a garden.
+
+        :param garden: The garden.
+        :return: The plans, highest expected yield first.
+        """
+        width, height = plotSize(garden.farmLevel)
+        unlocked = [p.id for p in garden.unlockedPlants]
+        targets = [plant.id for plant in garden.plantCatalog if plant.id not in unlocked]
+        # one pool for every target, as starting the processes costs more than searching a small garden
+        if self.workers == 1:
+            plans = [self._plan(map, target, width, height, unlocked, garden.soil) for target in targets]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                plans = [self._plan(executor.map, target, width, height, unlocked, garden.soil)
+                         for target in targets]
+        return sorted((plan for plan in plans if plan), key=lambda p: p.score, reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find the garden layout that best unlocks a plant.")
+    parser.add_argument("target", help="name of the plant to unlock, such as Shimmerlily")
+    parser.add_argument("--level", type=int, default=9, help="farm level, which decides the garden size")
+    parser.add_argument("--unlocked", nargs="*", default=None,
+                        help="names of the unlocked plants; defaults to every plant")
+    parser.add_argument("--soil", type=int, default=0)
+    parser.add_argument("--restarts", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(format="[%(levelname)s][%(asctime)s] %(message)s", level=logging.INFO,
+                        datefmt="%m/%d/%Y %H:%M:%S")
+    catalog = loadPlantCatalog()
+    byName = {p.name.lower(): p.id for p in catalog}
+    unlocked = list(byName.values()) if args.unlocked is None else [byName[n.lower()] for n in args.unlocked]
+    width, height = plotSize(args.level)
+    plan = MutationPlanner(restarts=args.restarts, workers=args.workers).plan(
+        byName[args.target.lower()], width, height, unlocked, args.soil)
+    if plan:
+        logging.getLogger("wafer").info(str(plan))
+    else:
+        logging.getLogger("wafer").warning(f"{args.target} cannot be reached with the unlocked plants.")
+
+
+if __name__ == "__main__":
+    main()
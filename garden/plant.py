@@ -7,31 +7,44 @@ class Plant:
     """
     Class representing a plot space on the garden minigame's grid.
     """
-    data: PlantData = None
-    """The information for this plant, like maturity rate, name, etc."""
-    ticksUntilDecay: int = 0
-    """Remaining lifespan of the plant. Note that plants have reduced efficiency at two ticks left of life."""
-    ticksUntilMature: int = 0
-    """Remaining ticks until plant becomes mature, unlocking 100% of plant benefits and enabling reproduction."""
-    isMature: bool = False
-    """Notes if the plant is currently mature or not."""
-    x: int = 0
-    """x coordinate of the plot this plant is located in."""
-    y: int = 0
-    """y coordinate of the plot this plant is located in."""
-
-    def __init__(self, data: PlantData, lifeTick: int):
+    __slots__ = ("data", "ticksUntilDecay", "ticksUntilMature", "isMature", "age", "x", "y")
+
+    def __init__(self, data: PlantData, lifeTick: int, x: int = 0, y: int = 0):
         """
         Create a Plant object.
 
         :param data: The universal plant information.
         :param lifeTick: The current age of this plant.
+        :param x: x coordinate of the plot.
+        :param y: y coordinate of the plot.
         :type data: PlantData
         :type lifeTick: int
         """
+        self.x: int = x
+        """x coordinate of the plot this plant is located in."""
+        self.y: int = y
+        """y coordinate of the plot this plant is located in."""
+        self.update(data, lifeTick)
+
+    def update(self, data: PlantData, lifeTick: int) -> None:
+        """
+        Update this plot with new save data.
+
+        :param data: The universal plant information.
+        :param lifeTick: The current age of this plant.
+        :rtype: None
+        """
         # ignore plot modifiers for now
-        self.data = data
-        self.isMature = self.data.mature <= lifeTick
+        self.data: PlantData = data
+        """The information for this plant, like maturity rate, name, etc."""
+        self.age: int = lifeTick
+        """Current age of the plant, from 0 to 100."""
+        self.isMature: bool = self.data.mature <= lifeTick
+        """Notes if the plant is currently mature or not."""
+        self.ticksUntilDecay: int = 0
+        """Remaining lifespan of the plant. Note that plants have reduced efficiency at two ticks left of life."""
+        self.ticksUntilMature: int = 0
+        """Remaining ticks until plant becomes mature, unlocking 100% of plant benefits and enabling reproduction."""
 
         if self.isMature:
             self.ticksUntilDecay = math.ceil(
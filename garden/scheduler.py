@@ -0,0 +1,102 @@
+import math
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+from .garden import Garden
+from .plant import Plant
+
+SOIL_TICK_MINUTES = [5, 3, 15, 5, 5]
+"""Minutes between garden ticks for each soil: dirt, fertilizer, clay, pebbles and wood chips."""
+
+
+class PlotForecast(NamedTuple):
+    """
+    When a plot will need attention.
+    """
+    plant: Plant
+    matureAt: Optional[datetime]
+    """When the plant is expected to mature, or None if it already is."""
+    harvestAt: Optional[datetime]
+    """The earliest time the plant can enter the harvest window, or None if it never decays."""
+
+
+class TendScheduler:
+    """
+    Predicts when the garden next needs to be tended from its save data, so the bot only opens the garden when
+    a plant is about to decay instead of checking on a fixed interval.
+    """
+
+    def __init__(self, harvestWindow: int = 3, margin: timedelta = timedelta(seconds=5)):
+        """
+        Initialize the scheduler.
+
+        :param harvestWindow: Plants are harvested once they have at most this many ticks left to live.
+        :param margin: Extra time waited after a tick, so the game has processed it.
+        """
+        self.harvestWindow = harvestWindow
+        self.margin = margin
+
+    @staticmethod
+    def tickLength(garden: Garden) -> timedelta:
+        """
+        Get the time between garden ticks, which depends on the soil.
+
+        :param garden: The garden.
+        :return: The length of a tick.
+        """
+        minutes = SOIL_TICK_MINUTES[garden.soil] if garden.soil < len(SOIL_TICK_MINUTES) else SOIL_TICK_MINUTES[0]
+        return timedelta(minutes=minutes)
+
+    def needsHarvest(self, plant: Plant) -> bool:
+        """
+        Check whether a plant is in the harvest window right now.
+
+        :param plant: The plant.
+        :return: True if the plant is mature, mortal and close to decaying.
+        """
+        return plant.isMature and not plant.data.immortal and plant.ticksUntilDecay <= self.harvestWindow
+
+    def _tickTime(self, garden: Garden, ticks: int, now: datetime) -> datetime:
+        # the first of the remaining ticks happens at nextStep, the others one tick length apart
+        if ticks <= 0:
+            return now
+        return max(now, garden.nextStep + self.tickLength(garden) * (ticks - 1) + self.margin)
+
+    def forecast(self, garden: Garden, now: Optional[datetime] = None) -> List[PlotForecast]:
+        """
+        Predict when every planted plot matures and enters the harvest window.
+
+        Maturity is predicted with the plant's average aging speed. The harvest window is predicted with its
+        fastest aging speed, so the bot checks on a plant no later than the earliest moment it could need it.
+
+        :param garden: The garden.
+        :param now: The current time. Defaults to now.
+        :return: One forecast per planted plot.
+        """
+        now = now or datetime.now()
+        forecasts = []
+        for plant in garden.plots:
+            data = plant.data
+            averageRate = data.ageTick + data.ageTickR / 2
+            fastestRate = data.ageTick + data.ageTickR
+            matureAt = None
+            if not plant.isMature and averageRate > 0:
+                matureAt = self._tickTime(garden, math.ceil((data.mature - plant.age) / averageRate), now)
+            harvestAt = None
+            if not data.immortal and fastestRate > 0:
+                # ticksUntilDecay is computed with the average rate, so that is what decides the window
+                threshold = max(data.mature, 100 - self.harvestWindow * averageRate)
+                harvestAt = self._tickTime(garden, math.ceil((threshold - plant.age) / fastestRate), now)
+            forecasts.append(PlotForecast(plant, matureAt, harvestAt))
+        return forecasts
+
+    def nextActionTime(self, garden: Garden, now: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Get the earliest time any plot may need to be harvested.
+
+        :param garden: The garden.
+        :param now: The current time. Defaults to now.
+        :return: The time of the next action, or None if no planted plot will ever need one.
+        """
+        times = [f.harvestAt for f in self.forecast(garden, now) if f.harvestAt is not None]
+        return min(times) if times else None
@@ -1,26 +1,99 @@
-import base64
 import logging
-from typing import List
+import threading
+from typing import Dict, List, Optional
 
 import cv2
 import numpy as np
-import pyautogui
 import pytesseract
 from PIL import Image
-from mss import mss
 
+import controls
+import metrics
 from config import Config
+from savestate import getSaveState
+from vision.frames import FrameProvider
+from vision.ocr import GlyphOCR
+from vision.templates import LocationHints, TemplateRegistry
 
-WORDS_TO_POWER = {
-    "thousand": 1E3,
-    "million": 1E6,
-    "billion": 1E9,
-    "trillion": 1E12,
-    "quadrillion": 1E15,
-    "quintillion": 1E18,
-    "sextillion": 1E21,
-    "septillion": 1E24
-}
+_LONG_SUFFIXES = ["thousand", "million", "billion", "trillion", "quadrillion", "quintillion", "sextillion",
+                  "septillion", "octillion", "nonillion"]
+_PREFIXES = ["", "un", "duo", "tre", "quattuor", "quin", "sex", "septen", "octo", "novem"]
+_TENS = ["decillion", "vigintillion", "trigintillion", "quadragintillion", "quinquagintillion", "sexagintillion",
+         "septuagintillion", "octogintillion", "nonagintillion"]
+
+# the words the game uses for large numbers, generated the same way the game builds its list
+WORDS_TO_POWER = {word: 10.0 ** (3 * (i + 1))
+                  for i, word in enumerate(_LONG_SUFFIXES + [p + t for t in _TENS for p in _PREFIXES])}
+
+
+_ocrTime = metrics.histogram("wafer_ocr_seconds", "Time spent reading text from the screen with Tesseract.")
+_glyphTime = metrics.histogram("wafer_glyph_ocr_seconds", "Time spent reading text from the screen with glyphs.")
+
+templates = TemplateRegistry("img")
+"""Every image in the img folder, loaded once at startup."""
+hints = LocationHints(templates)
+"""Last known locations of templates found with `locate`. See `hints.stats` for hit/miss counters."""
+glyphReader = GlyphOCR()
+"""Reads text in the game's font. Learns glyphs from Tesseract as it goes."""
+
+_frameProviders: Dict[int, FrameProvider] = {}
+_frameProvidersLock = threading.Lock()
+_frameTTL = 0.05
+
+
+def configureFrames(config: Config) -> None:
+    """
+    Apply the frame cache settings from the configuration to every frame provider, and how long template
+    locations are trusted while the screen around them does not change.
+
+    :param config: The bot configuration.
+    """
+    global _frameTTL
+    _frameTTL = config.frameCacheTTL
+    hints.revalidateInterval = config.fullScanInterval
+    with _frameProvidersLock:
+        for provider in _frameProviders.values():
+            provider.ttl = _frameTTL
+
+
+def frameProvider(monitor=1) -> FrameProvider:
+    """
+    Get the shared frame provider of a monitor. Every capture goes through it, so the whole bot reuses one
+    capture handle and one cached frame per tick.
+
+    :param monitor: The number of the monitor. Index 0 means all monitors.
+    :return: The frame provider of that monitor.
+    """
+    with _frameProvidersLock:
+        if monitor not in _frameProviders:
+            _frameProviders[monitor] = FrameProvider(monitor=monitor, ttl=_frameTTL)
+        return _frameProviders[monitor]
+
+
+def useFrameSource(source, monitor=1) -> FrameProvider:
+    """
+    Capture a monitor from another source than the screen, such as a `vision.synthetic.SyntheticScreen`.
+
+    :param source: The capture source.
+    :param monitor: The number of the monitor it replaces.
+    :return: The new frame provider of that monitor.
+    """
+    with _frameProvidersLock:
+        previous = _frameProviders.get(monitor)
+        if previous is not None:
+            previous.close()
+        _frameProviders[monitor] = FrameProvider(monitor=monitor, ttl=_frameTTL, source=source)
+        return _frameProviders[monitor]
+
+
+def invalidateFrames() -> None:
+    """
+    Drop every cached frame. Should be called after clicking something that changes the screen.
+    """
+    with _frameProvidersLock:
+        providers = list(_frameProviders.values())
+    for provider in providers:
+        provider.invalidate()
 
 
 def screenshot(monitor=1) -> Image:
@@ -31,95 +104,132 @@ def screenshot(monitor=1) -> Image:
     :return: A PIL Image containing the screenshot.
     :rtype: PIL.Image
     """
-    with mss() as sct:
-        ss = sct.grab(sct.monitors[monitor])
-        img = Image.frombytes('RGB', ss.size, ss.rgb)
-        return img
+    frame = frameProvider(monitor).grab()
+    return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB))
 
 
-def locate(compareImage, monitor=1, grayscale=True, confidence=0.9, center=True) -> pyautogui.Point:
+def locate(compareImage, monitor=1, grayscale=True, confidence=0.9, center=True, useHint=True) -> controls.Point:
     """
     Helper function to locate an image on a screen.
 
-    :param compareImage: The image you wish to find.
+    :param compareImage: The name of the template in the img folder you wish to find, such as "cps".
     :param monitor: The monitor number to screenshot.
     :param grayscale: Whether the image should be converted to grayscale or not before applying.
     :param confidence: How strict to be with image identification.
     :param center: Whether to return the coordinate from the center of the found image or from the top-left.
-    :return: The point at which the image was found.
+    :param useHint: Whether to search around the last location the image was found at before searching everywhere.
+    :return: The point at which the image was found, or None if it was not found.
     """
-    img = screenshot(monitor=monitor)
-    box = pyautogui.locate(compareImage, img, grayscale=grayscale, confidence=confidence)
+    provider = frameProvider(monitor)
+    frame = provider.grab()
+    if useHint:
+        box = hints.match(frame, compareImage, grayscale=grayscale, confidence=confidence, changes=provider.changes)
+    else:
+        box = templates.match(frame, compareImage, grayscale=grayscale, confidence=confidence)
+    if not box:
+        return None
     if center:
-        return pyautogui.Point(x=box.left+(box.width/2), y=box.top+(box.height/2))
+        return controls.Point(x=box.left+(box.width/2), y=box.top+(box.height/2))
     else:
-        return pyautogui.Point(x=box.left, y=box.top)
+        return controls.Point(x=box.left, y=box.top)
 
 
-def locateAll(compareImage, monitor=1, grayscale=True, confidence=0.9) -> List[pyautogui.Point]:
+def locateAll(compareImage, monitor=1, grayscale=True, confidence=0.9) -> List[controls.Point]:
     """
         Helper function to locate all instances of an image on a screen.
 
-        :param compareImage: The image you wish to find.
+        :param compareImage: The name of the template in the img folder you wish to find, such as "cps".
         :param monitor: The monitor number to screenshot.
         :param grayscale: Whether the image should be converted to grayscale or not before applying.
         :param confidence: How strict to be with image identification.
-        :return: The point at which the image was found.
+        :return: The points at which the image was found, top to bottom and then left to right.
         """
-    img = screenshot(monitor=monitor)
-    boxes = pyautogui.locateAll(compareImage, img, grayscale=grayscale, confidence=confidence)
-    return [pyautogui.Point(x=box.left+(box.width/2), y=box.top+(box.height/2)) for box in boxes]
+    boxes = templates.matchAll(frameProvider(monitor).grab(), compareImage, grayscale=grayscale,
+                               confidence=confidence)
+    return [controls.Point(x=box.left+(box.width/2), y=box.top+(box.height/2)) for box in boxes]
+
+
+def parseNumber(text: str) -> Optional[float]:
+    """
+    Convert a number as the game displays it, such as "1,234,567" or "1.234 million", to a float.
+
+    :param text: The displayed number.
+    :return: The number, or None if it could not be understood.
+    """
+    parts = text.replace(",", "").split()
+    try:
+        num = float(parts[0])
+    except (IndexError, ValueError):
+        return None
+    if len(parts) == 1:
+        return num
+    if parts[1] in WORDS_TO_POWER:
+        return num * WORDS_TO_POWER[parts[1]]
+    return None
+
+
+def _cpsCharacters(shortNumsEnabled: bool) -> str:
+    """The characters the CPS can be written with."""
+    return "0123456789,.abcdefghilmnopqrstuvwxyz " if shortNumsEnabled else "0123456789,"
+
+
+def _readCPSWithTesseract(mask: np.ndarray, shortNumsEnabled: bool) -> str:
+    img = np.where(mask, 0, 255).astype(np.uint8)
+    whitelist = _cpsCharacters(shortNumsEnabled).replace(" ", "\\ ")
+    with _ocrTime.time():
+        return pytesseract.image_to_string(img, config=f"--psm 7 --oem 3 -c tessedit_char_whitelist={whitelist}")\
+            .replace("per second", "").strip()
 
 
 def getCurrentCPS(shortNumsEnabled=True):
-    coords = locate("img/cps.png", confidence=0.7, center=False)
-    with mss() as sct:
-        img = sct.grab(monitor={
-            "top": coords.y,
-            "left": coords.x,
-            "width": 400,
-            "height": 30,
-            "mon": 1
-        })
-
-        img = Image.frombytes('RGB', img.size, img.rgb)
-        # convert to grayscale
-        img = cv2.cvtColor(np.array(img), cv2.COLOR_BGR2GRAY)
-        # CPS text is white on black, so invert image before thresholding
-        img = cv2.bitwise_not(img)
-        # eliminate all non-white objects; ie everything other than the cps text
-        _, img = cv2.threshold(img, 1, 255, cv2.THRESH_BINARY)
-
-        if not shortNumsEnabled:
-            cps = pytesseract.image_to_string(img, config="--psm 7 --oem 3 -c tessedit_char_whitelist=0123456789")\
-                .strip()
-            return int(cps)
-        else:
-            strcps = pytesseract.image_to_string(img, config="--psm 7 --oem 3 -c tessedit_char_whitelist=0123456789abcdefghilmnopqrstuvwxyz.\ ")\
-                .replace("per second", "").strip()
-            print(strcps)
-            num, power = strcps.split(" ")[:2]
-            if power in WORDS_TO_POWER:
-                return int(float(num) * WORDS_TO_POWER[power])
-            else:
-                logging.getLogger("wafer").error("Could not locate CPS. Disable short numbers for more accuracy.")
+    """
+    Read the CPS shown under the cookie count.
+
+    The text is read with the glyph reader, which learns the game's font from lines read by Tesseract. Tesseract
+    is only used while the reader does not recognize every character. If the reader learned a wrong glyph, call
+    `glyphReader.reset()` to start over.
+
+    :param shortNumsEnabled: Whether the game shows large numbers with words, such as "1.234 million".
+    :return: The CPS, or None if it could not be read.
+    """
+    box = hints.match(frameProvider().grab(), "cps", confidence=0.7, changes=frameProvider().changes)
+    if not box:
+        logging.getLogger("wafer").error("Could not locate the CPS label.")
+        return None
+    # the number follows the "per second:" label
+    img = frameProvider().grab(region=(box.left + box.width, box.top, 400 - box.width, box.height + 6))
+    # CPS text is white on a dark background; the brighter half of the anti-aliasing is kept so that
+    # thin strokes do not break glyphs apart
+    mask = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY) >= 200
+
+    with _glyphTime.time():
+        text = glyphReader.read(mask)
+    if text is None:
+        try:
+            text = _readCPSWithTesseract(mask, shortNumsEnabled)
+        except (pytesseract.TesseractError, pytesseract.TesseractNotFoundError) as e:
+            logging.getLogger("wafer").error(f"Could not read CPS with Tesseract: {e}")
+            return None
+        # Tesseract misreads often enough that only text which reads as a number is learned, as a wrong glyph
+        # would be trusted from then on
+        valid = parseNumber(text) is not None and all(c in _cpsCharacters(shortNumsEnabled) for c in text)
+        if not valid or not glyphReader.learn(mask, text):
+            logging.getLogger("wafer").debug(f"Could not learn glyphs from \"{text}\".")
+    cps = parseNumber(text)
+    if cps is None:
+        logging.getLogger("wafer").error(f"Could not read CPS from \"{text}\". "
+                                         f"Disable short numbers for more accuracy.")
+        return None
+    return int(cps)
 
 
 def getCookies(config: Config):
-    with open(config.saveLocation, "rb") as file:
-        data = file.read().split(b"%")[0]
-        missing_padding = len(data) % 4
-        if missing_padding:
-            data += b'=' * (4 - missing_padding)
-        data = str(base64.urlsafe_b64decode(data)).split("|")[4].split(";")[0]
-        return float(data)
+    save = getSaveState(config.saveLocation)
+    save.refresh()
+    return save.cookies
 
 
 def getHighestAscensionCPS(config: Config):
-    with open(config.saveLocation, "rb") as file:
-        data = file.read().split(b"%")[0]
-        missing_padding = len(data) % 4
-        if missing_padding:
-            data += b'=' * (4 - missing_padding)
-        data = str(base64.urlsafe_b64decode(data)).split("|")[4].split(";")[51]
-        return float(data)
+    save = getSaveState(config.saveLocation)
+    save.refresh()
+    return save.highestAscensionCPS
@@ -0,0 +1,307 @@
+import bisect
+import contextlib
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0)
+"""Upper bounds of the histogram buckets, in seconds."""
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _formatLabels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, help: str, labels: Labels):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    """
+    A value that only goes up, such as the amount of clicks sent.
+    """
+    kind = "counter"
+
+    def __init__(self, registry: "Registry", name: str, help: str, labels: Labels):
+        super().__init__(registry, name, help, labels)
+        self.value = 0.0
+        self._reported = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_formatLabels(self.labels)} {self.value:g}"]
+
+    def summarize(self) -> Optional[str]:
+        delta, self._reported = self.value - self._reported, self.value
+        return f"{self.value:g} (+{delta:g})" if delta else None
+
+
+class Gauge(_Metric):
+    """
+    A value that can go up and down, such as how old the market data is.
+    """
+    kind = "gauge"
+
+    def __init__(self, registry: "Registry", name: str, help: str, labels: Labels):
+        super().__init__(registry, name, help, labels)
+        self.value = math.nan
+
+    def set(self, value: float) -> None:
+        if self.registry.enabled:
+            self.value = value
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_formatLabels(self.labels)} {self.value:g}"]
+
+    def summarize(self) -> Optional[str]:
+        return None if math.isnan(self.value) else f"{self.value:.3g}"
+
+
+class Histogram(_Metric):
+    """
+    Counts how many observations fall in each of a fixed set of buckets, such as how long a capture takes.
+    """
+    kind = "histogram"
+
+    def __init__(self, registry: "Registry", name: str, help: str, labels: Labels,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        """Observations per bucket, with values above the last bound in the last one. Not cumulative."""
+        self.sum = 0.0
+        self.count = 0
+        self._reported = ([0] * len(self.counts), 0.0, 0)
+
+    def observe(self, value: float) -> None:
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextlib.contextmanager
+    def _timer(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def time(self):
+        """
+        Time a `with` block. Nothing is timed while metrics are disabled.
+        """
+        return self._timer() if self.registry.enabled else contextlib.nullcontext()
+
+    def render(self) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucketCount in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucketCount
+            le = 'le="+Inf"' if math.isinf(bound) else f'le="{bound:g}"'
+            lines.append(f"{self.name}_bucket{_formatLabels(self.labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_formatLabels(self.labels)} {total:g}")
+        lines.append(f"{self.name}_count{_formatLabels(self.labels)} {count}")
+        return lines
+
+    def summarize(self) -> Optional[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        oldCounts, oldTotal, oldCount = self._reported
+        self._reported = (counts, total, count)
+        delta = [new - old for new, old in zip(counts, oldCounts)]
+        observed = count - oldCount
+        if not observed:
+            return None
+
+        def quantile(q: float) -> str:
+            seen = 0
+            for bound, bucketCount in zip(self.buckets + (math.inf,), delta):
+                seen += bucketCount
+                if seen >= q * observed:
+                    return "inf" if math.isinf(bound) else f"<{bound * 1000:g}ms"
+            return "inf"
+        return f"n={observed} mean={(total - oldTotal) / observed * 1000:.2f}ms p50{quantile(0.5)} " \
+               f"p95{quantile(0.95)}"
+
+
+class Registry:
+    """
+    Holds every metric of the bot.
+
+    Metrics are created when modules are imported, but record nothing until the registry is enabled, so
+    instrumented code costs a single attribute check when metrics are off.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.logger = logging.getLogger("wafer")
+        self._metrics: Dict[Tuple[str, Labels], _Metric] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _get(self, cls, name: str, help: str, labels: Dict[str, str], **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._metrics:
+                self._metrics[key] = cls(self, name, help, key[1], **kwargs)
+            return self._metrics[key]
+
+    def counter(self, name: str, help: str, **labels: str) -> Counter:
+        """
+        Get a counter, creating it on first use.
+
+        :param name: The name of the metric, such as "wafer_clicks_total".
+        :param help: What the metric measures.
+        :param labels: Labels telling apart metrics of the same name, such as task="garden".
+        """
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, **labels: str) -> Gauge:
+        """Get a gauge, creating it on first use. See `counter`."""
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                  **labels: str) -> Histogram:
+        """Get a histogram, creating it on first use. See `counter`."""
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Get every metric in the Prometheus text format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+        lines = []
+        previous = None
+        for metric in metrics:
+            if metric.name != previous:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                previous = metric.name
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Optional[str]:
+        """
+        Describe what every metric recorded since the last summary, on one line.
+
+        :return: The summary, or None if nothing was recorded.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+        parts = []
+        for metric in metrics:
+            text = metric.summarize()
+            if text:
+                parts.append(f"{metric.name.replace('wafer_', '')}{_formatLabels(metric.labels)} {text}")
+        return "; ".join(parts) if parts else None
+
+    def logSummary(self) -> None:
+        text = self.summary()
+        if text:
+            self.logger.info(f"Metrics: {text}")
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """
+        Serve the metrics over HTTP at /metrics from a background thread.
+
+        :param port: The port to listen on.
+        :param host: The address to listen on. Only the local machine can connect by default.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        self.logger.info(f"Serving metrics at http://{host}:{self._server.server_address[1]}/metrics.")
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+registry = Registry()
+"""The metrics of the bot."""
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+
+
+def configureMetrics(config: Config) -> None:
+    """
+    Enable metrics and start the HTTP endpoint if the configuration asks for them.
+
+    :param config: The configuration.
+    """
+    registry.enabled = config.metricsEnabled
+    if registry.enabled and config.metricsPort:
+        try:
+            registry.serve(config.metricsPort)
+        except OSError as e:
+            registry.logger.error(f"Could not serve metrics on port {config.metricsPort}: {e}")
+
+
+@contextlib.contextmanager
+def timedAcquire(lock, metric: Histogram) -> Iterator[None]:
+    """
+    Hold a lock for the duration of a `with` block, recording how long it took to acquire.
+
+    :param lock: The lock.
+    :param metric: The histogram the wait is recorded in.
+    """
+    if registry.enabled:
+        start = time.perf_counter()
+        lock.acquire()
+        metric.observe(time.perf_counter() - start)
+    else:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
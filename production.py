@@ -0,0 +1,87 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import building as bu
+
+LEVEL_BONUS = 0.01
+"""Each level of a building raises its production by this fraction."""
+
+
+class CPSCalculator:
+    """
+    Works out the cookies per second from the save instead of reading it off the screen.
+
+    Every building in the save keeps the total amount of cookies it has produced, so the production of each
+    building is the growth of its total between two saves divided by the time between them. The rate is kept
+    per building owned, so when a building is bought, sold or levelled up its rate is rescaled straight away,
+    without waiting for the next save or touching the other buildings.
+    """
+
+    def __init__(self, smoothing: float = 0.5, minInterval: float = 5.0):
+        """
+        Initialize the calculator.
+
+        :param smoothing: How much a new measurement counts against the previous ones, from 0 to 1. Buffs such
+            as Frenzy change production for a while, so 1 follows them immediately.
+        :param minInterval: Saves closer together than this many seconds are skipped, as the totals are rounded.
+        """
+        self.smoothing = smoothing
+        self.minInterval = minInterval
+        self.rates: Dict[str, float] = {}
+        """The cookies per second produced by each building type, by lowercase name."""
+        self.cps: Optional[float] = None
+        """The total cookies per second, or None until two saves have been compared."""
+        self._baseRates: Dict[str, float] = {}
+        self._snapshot: Dict[str, Tuple[int, int, int]] = {}
+        self._snapshotTime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, buildings: Dict[str, bu.Building], timestamp: float) -> Optional[float]:
+        """
+        Measure production from a new save.
+
+        :param buildings: The buildings of the save, keyed by lowercase name.
+        :param timestamp: When the save was written, in seconds.
+        :return: The cookies per second, or None if it is not known yet.
+        """
+        with self._lock:
+            if self._snapshotTime is None:
+                self._takeSnapshot(buildings, timestamp)
+                return self.cps
+            elapsed = timestamp - self._snapshotTime
+            if elapsed < self.minInterval:
+                # too close to tell production apart from rounding, but owned buildings still count
+                self._rescale(buildings)
+                return self.cps
+            for name, b in buildings.items():
+                previous = self._snapshot.get(name)
+                if previous is None or (b.amount, b.level) != previous[:2] or b.totalCookiesProduced < previous[2]:
+                    # bought, sold or levelled during the interval, or reset by an ascension; the growth cannot be
+                    # split between the old and new amount, so only rescale the known rate
+                    continue
+                if b.amount == 0:
+                    continue
+                # stored per building and without the level bonus, so a new amount or level only needs rescaling
+                measured = (b.totalCookiesProduced - previous[2]) / elapsed / b.amount / (1 + LEVEL_BONUS * b.level)
+                old = self._baseRates.get(name)
+                self._baseRates[name] = measured if old is None else old + self.smoothing * (measured - old)
+            self._rescale(buildings)
+            self._takeSnapshot(buildings, timestamp)
+            return self.cps
+
+    def _rescale(self, buildings: Dict[str, bu.Building]) -> None:
+        """
+        Recompute the rate of every building from its production per unit and the amount owned now.
+        """
+        known = True
+        for name, b in buildings.items():
+            base = self._baseRates.get(name)
+            if base is None:
+                known = known and not b.amount
+                continue
+            self.rates[name] = base * (1 + LEVEL_BONUS * b.level) * b.amount
+        self.cps = sum(self.rates.values()) if known else None
+
+    def _takeSnapshot(self, buildings: Dict[str, bu.Building], timestamp: float) -> None:
+        self._snapshot = {name: (b.amount, b.level, b.totalCookiesProduced) for name, b in buildings.items()}
+        self._snapshotTime = timestamp
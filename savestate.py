@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import building as bu
+import metrics
+
+_parseTime = metrics.histogram("wafer_save_parse_seconds", "Time spent decoding the save file.")
+
+
+class SaveState:
+    """
+    A decoded snapshot of the game's save file.
+
+    The file is only read and decoded again when it changes, so every part of the bot can share one
+    instance instead of decoding the save on its own. Changes are detected by modification time and size,
+    and a content hash avoids re-parsing when the game rewrites identical data.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize a save state. Nothing is read until `refresh` is called.
+
+        :param path: The location of the save file.
+        """
+        self.path = path
+        self.logger = logging.getLogger("wafer")
+        self.revision: int = 0
+        """Incremented every time new save data is parsed."""
+        self.modifiedTime: float = 0.0
+        """The modification time of the file the current data was parsed from."""
+
+        self._lock = threading.Lock()
+        self._statKey: Optional[Tuple[int, int]] = None
+        self._digest: Optional[bytes] = None
+        self._sections: List[str] = []
+        self._game: List[str] = []
+        self._buildingRows: Dict[str, List[str]] = {}
+        self._buildings: Dict[str, bu.Building] = {}
+
+    def refresh(self) -> bool:
+        """
+        Re-read the save file if it was modified since the last call.
+
+        :return: True if new data was parsed, False if the save is unchanged.
+        :rtype: bool
+        """
+        with self._lock:
+            stat = os.stat(self.path)
+            key = (stat.st_mtime_ns, stat.st_size)
+            if key == self._statKey:
+                return False
+            with open(self.path, "rb") as file:
+                raw = file.read()
+            digest = hashlib.blake2b(raw, digest_size=16).digest()
+            if digest != self._digest:
+                # only remember the file once it parsed, so a partially written save is read again next time
+                with _parseTime.time():
+                    self._parse(raw)
+            self._statKey = key
+            self.modifiedTime = stat.st_mtime
+            if digest == self._digest:
+                return False
+            self._digest = digest
+            self.revision += 1
+            return True
+
+    def _parse(self, raw: bytes) -> None:
+        # Data has a lot of extra information at the end for some reason after the %.
+        data = raw.split(b"%")[0]
+        missing_padding = len(data) % 4
+        if missing_padding:
+            data += b'=' * (4 - missing_padding)
+        self._sections = base64.urlsafe_b64decode(data).decode("utf-8", errors="replace").split("|")
+        self._game = self._sections[4].split(";")
+        rows = [row.split(",") for row in self._sections[5].split(";")]
+
+        buildings = {}
+        buildingRows = {}
+        for typ, row in zip(bu.BUILDING_TYPES, rows):
+            bui = typ(int(row[0]), int(row[1]), int(float(row[2])), int(row[3]), int(row[6]))
+            buildings[bui.name.lower()] = bui
+            buildingRows[bui.name.lower()] = row
+        self._buildings = buildings
+        self._buildingRows = buildingRows
+
+    def section(self, index: int) -> str:
+        """
+        Get a raw "|"-separated section of the decoded save.
+
+        :param index: The index of the section.
+        :return: The section as a string.
+        """
+        return self._sections[index]
+
+    @property
+    def cookies(self) -> float:
+        """The amount of cookies currently in the bank."""
+        return float(self._game[0])
+
+    @property
+    def cookieClicks(self) -> int:
+        """The amount of times the main cookie was clicked, over all ascensions."""
+        return int(float(self._game[2]))
+
+    @property
+    def highestAscensionCPS(self) -> float:
+        """The highest CPS reached during this ascension. Stock prices are measured in seconds of it."""
+        return float(self._game[51])
+
+    @property
+    def buildings(self) -> Dict[str, bu.Building]:
+        """The buildings owned, keyed by lowercase name."""
+        return self._buildings
+
+    def buildingMinigame(self, name: str) -> str:
+        """
+        Get the minigame save string stored with a building.
+
+        :param name: The lowercase name of the building, such as "farm".
+        :return: The minigame string of that building.
+        """
+        return self._buildingRows[name][4]
+
+    @property
+    def gardenData(self) -> str:
+        """The save string of the garden minigame, stored with the farms."""
+        return self.buildingMinigame("farm")
+
+    @property
+    def marketData(self) -> str:
+        """The save string of the stock market minigame, stored with the banks."""
+        return self.buildingMinigame("bank")
+
+
+_saveStates: Dict[str, SaveState] = {}
+_saveStatesLock = threading.Lock()
+
+
+def getSaveState(path: str) -> SaveState:
+    """
+    Get the shared save state of a save file, creating it on first use.
+
+    :param path: The location of the save file.
+    :return: The save state shared by every caller using this path.
+    """
+    with _saveStatesLock:
+        if path not in _saveStates:
+            _saveStates[path] = SaveState(path)
+        return _saveStates[path]
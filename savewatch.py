@@ -0,0 +1,200 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from savestate import SaveState
+
+# inotify constants from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+TOPICS: Dict[str, Callable[[SaveState], object]] = {
+    "cookies": lambda save: save.cookies,
+    "clicks": lambda save: save.cookieClicks,
+    "buildings": lambda save: tuple((b.amount, b.level) for b in save.buildings.values()),
+    "garden": lambda save: save.gardenData,
+    "market": lambda save: save.marketData,
+}
+"""The parts of the save that can be subscribed to, with how to extract each one for comparison."""
+
+
+class _Inotify:
+    """
+    Minimal ctypes wrapper around Linux inotify, watching one directory.
+    """
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def read(self, timeout: float) -> List[str]:
+        """
+        Wait for events.
+
+        :param timeout: The maximum amount of seconds to wait.
+        :return: The names of the files that were written to. Empty if the timeout passed.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buffer = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset < len(buffer):
+            _, _, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            names.append(os.fsdecode(buffer[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class SaveWatcher:
+    """
+    Watches the save file and notifies subscribers when the part of the save they care about changes.
+
+    Uses inotify on Linux and falls back to polling the file's modification time elsewhere. Bursts of writes
+    are debounced so a save is only parsed once the game has finished writing it.
+    """
+
+    def __init__(self, save: SaveState, debounce: float = 0.5, pollInterval: float = 1.0):
+        """
+        Initialize the watcher. Call `start` to begin watching.
+
+        :param save: The save state to refresh when the file changes.
+        :param debounce: Seconds without writes before a change is processed.
+        :param pollInterval: Seconds between checks when inotify is unavailable.
+        """
+        self.save = save
+        self.debounce = debounce
+        self.pollInterval = pollInterval
+        self.logger = logging.getLogger("wafer")
+        self.running = False
+        self._subscribers: Dict[str, List[Callable[[SaveState], None]]] = {topic: [] for topic in TOPICS}
+        self._snapshot: Dict[str, object] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, topic: str, callback: Callable[[SaveState], None]) -> None:
+        """
+        Register a function to be called when part of the save changes.
+
+        Callbacks run on the watcher thread, so they should only record that work is due.
+
+        :param topic: One of "cookies", "buildings", "garden" or "market".
+        :param callback: Called with the refreshed save state.
+        """
+        if topic not in TOPICS:
+            raise ValueError(f"Unknown save topic {topic}.")
+        self._subscribers[topic].append(callback)
+
+    def start(self) -> None:
+        """
+        Start watching on a background thread.
+
+        :rtype: None
+        """
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="save-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop watching. The background thread exits within one poll interval.
+
+        :rtype: None
+        """
+        self.running = False
+
+    def check(self) -> List[str]:
+        """
+        Refresh the save and notify the subscribers of every topic that changed.
+
+        :return: The topics that changed.
+        """
+        try:
+            if not self.save.refresh() and self._snapshot:
+                return []
+        except (OSError, ValueError, IndexError):
+            # the file is most likely still being written; the next event or poll will retry it
+            self.logger.debug("Could not parse the save file yet.", exc_info=True)
+            return []
+
+        changed = []
+        for topic, extract in TOPICS.items():
+            value = extract(self.save)
+            if self._snapshot.get(topic) != value:
+                self._snapshot[topic] = value
+                changed.append(topic)
+        for topic in changed:
+            for callback in self._subscribers[topic]:
+                try:
+                    callback(self.save)
+                except Exception:
+                    self.logger.exception(f"Issue notifying {topic} subscriber!")
+        return changed
+
+    def _run(self) -> None:
+        inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                inotify = _Inotify(os.path.dirname(os.path.abspath(self.save.path)))
+            except OSError:
+                self.logger.info("Could not use inotify, polling the save file instead.")
+        self.check()
+        try:
+            if inotify:
+                self._watchInotify(inotify)
+            else:
+                self._watchPolling()
+        finally:
+            if inotify:
+                inotify.close()
+
+    def _watchInotify(self, inotify: _Inotify) -> None:
+        name = os.path.basename(self.save.path)
+        while self.running:
+            if name not in inotify.read(self.pollInterval):
+                continue
+            # keep draining events until the game has stopped writing for a while
+            while self.running and name in inotify.read(self.debounce):
+                pass
+            self.check()
+
+    def _watchPolling(self) -> None:
+        last = None
+        while self.running:
+            time.sleep(self.pollInterval)
+            try:
+                stat = os.stat(self.save.path)
+            except OSError:
+                continue
+            key = (stat.st_mtime_ns, stat.st_size)
+            if key == last:
+                continue
+            last = key
+            # wait until the file stops changing
+            time.sleep(self.debounce)
+            self.check()
@@ -0,0 +1,210 @@
+import argparse
+import itertools
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from smarket.policy import TradingPolicy, restingDiff
+from smarket.simulator import MarketPaths, MarketSimulator, STOCK_COUNT
+
+
+class BacktestResult(NamedTuple):
+    """
+    Summary of a policy replayed over a set of price histories. Money is measured in $, like stock values.
+    """
+    policy: TradingPolicy
+    profit: float
+    """Mean realized profit per path."""
+    profitStd: float
+    """Standard deviation of the realized profit across paths."""
+    trades: float
+    """Mean amount of completed round trips per path."""
+    winRate: float
+    """Fraction of completed round trips that made money."""
+    meanHoldTicks: float
+    """Mean amount of ticks a position was held before being sold."""
+    maxDrawdown: float
+    """Mean over paths of the largest drop of the marked-to-market equity from its running peak."""
+
+    def __str__(self):
+        return f"{self.policy}: profit ${self.profit:.2f} (±{self.profitStd:.2f}), {self.trades:.1f} trades, " \
+               f"{self.winRate * 100:.1f}% won, held {self.meanHoldTicks:.1f} ticks, " \
+               f"drawdown ${self.maxDrawdown:.2f}"
+
+
+class Backtester:
+    """
+    Replays price histories through a `TradingPolicy` without touching the game.
+
+    Every path and stock is processed at once for each tick. The bot is assumed to always be able to afford
+    a purchase, so results compare policies rather than predict the cookies made.
+    """
+
+    def __init__(self, history: MarketPaths, bankLevel: int = 1, brokers: int = 0,
+                 quantities: Optional[Sequence[float]] = None):
+        """
+        Initialize a backtester.
+
+        :param history: The histories to replay, shaped (ticks, paths, 16) or (ticks, 16).
+        :param bankLevel: The level of the bank, which sets the resting values and the cap.
+        :param brokers: The amount of brokers, which lowers the purchase overhead.
+        :param quantities: The amount of each stock bought per trade. Defaults to one of each.
+        """
+        if history.values.ndim == 2:
+            history = MarketPaths(*(a[:, np.newaxis, :] for a in history))
+        self.history = history
+        self.restingValues = 10.0 * (np.arange(STOCK_COUNT) + 1) + (bankLevel - 1)
+        self.cap = 100 + 3 * (bankLevel - 1)
+        self.overhead = 1 + (0.2 * math.pow(0.95, brokers))
+        self.quantities = np.ones(STOCK_COUNT) if quantities is None else np.asarray(quantities, dtype=np.float64)
+
+    def run(self, policy: TradingPolicy) -> BacktestResult:
+        """
+        Replay every history through a policy.
+
+        :param policy: The policy to evaluate.
+        :return: The summary of the trades made.
+        """
+        ticks, paths, _ = self.history.values.shape
+        held = np.zeros((paths, STOCK_COUNT), dtype=np.int8)
+        cost = np.zeros((paths, STOCK_COUNT))
+        boughtAt = np.zeros((paths, STOCK_COUNT), dtype=np.int64)
+        realized = np.zeros(paths)
+        peak = np.zeros(paths)
+        drawdown = np.zeros(paths)
+        trades = wins = holdTicks = 0
+
+        for tick in range(ticks):
+            values = self.history.values[tick].astype(np.float64)
+            modes = self.history.modes[tick]
+            durations = self.history.durations[tick]
+            diff = restingDiff(values, self.restingValues)
+
+            sell = policy.shouldSell(diff, modes, durations, held, values >= self.cap)
+            if sell.any():
+                gains = values[sell] * np.broadcast_to(self.quantities, held.shape)[sell] - cost[sell]
+                np.add.at(realized, np.nonzero(sell)[0], gains)
+                trades += gains.size
+                wins += int((gains > 0).sum())
+                holdTicks += int((tick - boughtAt[sell]).sum())
+                held[sell] = 0
+                cost[sell] = 0
+
+            buy = policy.shouldBuy(diff, modes, durations, held)
+            if buy.any():
+                held[buy] = 1
+                cost[buy] = (values * self.quantities * self.overhead)[buy]
+                boughtAt[buy] = tick
+
+            equity = realized + (held * (values * self.quantities) - cost).sum(axis=1)
+            np.maximum(peak, equity, out=peak)
+            np.maximum(drawdown, peak - equity, out=drawdown)
+
+        return BacktestResult(
+            policy=policy,
+            profit=float(realized.mean()),
+            profitStd=float(realized.std()),
+            trades=trades / paths,
+            winRate=wins / trades if trades else 0.0,
+            meanHoldTicks=holdTicks / trades if trades else 0.0,
+            maxDrawdown=float(drawdown.mean())
+        )
+
+
+_worker: Optional[Backtester] = None
+_workerMemory: List[shared_memory.SharedMemory] = []
+
+_SharedArray = Tuple[str, Tuple[int, ...], str]
+"""The name, shape and dtype of an array in shared memory."""
+
+
+def _share(history: MarketPaths) -> List[shared_memory.SharedMemory]:
+    blocks = []
+    for array in history:
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+    return blocks
+
+
+def _initWorker(arrays: Sequence[_SharedArray], bankLevel: int, brokers: int) -> None:
+    # the histories are simulated once by the parent and only mapped here, so the pool holds one copy of them
+    global _worker
+    _workerMemory[:] = [shared_memory.SharedMemory(name=name) for name, _, _ in arrays]
+    history = MarketPaths(*(np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                            for block, (_, shape, dtype) in zip(_workerMemory, arrays)))
+    _worker = Backtester(history, bankLevel=bankLevel, brokers=brokers)
+
+
+def _runWorker(params: Dict) -> BacktestResult:
+    return _worker.run(TradingPolicy(**params))
+
+
+def sweep(grid: Dict[str, Sequence], paths: int = 500, ticks: int = 3000, seed: int = 0, bankLevel: int = 1,
+          brokers: int = 0, workers: Optional[int] = None) -> List[BacktestResult]:
+    """
+    Evaluate every combination of policy parameters on the same simulated histories, across a process pool.
+
+    The histories are simulated once and shared with the workers, so memory does not grow with their amount.
+
+    :param grid: Lists of values for `TradingPolicy` arguments, such as {"buyLimit": [-95, -90], "sellLimit": [40]}.
+    :param paths: The amount of simulated markets.
+    :param ticks: The length of each simulated market, in ticks (minutes).
+    :param seed: Seed of the simulation.
+    :param bankLevel: The level of the bank.
+    :param brokers: The amount of brokers.
+    :param workers: The amount of processes. Defaults to the amount of CPUs.
+    :return: The results of every combination, most profitable first.
+    """
+    names = list(grid)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    workers = workers or os.cpu_count() or 1
+    history = MarketSimulator(paths=paths, bankLevel=bankLevel, seed=seed).run(ticks)
+    blocks = _share(history)
+    arrays = [(block.name, array.shape, array.dtype.str) for block, array in zip(blocks, history)]
+    del history
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(combinations)), initializer=_initWorker,
+                                 initargs=(arrays, bankLevel, brokers)) as executor:
+            results = list(executor.map(_runWorker, combinations,
+                                        chunksize=max(1, len(combinations) // (workers * 4))))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return sorted(results, key=lambda r: r.profit, reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sweep stock market trading thresholds over simulated markets.")
+    parser.add_argument("--buy", type=float, nargs="+", default=[-95.0, -90.0, -80.0, -70.0],
+                        help="buyLimit values to try")
+    parser.add_argument("--sell", type=float, nargs="+", default=[20.0, 40.0, 60.0, 80.0],
+                        help="sellLimit values to try")
+    parser.add_argument("--fast-rise-sell", type=int, nargs="+", default=[400],
+                        help="fastRiseSellDuration values to try")
+    parser.add_argument("--paths", type=int, default=500)
+    parser.add_argument("--ticks", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bank-level", type=int, default=1)
+    parser.add_argument("--brokers", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10, help="amount of results to print")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="[%(levelname)s][%(asctime)s] %(message)s", level=logging.INFO,
+                        datefmt="%m/%d/%Y %H:%M:%S")
+    results = sweep({"buyLimit": args.buy, "sellLimit": args.sell, "fastRiseSellDuration": args.fast_rise_sell},
+                    paths=args.paths, ticks=args.ticks, seed=args.seed, bankLevel=args.bank_level,
+                    brokers=args.brokers, workers=args.workers)
+    for result in results[:args.top]:
+        logging.getLogger("wafer").info(str(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from smarket.simulator import MarketPaths, STOCK_COUNT
+from smarket.stock import Stock, STOCK_DATA
+
+_COLUMNS = {
+    "times": (np.float64, ()),
+    "values": (np.float32, (STOCK_COUNT,)),
+    "modes": (np.int8, (STOCK_COUNT,)),
+    "deltas": (np.float32, (STOCK_COUNT,)),
+    "durations": (np.int16, (STOCK_COUNT,)),
+}
+_INITIAL_CAPACITY = 1024
+
+
+class HistorySlice(NamedTuple):
+    """
+    A range of recorded ticks. Per-stock arrays are shaped (ticks, 16), or (ticks,) when one symbol was asked for.
+    The arrays are views of the memory-mapped files and must not be modified.
+    """
+    times: np.ndarray
+    values: np.ndarray
+    modes: np.ndarray
+    deltas: np.ndarray
+    durations: np.ndarray
+
+    def asPaths(self) -> MarketPaths:
+        """
+        Convert the slice into the format used by the simulator and the backtester.
+
+        :return: The values, modes and durations, shaped (ticks, 16).
+        """
+        return MarketPaths(self.values, self.modes, self.durations)
+
+
+class PriceHistory:
+    """
+    Columnar on-disk record of every market tick seen by the bot.
+
+    Each column is a fixed-width binary file that is memory-mapped, so months of history open instantly and
+    range queries only touch the rows they return. A small JSON index holds the amount of rows.
+    """
+
+    def __init__(self, directory: str = "smarket/history"):
+        """
+        Open the history, creating it if needed.
+
+        :param directory: The folder holding the column files.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._indexPath = os.path.join(directory, "index.json")
+        self.count = 0
+        capacity = _INITIAL_CAPACITY
+        if os.path.exists(self._indexPath):
+            with open(self._indexPath, "r") as f:
+                index = json.load(f)
+            self.count = index["count"]
+            capacity = index["capacity"]
+        self._columns: Dict[str, np.memmap] = {}
+        self._open(capacity)
+
+    def _open(self, capacity: int) -> None:
+        self.capacity = capacity
+        for name, (dtype, shape) in _COLUMNS.items():
+            path = os.path.join(self.directory, f"{name}.bin")
+            size = capacity * np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            self._columns[name] = np.memmap(path, dtype=dtype, mode="r+", shape=(capacity,) + shape)
+
+    def _grow(self) -> None:
+        for column in self._columns.values():
+            column.flush()
+        self._columns.clear()
+        self._open(self.capacity * 2)
+
+    def _writeIndex(self) -> None:
+        tmp = self._indexPath + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"count": self.count, "capacity": self.capacity}, f)
+        os.replace(tmp, self._indexPath)
+
+    def record(self, stocks: List[Stock], timestamp: Optional[float] = None) -> bool:
+        """
+        Append one tick of all 16 stocks. A tick identical to the previous one is ignored, which happens
+        when the same save is read more than once.
+
+        :param stocks: The stocks of the market, ordered by id.
+        :param timestamp: When the tick was observed, in seconds. Defaults to now.
+        :return: True if the tick was recorded.
+        """
+        row = {
+            "values": np.array([s.value for s in stocks], dtype=np.float32),
+            "modes": np.array([s.mode for s in stocks], dtype=np.int8),
+            "deltas": np.array([s.delta for s in stocks], dtype=np.float32),
+            "durations": np.array([s.duration for s in stocks], dtype=np.int16),
+        }
+        if self.count and all(np.array_equal(self._columns[name][self.count - 1], value)
+                              for name, value in row.items()):
+            return False
+        if self.count == self.capacity:
+            self._grow()
+
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.count:
+            # rows are kept in time order so that range queries can bisect
+            timestamp = max(timestamp, float(self._columns["times"][self.count - 1]))
+        self._columns["times"][self.count] = timestamp
+        for name, value in row.items():
+            self._columns[name][self.count] = value
+        self.count += 1
+        for column in self._columns.values():
+            column.flush()
+        self._writeIndex()
+        return True
+
+    def query(self, symbol: str = "", start: Optional[float] = None, end: Optional[float] = None) -> HistorySlice:
+        """
+        Get the ticks recorded within a time range.
+
+        :param symbol: The symbol of one stock to return, such as "CRL". Defaults to every stock.
+        :param start: The earliest time to include, in seconds. Defaults to the first tick.
+        :param end: The latest time to include, in seconds. Defaults to the last tick.
+        :return: The recorded ticks in that range.
+        """
+        times = self._columns["times"][:self.count]
+        first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        last = self.count if end is None else int(np.searchsorted(times, end, side="right"))
+        columns = {name: column[first:last] for name, column in self._columns.items()}
+        if symbol:
+            stockId = next((data[2] for data in STOCK_DATA.values() if data[1] == symbol), None)
+            if stockId is None:
+                raise KeyError(f"Unknown stock symbol {symbol}")
+            columns = {name: (column[:, stockId] if column.ndim == 2 else column) for name, column in columns.items()}
+        return HistorySlice(**columns)
+
+    def close(self) -> None:
+        for column in self._columns.values():
+            column.flush()
+        self._columns.clear()
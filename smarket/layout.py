@@ -0,0 +1,132 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from smarket.stock import STOCK_DATA
+from vision.frames import FrameProvider
+from vision.templates import Box, TemplateRegistry
+
+_SAME_LINE = 5
+"""Buttons whose positions differ by less than this many pixels are on the same row or column."""
+
+
+def _lines(positions: List[int]) -> List[int]:
+    """Group nearby coordinates together and return the first coordinate of each group."""
+    lines: List[int] = []
+    for p in sorted(positions):
+        if not lines or p - lines[-1] > _SAME_LINE:
+            lines.append(p)
+    return lines
+
+
+class MarketLayout:
+    """
+    Map of the stock market panel.
+
+    The panel is located by finding its buy and sell buttons. Hidden stocks have no buttons, so the buttons
+    found, in reading order, are matched to the ids of the stocks that should be visible. If the amount of
+    buttons does not match, such as when part of the panel is scrolled off the screen, the map is refused
+    rather than risk trading the wrong stock. The map is checked against the current frame by matching the
+    first button only.
+    """
+
+    def __init__(self, frames: FrameProvider, templates: TemplateRegistry):
+        """
+        Initialize the layout. Nothing is located until `calibrate` or `ensure` is called.
+
+        :param frames: The frame provider to capture the screen with.
+        :param templates: The registry holding the button templates.
+        """
+        self.frames = frames
+        self.templates = templates
+        self.logger = logging.getLogger("wafer")
+        self.stockIds: List[int] = list(range(len(STOCK_DATA)))
+        """The ids of the stocks shown in the market, in order. Set from the save before calibrating."""
+        self.anchor: Optional[Box] = None
+        """The first buy button on the panel."""
+        self.buttons: Dict[int, Tuple[Tuple[float, float], Tuple[float, float]]] = {}
+        """The centers of the buy and sell buttons, by stock id."""
+        self._calibratedIds: List[int] = []
+
+    def calibrate(self, frame: Optional[np.ndarray] = None) -> bool:
+        """
+        Locate the panel on the screen and match its buttons to `stockIds`.
+
+        :param frame: The frame to search. Defaults to the current frame.
+        :return: True if a pair of buttons was found for every visible stock.
+        """
+        frame = self.frames.grab() if frame is None else frame
+        buys = self.templates.matchAll(frame, "buyStockButton")
+        sells = self.templates.matchAll(frame, "sellStockButton")
+        self.anchor = None
+        self.buttons = {}
+        self._calibratedIds = list(self.stockIds)
+        if not buys or not sells:
+            return False
+        if len(buys) != len(self.stockIds) or len(sells) != len(self.stockIds):
+            self.logger.error(f"Found {len(buys)} buy and {len(sells)} sell buttons for {len(self.stockIds)} "
+                              f"visible stocks. Scroll the whole market panel into view.")
+            return False
+
+        # reading order, with buttons on the same row sorted left to right even if their tops differ slightly
+        rows = _lines([b.top for b in buys])
+        buys = sorted(buys, key=lambda b: (sum(1 for r in rows if r <= b.top), b.left))
+        for stockId, buy in zip(self.stockIds, buys):
+            bx, by = _center(buy)
+            # the sell button of a stock is the one closest to its buy button
+            sell = min((_center(s) for s in sells), key=lambda c: (c[0] - bx) ** 2 + (c[1] - by) ** 2)
+            self.buttons[stockId] = ((bx, by), sell)
+        self.anchor = buys[0]
+        self.logger.info(f"Located market panel at ({self.anchor.left}, {self.anchor.top}) with "
+                         f"{len(self.buttons)} stocks in {len(rows)} row(s).")
+        return True
+
+    def validate(self, frame: Optional[np.ndarray] = None) -> bool:
+        """
+        Cheaply check that the panel has not moved by matching the first buy button where it is expected.
+
+        :param frame: The frame to check. Defaults to the current frame.
+        :return: True if the map still matches the screen and the visible stocks.
+        """
+        if self.anchor is None or self._calibratedIds != self.stockIds:
+            return False
+        frame = self.frames.grab() if frame is None else frame
+        pad = _SAME_LINE
+        region = Box(max(0, self.anchor.left - pad), max(0, self.anchor.top - pad),
+                     self.anchor.width + 2 * pad, self.anchor.height + 2 * pad)
+        box = self.templates.match(frame, "buyStockButton", region=region)
+        return box is not None and abs(box.left - self.anchor.left) <= 1 and abs(box.top - self.anchor.top) <= 1
+
+    def ensure(self) -> bool:
+        """
+        Make sure the map matches the screen, locating the panel again if needed.
+
+        :return: True if the map is usable.
+        """
+        frame = self.frames.grab()
+        return self.validate(frame) or self.calibrate(frame)
+
+    def buyPoint(self, stockId: int) -> Optional[Tuple[float, float]]:
+        """
+        Get the center of the buy button of a stock.
+
+        :param stockId: The id of the stock.
+        :return: The coordinates, or None if the stock is not on the map.
+        """
+        buttons = self.buttons.get(stockId)
+        return buttons[0] if buttons else None
+
+    def sellPoint(self, stockId: int) -> Optional[Tuple[float, float]]:
+        """
+        Get the center of the sell button of a stock.
+
+        :param stockId: The id of the stock.
+        :return: The coordinates, or None if the stock is not on the map.
+        """
+        buttons = self.buttons.get(stockId)
+        return buttons[1] if buttons else None
+
+
+def _center(box: Box) -> Tuple[float, float]:
+    return box.left + box.width / 2, box.top + box.height / 2
@@ -0,0 +1,183 @@
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+import toml
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchases (
+    id INTEGER PRIMARY KEY,
+    time INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    purchasedFor REAL NOT NULL,
+    value REAL NOT NULL,
+    open INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS openPurchases ON purchases (symbol) WHERE open = 1;
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY,
+    time INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    soldFor REAL NOT NULL,
+    soldValue REAL NOT NULL,
+    boughtFor REAL,
+    boughtValue REAL
+);
+CREATE INDEX IF NOT EXISTS salesBySymbol ON sales (symbol, time);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class TradeLedger:
+    """
+    Record of every stock the bot bought and sold, used to keep track of profits.
+
+    Trades are appended to a SQLite database, and open positions are indexed by symbol, so recording a trade
+    costs the same no matter how long the bot has been trading.
+    """
+
+    def __init__(self, path: str = "smarket/mdata.sqlite3", legacyPath: str = "smarket/mdata.toml"):
+        """
+        Open the ledger, creating it if needed. Records from the old TOML file are migrated on first use.
+
+        :param path: The location of the database.
+        :param legacyPath: The location of the TOML file used by older versions.
+        """
+        self.logger = logging.getLogger("wafer")
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+        if os.path.exists(legacyPath):
+            self.migrate(legacyPath)
+
+    def migrate(self, legacyPath: str) -> None:
+        """
+        Import the inventory and sales of a TOML record file, then rename it so it is only imported once.
+
+        The import is recorded in the same transaction as the rows, so a crash before the rename does not import
+        the file twice. Malformed entries are skipped.
+
+        :param legacyPath: The location of the TOML file.
+        :rtype: None
+        """
+        if self.connection.execute("SELECT 1 FROM meta WHERE key = 'legacyMigrated'").fetchone():
+            self.logger.info(f"{legacyPath} was already migrated.")
+            self._retire(legacyPath)
+            return
+        try:
+            with open(legacyPath, "r") as f:
+                data = toml.load(f)
+        except (toml.TomlDecodeError, TypeError):
+            self.logger.error(f"Could not read {legacyPath}, it was not migrated.")
+            return
+
+        with self.connection:
+            for key, entry in data.get("inventory", {}).items():
+                try:
+                    row = (_keyTime(key), str(entry["symbol"]), int(entry["amount"]), float(entry["purchasedFor"]),
+                           float(entry["value"]))
+                except (KeyError, TypeError, ValueError):
+                    self.logger.warning(f"Skipping malformed purchase {key} in {legacyPath}.")
+                    continue
+                self.connection.execute(
+                    "INSERT INTO purchases (time, symbol, amount, purchasedFor, value) VALUES (?, ?, ?, ?, ?)", row)
+            for key, entry in data.get("sold", {}).items():
+                try:
+                    row = (_keyTime(key), str(entry["symbol"]), int(entry["amount"]), float(entry["soldFor"]),
+                           float(entry["soldValue"]), entry.get("boughtFor"), entry.get("boughtValue"))
+                except (KeyError, TypeError, ValueError):
+                    self.logger.warning(f"Skipping malformed sale {key} in {legacyPath}.")
+                    continue
+                self.connection.execute(
+                    "INSERT INTO sales (time, symbol, amount, soldFor, soldValue, boughtFor, boughtValue) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('legacyMigrated', ?)",
+                                    (os.path.abspath(legacyPath),))
+        self.logger.info(f"Migrated purchase record from {legacyPath}.")
+        self._retire(legacyPath)
+
+    def _retire(self, legacyPath: str) -> None:
+        try:
+            os.replace(legacyPath, legacyPath + ".migrated")
+        except OSError:
+            self.logger.warning(f"Could not rename {legacyPath}, it will not be imported again.")
+
+    def recordPurchase(self, symbol: str, amount: int, purchasedFor: float, value: float,
+                       timestamp: Optional[int] = None) -> None:
+        """
+        Open a position.
+
+        :param symbol: The symbol of the stock that was bought.
+        :param amount: The amount of stock that was bought.
+        :param purchasedFor: The amount of cookies spent, including overhead.
+        :param value: The value of the stock at the time of purchase.
+        :param timestamp: When the purchase happened, in seconds. Defaults to now.
+        :rtype: None
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO purchases (time, symbol, amount, purchasedFor, value) VALUES (?, ?, ?, ?, ?)",
+                (int(time.time()) if timestamp is None else timestamp, symbol, amount, purchasedFor, value))
+
+    def openPosition(self, symbol: str) -> Optional[Dict]:
+        """
+        Get the most recent open position of a stock.
+
+        :param symbol: The symbol of the stock.
+        :return: The purchase as a dictionary, or None if the bot does not hold this stock.
+        """
+        row = self.connection.execute(
+            "SELECT * FROM purchases WHERE symbol = ? AND open = 1 ORDER BY id DESC LIMIT 1", (symbol,)).fetchone()
+        return dict(row) if row else None
+
+    def recordSale(self, symbol: str, amount: int, soldFor: float, soldValue: float,
+                   timestamp: Optional[int] = None) -> Dict:
+        """
+        Record a sale and close the open position it came from.
+
+        :param symbol: The symbol of the stock that was sold.
+        :param amount: The amount of stock that was sold.
+        :param soldFor: The amount of cookies gained.
+        :param soldValue: The value of the stock at the time of sale.
+        :param timestamp: When the sale happened, in seconds. Defaults to now.
+        :return: The recorded sale as a dictionary.
+        """
+        position = self.openPosition(symbol)
+        sale = {
+            "time": int(time.time()) if timestamp is None else timestamp,
+            "symbol": symbol,
+            "amount": amount,
+            "soldFor": soldFor,
+            "soldValue": soldValue,
+            "boughtFor": position["purchasedFor"] if position else None,
+            "boughtValue": position["value"] if position else None,
+        }
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO sales (time, symbol, amount, soldFor, soldValue, boughtFor, boughtValue) "
+                "VALUES (:time, :symbol, :amount, :soldFor, :soldValue, :boughtFor, :boughtValue)", sale)
+            if position:
+                # closing the position takes it out of the index, which avoids selling it twice
+                self.connection.execute("UPDATE purchases SET open = 0 WHERE id = ?", (position["id"],))
+        return sale
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _keyTime(key: str) -> int:
+    """Get the timestamp from a "<time>-<symbol>" key of the TOML record file."""
+    try:
+        return int(key.split("-")[0])
+    except ValueError:
+        return 0
@@ -1,16 +1,30 @@
 import logging
 import math
-import os
-import time
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional, Tuple
 
-import pyautogui
-import toml
 
+import controls
 import helpers
 from building import Building
 from config import Config
-from smarket.stock import Stock, STOCK_DATA, StockMode
+from savestate import getSaveState
+from smarket.history import PriceHistory
+from smarket.layout import MarketLayout
+from smarket.ledger import TradeLedger
+from smarket.policy import TradingPolicy
+from smarket.stock import Stock, STOCK_DATA
+
+
+class MarketEconomics(NamedTuple):
+    """
+    The values from the save that decide what stocks cost, read once per evaluation.
+    """
+    cookies: float
+    """The amount of cookies in the bank."""
+    ascensionCPS: float
+    """The highest CPS of this ascension. Stock values are measured in seconds of it."""
+    overhead: float
+    """The multiplier applied to purchases, which brokers reduce."""
 
 
 class Market:
@@ -18,11 +32,21 @@ class Market:
     The class that contains functions to manage the stock market minigame.
     """
 
-    def __init__(self, config: Config, saveData: str, buildings: Dict[str, Building]):
+    def __init__(self, config: Config, saveData: str, buildings: Dict[str, Building],
+                 ledger: Optional[TradeLedger] = None, history: Optional[PriceHistory] = None):
+        """
+        :param config: The configuration.
+        :param saveData: The save string of the market minigame.
+        :param buildings: Information on the buildings currently owned.
+        :param ledger: Where trades are recorded. Defaults to the ledger in the smarket folder.
+        :param history: Where prices are recorded. Defaults to the history in the smarket folder.
+        """
         data = saveData.split(" ")
         gen = data[0].split(":")
         self.logger = logging.getLogger("wafer")
-        self.filename = "smarket/mdata.toml"
+        self.ledger = ledger if ledger is not None else TradeLedger()
+        self.history = history if history is not None else PriceHistory()
+        self.layout = MarketLayout(helpers.frameProvider(), helpers.templates)
         self.bank_level = buildings["bank"].level
 
         self.officeLevel: int = int(gen[0])
@@ -32,7 +56,9 @@ class Market:
 
         stockSaves = data[1].split("!")
         self.config = config
+        self.policy = TradingPolicy.fromConfig(config)
         self.stocks: List[Stock] = self.loadStocks(stockSaves, buildings)
+        self.history.record(self.stocks)
 
     def loadStocks(self, stockSaves: List[str], buildings: Dict[str, Building]):
         """
@@ -64,14 +90,16 @@ class Market:
                 index += 1
         return stocks
 
-    def updateStocks(self, stockSaves: List[str], buildings: Dict[str, Building]):
+    def updateStocks(self, stockSaves: List[str], buildings: Dict[str, Building], timestamp: Optional[float] = None):
         """
-        Update the class stock list with a fresh stock list.
+        Update the class stock list with a fresh stock list, and add the tick to the price history.
 
         :param stockSaves: The data associated with the market minigame.
         :param buildings: Information on the buildings currently owned.
+        :param timestamp: When the data was saved, in seconds. Defaults to now.
         """
         newStocks = self.loadStocks(stockSaves, buildings)
+        self.history.record(newStocks, timestamp)
         for count, stock in enumerate(self.stocks):
             newStocks[count].boughtFor = stock.boughtFor
             newStocks[count].lifetimeEarnings = stock.lifetimeEarnings
@@ -107,50 +135,84 @@ class Market:
         value = stock.value * quantity
         return round(value + (value * 0.2 * math.pow(0.95, self.brokers)), 2)
 
-    def getStockBuyPriceRaw(self, stock: Stock, quantity: int) -> float:
+    def getEconomics(self) -> MarketEconomics:
+        """
+        Read the values that decide stock prices from the save file.
+
+        :return: A snapshot of the current cookies, ascension CPS and broker overhead.
+        """
+        save = getSaveState(self.config.saveLocation)
+        save.refresh()
+        return MarketEconomics(
+            cookies=save.cookies,
+            ascensionCPS=save.highestAscensionCPS,
+            overhead=1 + (0.2 * math.pow(0.95, self.brokers))
+        )
+
+    def getStockBuyPriceRaw(self, stock: Stock, quantity: int, economics: Optional[MarketEconomics] = None) -> float:
         """
         Get the amount of cookies required to buy this stock.
 
         :param stock: The stock being purchased.
         :param quantity: The amount of stock being bought.
+        :param economics: The snapshot to price with. Read from the save file if omitted.
         :return: The amount of cookies required to buy the stock.
         """
-        ascCPS = helpers.getHighestAscensionCPS(self.config)
-        overhead = 1 + (0.2 * math.pow(0.95, self.brokers))
-        return ascCPS * stock.value * overhead * quantity
+        economics = economics or self.getEconomics()
+        return economics.ascensionCPS * stock.value * economics.overhead * quantity
 
-    def getStockSalePriceRaw(self, stock: Stock, quantity: int) -> float:
+    def getStockSalePriceRaw(self, stock: Stock, quantity: int, economics: Optional[MarketEconomics] = None) -> float:
         """
         Get the amount of cookies gained from selling a stock.
 
         :param stock: The stock that is being sold.
         :param quantity: The amount of stock that is being sold.
+        :param economics: The snapshot to price with. Read from the save file if omitted.
         :return: The cookies gained from selling this stock.
         """
-        ascCPS = helpers.getHighestAscensionCPS(self.config)
-        return ascCPS * stock.value * quantity
+        economics = economics or self.getEconomics()
+        return economics.ascensionCPS * stock.value * quantity
 
-    def getAmountCanPurchase(self, stock: Stock) -> int:
+    def getAmountCanPurchase(self, stock: Stock, economics: Optional[MarketEconomics] = None) -> int:
         """
         Get the maximum amount of a stock that can be bought with the current amount of cookies.
-        Capped at the stock's capacity.
+        Capped at the free space left in the stock's capacity.
 
         :param stock: The stock to compare to.
+        :param economics: The snapshot to price with. Read from the save file if omitted.
         :return: The amount of this stock that can be bought.
         """
-        amount = 1
-        cookies = helpers.getCookies(self.config)
-        while self.getStockBuyPriceRaw(stock, amount) < cookies:
-            amount += 1
-        if amount > stock.capacity:
-            amount = stock.capacity
-        return amount
+        economics = economics or self.getEconomics()
+        space = max(0, int(stock.capacity) - stock.held)
+        unitPrice = self.getStockBuyPriceRaw(stock, 1, economics)
+        if unitPrice <= 0:
+            return space
+        return max(0, min(space, math.floor(economics.cookies / unitPrice)))
+
+    def getAmountsCanPurchase(self, stocks: List[Stock],
+                              economics: Optional[MarketEconomics] = None) -> Dict[str, int]:
+        """
+        Size every purchase in a list at once. Stocks are bought in order, so the cookies spent on one stock
+        are not available to the ones after it.
+
+        :param stocks: The stocks that will be bought, in order.
+        :param economics: The snapshot to price with. Read from the save file if omitted.
+        :return: The amount of each stock that can be bought, keyed by symbol.
+        """
+        economics = economics or self.getEconomics()
+        amounts = {}
+        for stock in stocks:
+            amount = self.getAmountCanPurchase(stock, economics)
+            amounts[stock.symbol] = amount
+            economics = economics._replace(
+                cookies=economics.cookies - self.getStockBuyPriceRaw(stock, amount, economics))
+        return amounts
 
     def evaluateStocks(self) -> int:
         """
         Decide what stocks should be bought or sold, depending on the configuration.
 
-        Each stock mode has its own behavior. If a stock surpasses the market cap of
+        Each stock mode has its own behavior, see `TradingPolicy`. If a stock surpasses the market cap of
         $100 + $3(Bank level-1), then it is automatically sold.
 
         A return value of 0 means no changes happened, negative numbers mean more stocks were
@@ -162,53 +224,63 @@ class Market:
         sell_list: List[Stock] = []
         for stock in self.stocks:
             diff = stock.getRestingDiff()
-            mode = stock.mode
-            dur = stock.duration
             surpassedCap = stock.value >= 100 + (3*(self.bank_level-1))
-            if diff <= self.config.buyLimit and stock.held == 0:
-                if mode == StockMode.STABLE and dur <= 30:
-                    # stable is probably not going much of anywhere so buy now?
-                    buy_list.append(stock)
-                elif mode == StockMode.CHAOTIC:
-                    # no telling what it's going to do
-                    buy_list.append(stock)
-                elif mode == StockMode.SLOW_FALL and dur <= 5:
-                    # safe to wait
-                    buy_list.append(stock)
-                elif mode == StockMode.SLOW_RISE or mode == StockMode.FAST_RISE:
-                    # get now before price rises more
-                    buy_list.append(stock)
-                elif mode == StockMode.FAST_FALL and dur <= 5:
-                    # safe to wait (mostly)
-                    buy_list.append(stock)
-            elif (diff >= self.config.sellLimit or surpassedCap) and stock.held > 0:
-                if surpassedCap:
-                    # it is going to start decreasing immediately after this
-                    sell_list.append(stock)
-                elif mode == StockMode.STABLE or mode == StockMode.CHAOTIC \
-                        or mode == StockMode.FAST_FALL or mode == StockMode.SLOW_FALL:
-                    sell_list.append(stock)
-                # in fast-rise mode there's a 3% chance every tick of it changing to fast fall
-                # at >=400 ticks there's >11% chance of that happening so at that point just sell
-                elif mode == StockMode.FAST_RISE and (dur >= 400 or dur <= 5):
-                    sell_list.append(stock)
-                elif mode == StockMode.SLOW_RISE and dur <= 5:
-                    sell_list.append(stock)
+            if self.policy.shouldBuy(diff, stock.mode, stock.duration, stock.held):
+                buy_list.append(stock)
+            elif self.policy.shouldSell(diff, stock.mode, stock.duration, stock.held, surpassedCap):
+                sell_list.append(stock)
+        economics = self.getEconomics()
+        amounts = self.getAmountsCanPurchase(buy_list, economics)
         for stock in buy_list:
-            self.logger.info(f"Buying {self.getAmountCanPurchase(stock)} of {stock.symbol} at ${stock.value:.2f} "
+            if amounts[stock.symbol] == 0:
+                self.logger.info(f"Cannot afford any {stock.symbol} at ${stock.value:.2f}.")
+        buy_list = [stock for stock in buy_list if amounts[stock.symbol] > 0]
+        bought, sold = self.executeTrades(buy_list, sell_list)
+
+        for stock in bought:
+            amountBuying = amounts[stock.symbol]
+            self.logger.info(f"Bought {amountBuying} of {stock.symbol} at ${stock.value:.2f} "
                              f"({stock.getRestingDiff():.2f}% from resting)")
-            amountBuying = self.getAmountCanPurchase(stock)
-            self.buyStock(stock)
-            self.recordPurchase(stock, amountBuying, self.getStockBuyPriceRaw(stock, amountBuying))
+            self.recordPurchase(stock, amountBuying, self.getStockBuyPriceRaw(stock, amountBuying, economics))
             stock.held = amountBuying
-        for stock in sell_list:
-            self.logger.info(f"Selling {stock.held} of {stock.symbol} at ${stock.value:.2f} "
+        for stock in sold:
+            self.logger.info(f"Sold {stock.held} of {stock.symbol} at ${stock.value:.2f} "
                              f"({stock.getRestingDiff():.2f}% from resting)")
-            salePrice = self.getStockSalePriceRaw(stock, stock.held)
-            self.sellStock(stock)
-            self.recordSale(stock, salePrice)
+            self.recordSale(stock, self.getStockSalePriceRaw(stock, stock.held, economics))
             stock.held = 0
-        return len(buy_list) - len(sell_list)
+        return len(bought) - len(sold)
+
+    def executeTrades(self, buyList: List[Stock], sellList: List[Stock]) -> Tuple[List[Stock], List[Stock]]:
+        """
+        Click the "max buy" and "max sell" buttons of every stock in a tick's trades in one batch.
+
+        The panel layout is checked once for the whole batch. Nothing is clicked if its buttons cannot be matched
+        to the visible stocks.
+
+        :param buyList: The stocks to buy as much of as possible.
+        :param sellList: The stocks to sell entirely.
+        :return: The stocks that were actually bought and sold.
+        """
+        if not buyList and not sellList:
+            return [], []
+        self.layout.stockIds = [stock.id for stock in self.stocks if stock.visible]
+        if not self.layout.ensure():
+            self.logger.error("Could not locate the stock market panel.")
+            return [], []
+        clicked = ([], [])
+        points = []
+        # buys go first, since their amounts were worked out from the cookies held before any sell
+        for stocks, getPoint, done in ((buyList, self.layout.buyPoint, clicked[0]),
+                                       (sellList, self.layout.sellPoint, clicked[1])):
+            for stock in stocks:
+                point = getPoint(stock.id)
+                if point is None:
+                    self.logger.warning(f"The buttons of {stock.symbol} are not visible, skipping it.")
+                    continue
+                points.append(controls.Point(*point))
+                done.append(stock)
+        controls.clickMany(points)
+        return clicked
 
     def buyStock(self, stock: Stock):
         """
@@ -216,8 +288,7 @@ class Market:
 
         :param stock: The stock to purchase.
         """
-        point = helpers.locateAll("img/buyStockButton.png")[stock.id]
-        pyautogui.click(point)
+        self.executeTrades([stock], [])
 
     def sellStock(self, stock: Stock):
         """
@@ -225,77 +296,26 @@ class Market:
 
         :param stock: The stock to sell.
         """
-        point = helpers.locateAll("img/sellStockButton.png")[stock.id]
-        pyautogui.click(point)
-
-    def _loadRecordFile(self):
-        data = {}
-
-        with open(self.filename, "r" if os.path.exists(self.filename) else "a+") as f:
-            try:
-                data = toml.load(f)
-
-                # try accessing variables
-                data["inventory"]
-                data["sold"]
-            except (toml.TomlDecodeError, TypeError, KeyError):
-                self.logger.info("Creating purchase record.")
-        if not data:
-            data = {
-                "inventory": {},
-                "sold": {}
-            }
-        return data
+        self.executeTrades([], [stock])
 
     def recordPurchase(self, stock: Stock, quantity: int, purchaseAmount: float):
         """
-        Save the information about the current stock purchase to the save file.
+        Save the information about the current stock purchase to the trade ledger.
         Used to keep track of profit margins.
 
         :param stock: The stock that was purchased.
         :param quantity: The amount of stock that was purchased.
         :param purchaseAmount: The amount of cookies spent to purchase this item.
         """
-        data = self._loadRecordFile()
-
-        data["inventory"][str(int(time.time()))+f"-{stock.symbol}"] = {
-            "amount": quantity,
-            "purchasedFor": purchaseAmount,
-            "symbol": stock.symbol,
-            "value": stock.value,
-        }
+        self.ledger.recordPurchase(stock.symbol, quantity, purchaseAmount, stock.value)
         stock.boughtFor = purchaseAmount
 
-        with open(self.filename, "w") as f:
-            toml.dump(data, f)
-
     def recordSale(self, stock: Stock, salePrice: float):
         """
-        Record the cookies made from selling a stock, and remove them from the bot's inventory.
+        Record the cookies made from selling a stock, and close the bot's position in the trade ledger.
         Used to keep track of profits.
 
         :param stock: The stock that was sold.
         :param salePrice: The amount of cookies gained from selling this stock.
         """
-        data = self._loadRecordFile()
-
-        ref = ""
-        for k, v in data["inventory"].items():
-            if stock.symbol in k:
-                ref = k
-
-        identifier = str(int(time.time())) + f"-{stock.symbol}"
-        data["sold"][identifier] = {
-            "amount": stock.held,
-            "soldFor": salePrice,
-            "soldValue": stock.value,
-            "symbol": stock.symbol,
-        }
-        if ref:
-            data["sold"][identifier]["boughtFor"] = data["inventory"][ref]["purchasedFor"]
-            data["sold"][identifier]["boughtValue"] = data["inventory"][ref]["value"]
-
-        # take it out of the dictionary to avoid duplicates.
-        data["inventory"].pop(ref, None)
-        with open(self.filename, "w") as f:
-            toml.dump(data, f)
+        self.ledger.recordSale(stock.symbol, stock.held, salePrice, stock.value)
@@ -0,0 +1,107 @@
+import numpy as np
+
+from config import Config
+from smarket.stock import StockMode
+
+
+class TradingPolicy:
+    """
+    Decides when stocks are bought and sold.
+
+    The rules only use comparisons combined with `&` and `|`, so they work the same on single stocks and on
+    NumPy arrays of many stocks at once. `Market.evaluateStocks` uses them on the live market and the
+    backtester on recorded or simulated histories.
+    """
+
+    def __init__(self, buyLimit: float = -90.0, sellLimit: float = 40.0, stableBuyDuration: int = 30,
+                 slowFallBuyDuration: int = 5, fastFallBuyDuration: int = 5, fastRiseSellDuration: int = 400,
+                 riseSellDuration: int = 5):
+        """
+        Initialize a trading policy. The defaults are the rules the bot has always used.
+
+        :param buyLimit: Buy once a stock is this many percent from its resting value.
+        :param sellLimit: Sell once a stock is this many percent from its resting value.
+        :param stableBuyDuration: Only buy stable stocks with at most this many ticks of the mode left.
+        :param slowFallBuyDuration: Only buy slowly falling stocks with at most this many ticks of the mode left.
+        :param fastFallBuyDuration: Only buy quickly falling stocks with at most this many ticks of the mode left.
+        :param fastRiseSellDuration: Sell quickly rising stocks once the mode has at least this many ticks left.
+        :param riseSellDuration: Sell rising stocks once the mode has at most this many ticks left.
+        """
+        self.buyLimit = buyLimit
+        self.sellLimit = sellLimit
+        self.stableBuyDuration = stableBuyDuration
+        self.slowFallBuyDuration = slowFallBuyDuration
+        self.fastFallBuyDuration = fastFallBuyDuration
+        self.fastRiseSellDuration = fastRiseSellDuration
+        self.riseSellDuration = riseSellDuration
+
+    @classmethod
+    def fromConfig(cls, config: Config) -> "TradingPolicy":
+        """
+        Create the policy described by the configuration file.
+
+        :param config: The bot configuration.
+        :return: The trading policy.
+        """
+        return cls(buyLimit=config.buyLimit, sellLimit=config.sellLimit)
+
+    def shouldBuy(self, diff, mode, duration, held):
+        """
+        Decide whether to buy a stock.
+
+        :param diff: The percentage of the value over the resting value. See `Stock.getRestingDiff`.
+        :param mode: The current mode of the stock.
+        :param duration: The remaining duration of the mode.
+        :param held: The amount of the stock held.
+        :return: True if the stock should be bought.
+        """
+        return (diff <= self.buyLimit) & (held == 0) & (
+            # stable is probably not going much of anywhere so buy now?
+            ((mode == StockMode.STABLE) & (duration <= self.stableBuyDuration))
+            # no telling what it's going to do
+            | (mode == StockMode.CHAOTIC)
+            # safe to wait
+            | ((mode == StockMode.SLOW_FALL) & (duration <= self.slowFallBuyDuration))
+            # get now before price rises more
+            | (mode == StockMode.SLOW_RISE) | (mode == StockMode.FAST_RISE)
+            # safe to wait (mostly)
+            | ((mode == StockMode.FAST_FALL) & (duration <= self.fastFallBuyDuration))
+        )
+
+    def shouldSell(self, diff, mode, duration, held, surpassedCap):
+        """
+        Decide whether to sell a stock.
+
+        :param diff: The percentage of the value over the resting value. See `Stock.getRestingDiff`.
+        :param mode: The current mode of the stock.
+        :param duration: The remaining duration of the mode.
+        :param held: The amount of the stock held.
+        :param surpassedCap: Whether the value is over the bank-level cap.
+        :return: True if the stock should be sold.
+        """
+        return ((diff >= self.sellLimit) | surpassedCap) & (held > 0) & (
+            # it is going to start decreasing immediately after this
+            surpassedCap
+            | (mode == StockMode.STABLE) | (mode == StockMode.CHAOTIC)
+            | (mode == StockMode.FAST_FALL) | (mode == StockMode.SLOW_FALL)
+            # in fast-rise mode there's a 3% chance every tick of it changing to fast fall
+            # at >=400 ticks there's >11% chance of that happening so at that point just sell
+            | ((mode == StockMode.FAST_RISE)
+               & ((duration >= self.fastRiseSellDuration) | (duration <= self.riseSellDuration)))
+            | ((mode == StockMode.SLOW_RISE) & (duration <= self.riseSellDuration))
+        )
+
+    def __repr__(self):
+        params = ", ".join(f"{k}={v}" for k, v in vars(self).items())
+        return f"TradingPolicy({params})"
+
+
+def restingDiff(values, restingValues):
+    """
+    Vectorized `Stock.getRestingDiff`.
+
+    :param values: The values of the stocks.
+    :param restingValues: The resting values of the stocks.
+    :return: The percentage of each value over its resting value, rounded to two decimals.
+    """
+    return np.round(((values / restingValues) - 1) * 100, 2)
@@ -0,0 +1,168 @@
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from smarket.stock import Stock, STOCK_DATA, StockMode
+
+STOCK_COUNT = len(STOCK_DATA)
+
+MODE_CHANCES = np.array([0.125, 0.25, 0.25, 0.125, 0.125, 0.125])
+"""The chance of each mode being picked when a stock's mode runs out, indexed by `StockMode`."""
+MIN_DURATION = 10
+MAX_DURATION = 690
+"""New modes last a random amount of ticks between these two values."""
+RESTING_PULL = 0.01
+"""The fraction of the distance to its resting value that a stock moves every tick."""
+FAST_RISE_CRASH_CHANCE = 0.03
+"""The chance every tick of a fast rise turning into a fast fall."""
+
+
+class MarketPaths(NamedTuple):
+    """
+    Recorded simulation, with one row per tick. Arrays are shaped (ticks, paths, stocks).
+    """
+    values: np.ndarray
+    modes: np.ndarray
+    durations: np.ndarray
+
+
+class MarketSimulator:
+    """
+    Monte Carlo simulation of the stock market minigame.
+
+    Advances many independent markets of 16 stocks at once following the per-mode rules documented in
+    `StockMode`. Every stock of every path is updated with array operations, so the cost of a tick barely
+    depends on the amount of paths.
+    """
+
+    def __init__(self, paths: int = 1000, bankLevel: int = 1, seed: Optional[int] = None,
+                 values: Optional[np.ndarray] = None, modes: Optional[np.ndarray] = None,
+                 deltas: Optional[np.ndarray] = None, durations: Optional[np.ndarray] = None):
+        """
+        Initialize a simulation. Any starting state left out is drawn at random.
+
+        :param paths: The amount of independent markets to simulate.
+        :param bankLevel: The level of the bank, which moves the resting values and the value cap.
+        :param seed: Seed of the random generator, for reproducible runs.
+        :param values: Starting values, shaped (16,) or (paths, 16).
+        :param modes: Starting modes, shaped like `values`.
+        :param deltas: Starting deltas, shaped like `values`.
+        :param durations: Starting remaining durations, shaped like `values`.
+        """
+        self.paths = paths
+        self.bankLevel = bankLevel
+        self.rng = np.random.default_rng(seed)
+        shape = (paths, STOCK_COUNT)
+
+        self.restingValues = 10.0 * (np.arange(STOCK_COUNT) + 1) + (bankLevel - 1)
+        """The value each stock tends towards, matching `Stock.resting_value`."""
+        self.cap = 100.0 + 3 * (bankLevel - 1)
+        """Above this value a stock's delta is dampened, matching the cap used by `Market.evaluateStocks`."""
+
+        self.values = np.broadcast_to(self.restingValues if values is None else values, shape).astype(np.float64)
+        self.modes = (self._randomModes(shape) if modes is None
+                      else np.broadcast_to(modes, shape).astype(np.int8))
+        self.deltas = (np.zeros(shape) if deltas is None
+                       else np.broadcast_to(deltas, shape).astype(np.float64))
+        self.durations = (self._randomDurations(shape) if durations is None
+                          else np.broadcast_to(durations, shape).astype(np.int16))
+        self.ticks = 0
+
+    @classmethod
+    def fromStocks(cls, stocks: List[Stock], paths: int = 1000, bankLevel: int = 1,
+                   seed: Optional[int] = None) -> "MarketSimulator":
+        """
+        Start a simulation from the current state of the market.
+
+        :param stocks: The 16 stocks of the market, ordered by id.
+        :param paths: The amount of independent markets to simulate.
+        :param bankLevel: The level of the bank.
+        :param seed: Seed of the random generator.
+        :return: A simulator where every path starts from the given stocks.
+        """
+        return cls(paths=paths, bankLevel=bankLevel, seed=seed,
+                   values=np.array([s.value for s in stocks]),
+                   modes=np.array([s.mode for s in stocks]),
+                   deltas=np.array([s.delta for s in stocks]),
+                   durations=np.array([s.duration for s in stocks]))
+
+    def _randomModes(self, shape) -> np.ndarray:
+        return self.rng.choice(len(MODE_CHANCES), size=shape, p=MODE_CHANCES).astype(np.int8)
+
+    def _randomDurations(self, shape) -> np.ndarray:
+        return self.rng.integers(MIN_DURATION, MAX_DURATION, size=shape, dtype=np.int16)
+
+    def step(self) -> None:
+        """
+        Advance every path by one tick (one minute of game time).
+
+        :rtype: None
+        """
+        values, deltas, modes = self.values, self.deltas, self.modes
+        shape = values.shape
+        r = self.rng.random((6,) + shape)
+
+        values += (self.restingValues - values) * RESTING_PULL
+
+        stable = modes == StockMode.STABLE
+        slowRise = modes == StockMode.SLOW_RISE
+        slowFall = modes == StockMode.SLOW_FALL
+        fastRise = modes == StockMode.FAST_RISE
+        fastFall = modes == StockMode.FAST_FALL
+        chaotic = modes == StockMode.CHAOTIC
+
+        # delta decay: -5% when stable, -1% when slowly rising or falling
+        deltas *= np.where(stable, 0.95, np.where(slowRise | slowFall, 0.99, 1.0))
+
+        # delta fluctuation, from a uniform draw scaled and shifted per mode
+        low = np.select([stable, slowRise, slowFall, fastRise, fastFall, chaotic],
+                        [-0.025, -0.005, -0.045, -0.015, -0.135, -0.15])
+        width = np.select([stable, slowRise | slowFall, fastRise | fastFall, chaotic], [0.05, 0.05, 0.15, 0.3])
+        # chaotic stocks only fluctuate half of the time
+        deltas += np.where(chaotic & (r[1] >= 0.5), 0.0, low + width * r[0])
+
+        # value fluctuation
+        values += np.where(fastRise, r[2], 0.0) - np.where(fastFall, r[2], 0.0)
+        values += np.where(chaotic & (r[1] < 0.5), (r[2] - 0.5) * 10, 0.0)
+        jump = (fastRise | fastFall | chaotic) & (r[3] < 0.3)
+        values += np.where(jump, np.where(fastRise, r[4] * 10 - 7, r[4] * 10 - 3), 0.0)
+
+        values += deltas
+
+        # dampen growth above the cap and keep values from reaching zero
+        np.multiply(deltas, 0.9, out=deltas, where=(values > self.cap) & (deltas > 0))
+        np.maximum(values, 1.0, out=values)
+        values += np.where(values < 5, (5 - values) * 0.5, 0.0)
+
+        # fast rises can crash at any time, other modes last until their duration runs out
+        crash = fastRise & (r[5] < FAST_RISE_CRASH_CHANCE)
+        modes[crash] = StockMode.FAST_FALL
+        self.durations -= 1
+        expired = self.durations <= 0
+        count = int(expired.sum())
+        if count:
+            modes[expired] = self._randomModes(count)
+            self.durations[expired] = self._randomDurations(count)
+        self.ticks += 1
+
+    def run(self, ticks: int, record: bool = True) -> Optional[MarketPaths]:
+        """
+        Advance every path by several ticks.
+
+        :param ticks: The amount of ticks to simulate.
+        :param record: Whether to keep the state of every tick. Recording takes ticks * paths * 28 bytes.
+        :return: The recorded values, modes and durations after each tick, or None when not recording.
+        """
+        if not record:
+            for _ in range(ticks):
+                self.step()
+            return None
+        shape = (ticks, self.paths, STOCK_COUNT)
+        history = MarketPaths(np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.int8),
+                              np.empty(shape, dtype=np.int16))
+        for tick in range(ticks):
+            self.step()
+            history.values[tick] = self.values
+            history.modes[tick] = self.modes
+            history.durations[tick] = self.durations
+        return history
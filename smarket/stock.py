@@ -85,6 +85,9 @@ class Stock:
         else:
             self.capacity += src_building_quantity
 
+        self.visible: bool = src_building_quantity > 0
+        """Whether the stock is shown in the market. Stocks are hidden until their building is owned."""
+
         ###################
         # Bot specific attributes
         ###################
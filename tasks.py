@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import metrics
+
+Task = Callable[[], Optional[float]]
+"""A task takes no arguments and returns the seconds until it should run again, or None to wait for `runSoon`."""
+
+
+class TaskStats:
+    """
+    How late a task has run compared with its schedule.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        """How many times the task has run."""
+        self.totalLateness = 0.0
+        """The sum of the delays between each deadline and the run starting, in seconds."""
+        self.maxLateness = 0.0
+        """The longest delay between a deadline and the run starting, in seconds."""
+        self.totalDuration = 0.0
+        """The total time spent running the task, in seconds."""
+
+    def record(self, lateness: float, duration: float) -> None:
+        self.runs += 1
+        self.totalLateness += lateness
+        self.maxLateness = max(self.maxLateness, lateness)
+        self.totalDuration += duration
+
+    @property
+    def meanLateness(self) -> float:
+        return self.totalLateness / self.runs if self.runs else 0.0
+
+    def __str__(self):
+        return f"{self.runs} runs, {self.meanLateness * 1000:.1f}ms late on average " \
+               f"({self.maxLateness * 1000:.1f}ms at worst)"
+
+
+class TaskScheduler:
+    """
+    Runs tasks at their deadlines from a single thread.
+
+    Deadlines are kept in a heap and the thread sleeps until the earliest one, so nothing spins while no task is
+    due. Other threads can bring a task forward with `runSoon`, such as when the save changes.
+    """
+
+    def __init__(self, lateWarning: float = 1.0, maxWait: float = 1.0):
+        """
+        Initialize the scheduler.
+
+        :param lateWarning: Runs starting more than this many seconds after their deadline are logged.
+        :param maxWait: The longest the scheduler sleeps before checking whether it should keep running.
+        """
+        self.lateWarning = lateWarning
+        self.maxWait = maxWait
+        self.logger = logging.getLogger("wafer")
+        self.stats: Dict[str, TaskStats] = {}
+        """Lateness of each task, by name."""
+        self._tasks: Dict[str, Task] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._deadlines: Dict[str, Tuple[float, int]] = {}  # each task's live heap entry
+        self._requested: Dict[str, float] = {}  # runSoon calls made while the task was running
+        self._active: Set[str] = set()
+        self._lateness: Dict[str, metrics.Histogram] = {}
+        self._duration: Dict[str, metrics.Histogram] = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+
+    def schedule(self, name: str, task: Task, delay: float = 0.0) -> None:
+        """
+        Add a task, or replace one with the same name.
+
+        :param name: The name of the task, used for `runSoon` and stats.
+        :param task: The function to run.
+        :param delay: Seconds until the first run.
+        """
+        with self._condition:
+            self._tasks[name] = task
+            self.stats.setdefault(name, TaskStats())
+            self._lateness[name] = metrics.histogram("wafer_task_lateness_seconds",
+                                                     "How long after its deadline a task started.", task=name)
+            self._duration[name] = metrics.histogram("wafer_task_duration_seconds", "How long a task ran for.",
+                                                     task=name)
+            self._deadlines.pop(name, None)
+            self._push(name, time.monotonic() + delay)
+
+    def runSoon(self, name: str) -> None:
+        """
+        Run a task as soon as possible. Safe to call from any thread. Does nothing if the task is already due
+        sooner; if it is running, it runs again once it finishes.
+
+        :param name: The name of the task.
+        """
+        with self._condition:
+            if name in self._tasks:
+                self._push(name, time.monotonic())
+
+    def _push(self, name: str, deadline: float) -> None:
+        if name in self._active:
+            self._requested[name] = min(deadline, self._requested.get(name, deadline))
+            return
+        current = self._deadlines.get(name)
+        if current is not None and current[0] <= deadline:
+            return
+        seq = next(self._counter)
+        # entries replaced here are left in the heap and skipped when popped
+        heapq.heappush(self._heap, (deadline, seq, name))
+        self._deadlines[name] = (deadline, seq)
+        self._condition.notify()
+
+    def stop(self) -> None:
+        """
+        Make `run` return after the task in progress.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def run(self, keepRunning: Callable[[], bool] = lambda: True) -> None:
+        """
+        Run tasks at their deadlines until stopped. Exceptions raised by a task stop the scheduler and are
+        passed on to the caller.
+
+        :param keepRunning: Checked between tasks and at least every `maxWait` seconds; the scheduler stops once
+            it returns False.
+        """
+        self._running = True
+        try:
+            while True:
+                with self._condition:
+                    name, deadline = None, None
+                    while self._running and keepRunning():
+                        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][:2]:
+                            heapq.heappop(self._heap)
+                        wait = self._heap[0][0] - time.monotonic() if self._heap else self.maxWait
+                        if wait <= 0:
+                            deadline, seq, name = heapq.heappop(self._heap)
+                            del self._deadlines[name]
+                            self._active.add(name)
+                            break
+                        self._condition.wait(min(wait, self.maxWait))
+                    if name is None:
+                        return
+                    task = self._tasks[name]
+
+                start = time.monotonic()
+                lateness = start - deadline
+                if lateness > self.lateWarning:
+                    self.logger.warning(f"Task {name} ran {lateness:.2f}s late.")
+                delay = None
+                try:
+                    delay = task()
+                finally:
+                    with self._condition:
+                        self._active.discard(name)
+                        duration = time.monotonic() - start
+                        self.stats[name].record(lateness, duration)
+                        self._lateness[name].observe(lateness)
+                        self._duration[name].observe(duration)
+                        if delay is not None:
+                            self._push(name, time.monotonic() + delay)
+                        if name in self._requested:
+                            self._push(name, self._requested.pop(name))
+        finally:
+            self._running = False
+            for name, stats in self.stats.items():
+                self.logger.info(f"Task {name}: {stats}")
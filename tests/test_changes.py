@@ -0,0 +1,47 @@
+import numpy as np
+
+from vision.changes import ChangeDetector
+from vision.templates import Box
+
+
+def test_regionsCoverOnlyChangedTiles():
+    detector = ChangeDetector(tileSize=32, step=8, threshold=16)
+    frame = np.zeros((256, 320, 3), dtype=np.uint8)
+    first = detector.update(frame)
+    assert detector.regions(first) == []
+
+    changed = frame.copy()
+    changed[100:110, 200:210] = 255
+    second = detector.update(changed)
+    assert detector.regions(second) == []
+    assert detector.regions(first, padding=0) == [Box(192, 96, 32, 32)]
+    assert detector.regions(first, padding=1) == [Box(160, 64, 96, 96)]
+    assert detector.changed(Box(195, 100, 5, 5), first)
+    assert not detector.changed(Box(0, 0, 64, 64), first)
+    assert not detector.changed(Box(195, 100, 5, 5), second)
+
+
+def test_noiseBelowThresholdIsIgnored():
+    detector = ChangeDetector(threshold=16)
+    frame = np.full((128, 128, 3), 100, dtype=np.uint8)
+    since = detector.update(frame)
+    detector.update(frame + 15)
+    assert not detector.dirtyTiles(since).any()
+    # compared with the previous frame, not the first one
+    detector.update(frame + 31)
+    assert detector.dirtyTiles(since).all()
+
+
+def test_consumersAtDifferentRates():
+    detector = ChangeDetector(tileSize=32, step=8)
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    slow = detector.update(frame)
+    changed = frame.copy()
+    changed[0:8, 0:8] = 255
+    fast = detector.update(changed)
+    detector.update(changed)
+    # the slow consumer still sees the change the fast one already looked at
+    assert detector.changed(Box(0, 0, 8, 8), slow)
+    assert not detector.changed(Box(0, 0, 8, 8), fast)
+    assert detector.serialOf(changed) == 3
+    assert detector.serialOf(frame) is None
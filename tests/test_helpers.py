@@ -0,0 +1,19 @@
+import helpers
+
+
+def test_wordsToPower():
+    assert helpers.WORDS_TO_POWER["thousand"] == 1e3
+    assert helpers.WORDS_TO_POWER["nonillion"] == 1e30
+    assert helpers.WORDS_TO_POWER["decillion"] == 1e33
+    assert helpers.WORDS_TO_POWER["octodecillion"] == 1e57
+    assert helpers.WORDS_TO_POWER["novemdecillion"] == 1e60
+    assert helpers.WORDS_TO_POWER["vigintillion"] == 1e63
+    assert helpers.WORDS_TO_POWER["novemnonagintillion"] == 1e300
+    assert len(helpers.WORDS_TO_POWER) == 100
+
+
+def test_parseNumber():
+    assert helpers.parseNumber("1,234,567") == 1234567
+    assert helpers.parseNumber("1.5 million") == 1.5e6
+    assert helpers.parseNumber("2 octodecillion") == 2e57
+    assert helpers.parseNumber("3 gazillion") is None
@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from smarket.history import PriceHistory
+from smarket.simulator import STOCK_COUNT
+
+
+def _tick(value: float):
+    return [SimpleNamespace(value=value + i, mode=i % 6, delta=0.5, duration=100 + i) for i in range(STOCK_COUNT)]
+
+
+def test_querySymbol(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    assert history.record(_tick(10), timestamp=1)
+    assert not history.record(_tick(10), timestamp=2)
+    assert history.record(_tick(20), timestamp=3)
+    ticks = history.query("CHC", start=2)
+    np.testing.assert_array_equal(ticks.times, [3])
+    np.testing.assert_array_equal(ticks.values, [21])
+    with pytest.raises(KeyError, match="Unknown stock symbol XYZ"):
+        history.query("XYZ")
+    history.close()
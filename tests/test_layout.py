@@ -0,0 +1,42 @@
+import pytest
+
+import helpers
+from smarket.layout import MarketLayout
+from vision.synthetic import SyntheticScreen
+
+
+@pytest.fixture
+def screen(monkeypatch):
+    monkeypatch.setattr(helpers, "_frameProviders", {})
+    screen = SyntheticScreen(seed=4, marketOpen=True, stockCount=10)
+    helpers.useFrameSource(screen)
+    return screen
+
+
+def _close(point, expected):
+    return abs(point[0] - expected.x) <= 1 and abs(point[1] - expected.y) <= 1
+
+
+def test_buttonsFollowVisibleStocksInReadingOrder(screen):
+    layout = MarketLayout(helpers.frameProvider(), helpers.templates)
+    # stock 3 is hidden, so the fourth pair of buttons on screen belongs to stock 4
+    layout.stockIds = [0, 1, 2, 4, 5, 6, 7, 8, 9, 10]
+    assert layout.ensure()
+    buttons = screen.truth().marketButtons
+    for shown, stockId in enumerate(layout.stockIds):
+        assert _close(layout.buyPoint(stockId), buttons[shown][0])
+        assert _close(layout.sellPoint(stockId), buttons[shown][1])
+    assert layout.buyPoint(3) is None
+    assert layout.validate()
+
+
+def test_refusesWhenButtonsDoNotMatchStocks(screen):
+    layout = MarketLayout(helpers.frameProvider(), helpers.templates)
+    layout.stockIds = list(range(11))
+    assert not layout.ensure()
+    assert layout.buyPoint(0) is None and layout.sellPoint(0) is None
+    # a different set of visible stocks makes the map stale
+    layout.stockIds = list(range(10))
+    assert layout.ensure()
+    layout.stockIds = list(range(9))
+    assert not layout.validate()
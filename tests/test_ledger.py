@@ -0,0 +1,43 @@
+import os
+import shutil
+
+import toml
+
+from smarket.ledger import TradeLedger
+
+LEGACY = {
+    "inventory": {
+        "100-CRL": {"symbol": "CRL", "amount": 5, "purchasedFor": 60.0, "value": 10.0},
+        "200-CHC": {"symbol": "CHC", "amount": 5},
+    },
+    "sold": {
+        "300-BTR": {"symbol": "BTR", "amount": 2, "soldFor": 40.0, "soldValue": 20.0, "boughtFor": 30.0,
+                    "boughtValue": 15.0},
+        "400-SUG": {"symbol": "SUG", "amount": "many", "soldFor": 1.0, "soldValue": 1.0},
+    },
+}
+
+
+def _counts(ledger: TradeLedger):
+    return tuple(ledger.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                 for table in ("purchases", "sales"))
+
+
+def test_migrateSkipsMalformedEntries(tmp_path):
+    legacy = tmp_path / "mdata.toml"
+    legacy.write_text(toml.dumps(LEGACY))
+    ledger = TradeLedger(str(tmp_path / "mdata.sqlite3"), str(legacy))
+    assert _counts(ledger) == (1, 1)
+    assert ledger.openPosition("CRL")["amount"] == 5
+    assert not legacy.exists() and os.path.exists(str(legacy) + ".migrated")
+
+
+def test_migrateOnlyOnceWhenRenameIsLost(tmp_path):
+    legacy = tmp_path / "mdata.toml"
+    legacy.write_text(toml.dumps(LEGACY))
+    TradeLedger(str(tmp_path / "mdata.sqlite3"), str(legacy)).close()
+    # as if the process stopped after committing the rows but before renaming the file
+    shutil.copy(str(legacy) + ".migrated", legacy)
+    ledger = TradeLedger(str(tmp_path / "mdata.sqlite3"), str(legacy))
+    assert _counts(ledger) == (1, 1)
+    assert not legacy.exists()
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from benchmarks.fixtures import saveString
+from savestate import SaveState, getSaveState
+
+
+def _write(path, data: bytes, mtime: int) -> None:
+    path.write_bytes(data)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_refreshParsesOnlyChangedContent(tmp_path):
+    path = tmp_path / "save.cki"
+    early = saveString("early")
+    _write(path, early, 10 ** 18)
+    save = SaveState(str(path))
+    assert save.refresh()
+    assert save.revision == 1
+    assert save.cookies == 1e6
+    assert save.buildings["farm"].amount > 0 and save.gardenData
+    assert save.buildings["bank"].amount == 0 and save.marketData == ""
+    assert not save.refresh()
+
+    # the game rewrote the same data
+    _write(path, early, 2 * 10 ** 18)
+    assert not save.refresh()
+    assert save.revision == 1
+
+    _write(path, saveString("late"), 3 * 10 ** 18)
+    assert save.refresh()
+    assert save.revision == 2
+    assert save.buildings["bank"].amount > 0 and save.marketData
+
+
+def test_refreshRetriesPartialWrite(tmp_path):
+    path = tmp_path / "save.cki"
+    data = saveString("late")
+    _write(path, data[:len(data) // 8], 10 ** 18)
+    save = SaveState(str(path))
+    with pytest.raises((ValueError, IndexError)):
+        save.refresh()
+    _write(path, data, 10 ** 18 + 1)
+    assert save.refresh()
+    assert save.revision == 1
+
+
+def test_getSaveStateIsShared(tmp_path):
+    path = str(tmp_path / "save.cki")
+    assert getSaveState(path) is getSaveState(path)
@@ -0,0 +1,64 @@
+import importlib
+import os
+import sys
+import threading
+
+import pytest
+
+from benchmarks.fixtures import saveString
+
+
+def test_pollingWithoutInotify(tmp_path, monkeypatch):
+    # Windows has neither inotify nor os.O_NONBLOCK, which must not stop the module from importing
+    monkeypatch.delattr(os, "O_NONBLOCK", raising=False)
+    monkeypatch.setattr(sys, "platform", "win32")
+    import savewatch
+    savewatch = importlib.reload(savewatch)
+    from savestate import SaveState
+
+    path = tmp_path / "save.cki"
+    path.write_bytes(saveString("early", seed=0))
+    watcher = savewatch.SaveWatcher(SaveState(str(path)), debounce=0.01, pollInterval=0.01)
+    changed = threading.Event()
+    watcher.subscribe("buildings", lambda save: changed.set())
+    watcher.subscribe("garden", lambda save: changed.set())
+    watcher.start()
+    try:
+        assert changed.wait(5)
+        changed.clear()
+        path.write_bytes(saveString("late", seed=1))
+        os.utime(path, ns=(0, 10 ** 18))
+        assert changed.wait(5)
+    finally:
+        watcher.stop()
+
+
+def test_checkNotifiesChangedTopics(tmp_path):
+    from savestate import SaveState
+    from savewatch import SaveWatcher, TOPICS
+
+    path = tmp_path / "save.cki"
+    early = saveString("early")
+    path.write_bytes(early)
+    watcher = SaveWatcher(SaveState(str(path)))
+    seen = []
+    watcher.subscribe("market", lambda save: seen.append("market"))
+    watcher.subscribe("market", lambda save: 1 / 0)
+    watcher.subscribe("buildings", lambda save: seen.append("buildings"))
+    with pytest.raises(ValueError):
+        watcher.subscribe("weather", lambda save: None)
+
+    assert watcher.check() == list(TOPICS)
+    assert seen == ["buildings", "market"]
+    assert watcher.check() == []
+
+    seen.clear()
+    path.write_bytes(early)
+    os.utime(path, ns=(10 ** 18, 10 ** 18))
+    assert watcher.check() == []
+    path.write_bytes(saveString("late"))
+    os.utime(path, ns=(2 * 10 ** 18, 2 * 10 ** 18))
+    changed = watcher.check()
+    assert "buildings" in changed and "market" in changed
+    # a failing subscriber does not keep the others from being notified
+    assert sorted(seen) == ["buildings", "market"]
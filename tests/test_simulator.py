@@ -0,0 +1,17 @@
+import numpy as np
+
+from smarket.simulator import FAST_RISE_CRASH_CHANCE, MarketSimulator, STOCK_COUNT
+from smarket.stock import StockMode
+
+
+def test_fastRiseCrashChance():
+    paths = 20000
+    simulator = MarketSimulator(paths=paths, seed=1, modes=np.full(STOCK_COUNT, StockMode.FAST_RISE),
+                                durations=np.full(STOCK_COUNT, 1000))
+    crashes = 0
+    for _ in range(5):
+        simulator.modes[:] = StockMode.FAST_RISE
+        simulator.step()
+        crashes += int((simulator.modes == StockMode.FAST_FALL).sum())
+    rate = crashes / (5 * paths * STOCK_COUNT)
+    assert abs(rate - FAST_RISE_CRASH_CHANCE) < 0.002
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from tasks import TaskScheduler
+
+
+def test_runsTasksByDeadline():
+    scheduler = TaskScheduler(maxWait=0.05)
+    order = []
+
+    def task(name, delay=None, times=1):
+        def run():
+            order.append(name)
+            # returning None leaves the task waiting for runSoon
+            return delay if order.count(name) < times else None
+        return run
+
+    scheduler.schedule("late", task("late"), delay=0.05)
+    scheduler.schedule("first", task("first"))
+    scheduler.schedule("repeat", task("repeat", 0.04, times=3), delay=0.02)
+    scheduler.schedule("stop", lambda: scheduler.stop(), delay=0.2)
+    scheduler.run()
+    assert order[:3] == ["first", "repeat", "late"]
+    assert order.count("repeat") == 3 and order.count("late") == 1
+    assert scheduler.stats["repeat"].runs == 3
+    assert 0 <= scheduler.stats["late"].maxLateness < 1
+
+
+def test_runSoonBringsTaskForward():
+    scheduler = TaskScheduler(maxWait=0.05)
+    runs = []
+
+    def waiting():
+        runs.append(time.monotonic())
+        if len(runs) == 1:
+            # requested while running, so it runs again right after
+            scheduler.runSoon("waiting")
+        else:
+            scheduler.stop()
+        return None
+
+    scheduler.schedule("waiting", waiting, delay=60)
+    timer = threading.Timer(0.05, scheduler.runSoon, ("waiting",))
+    timer.start()
+    started = time.monotonic()
+    scheduler.run()
+    timer.join()
+    assert len(runs) == 2
+    assert runs[-1] - started < 1
+
+
+def test_keepRunningStopsScheduler():
+    scheduler = TaskScheduler(maxWait=0.01)
+    scheduler.schedule("idle", lambda: None, delay=60)
+    deadline = time.monotonic() + 0.05
+    scheduler.run(lambda: time.monotonic() < deadline)
+    assert scheduler.stats["idle"].runs == 0
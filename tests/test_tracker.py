@@ -0,0 +1,51 @@
+import pytest
+
+from vision.tracker import GoldenCookieTracker, evaluate
+
+
+def test_updateMatchesClosestDetections():
+    tracker = GoldenCookieTracker(maxDistance=50)
+    first = tracker.update([(100, 100), (400, 400)], 0.0)
+    tracks = tracker.update([(410, 400), (110, 100)], 1.0)
+    assert [t.id for t in tracks] == [t.id for t in first]
+    assert [(t.x, t.y) for t in tracks] == [(110, 100), (410, 400)]
+    assert all(t.frames == 2 for t in tracks)
+
+
+def test_updateStartsTrackBeyondMaxDistance():
+    tracker = GoldenCookieTracker(maxDistance=50)
+    tracker.update([(100, 100)], 0.0)
+    tracks = tracker.update([(300, 100)], 0.1)
+    assert [t.id for t in tracks] == [1]
+    assert len(tracker.tracks) == 2
+
+
+def test_updateDropsTrackAfterMaxMissed():
+    tracker = GoldenCookieTracker(maxMissed=3)
+    tracker.update([(100, 100)], 0.0)
+    for i in range(2):
+        assert tracker.update([], 0.1 * (i + 1)) == []
+        assert len(tracker.tracks) == 1
+    tracker.update([], 0.3)
+    assert tracker.tracks == []
+
+
+def test_updateSmoothsVelocity():
+    tracker = GoldenCookieTracker(smoothing=0.5)
+    tracker.update([(0, 0)], 0.0)
+    tracker.update([(10, 0)], 1.0)
+    track = tracker.tracks[0]
+    # the first measurement is taken as is, later ones are blended in
+    assert (track.vx, track.vy) == (10, 0)
+    tracker.update([(40, 0)], 2.0)
+    assert track.vx == pytest.approx(20)
+    assert track.predict(3.0) == pytest.approx((60, 0))
+
+
+def test_trackingRecallAtLeastSingleFrame():
+    kwargs = dict(duration=20.0, maxSpeed=250.0, latency=0.2, clickInterval=0.05, seed=0)
+    single = evaluate(None, **kwargs)
+    tracked = evaluate(GoldenCookieTracker(), **kwargs)
+    assert tracked.spawned > 0
+    assert tracked.recall >= single.recall
+    assert tracked.missedClicks <= single.missedClicks
@@ -0,0 +1,137 @@
+import threading
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from vision.templates import Box
+
+
+class ChangeDetector:
+    """
+    Finds the parts of the screen that changed between frames, so detectors can skip the parts that did not.
+
+    Frames are sampled on a sparse grid of pixels and compared with the previous sample. The screen is split
+    into square tiles, and every tile remembers the serial number of the last frame it changed in. Each
+    consumer keeps the serial of the frame it last looked at and asks for the tiles changed since then, so
+    consumers running at different rates never miss a change.
+    """
+
+    def __init__(self, tileSize: int = 32, step: int = 8, threshold: int = 16):
+        """
+        Initialize the detector.
+
+        :param tileSize: The width and height of a tile, in pixels. Rounded down to a multiple of `step`.
+        :param step: Only every `step`-th row and column of a frame is compared.
+        :param threshold: The smallest difference of a sampled channel that counts as a change, from 0 to 255.
+            Keeps compression noise and cursor blending from marking tiles.
+        """
+        self.step = max(1, step)
+        self.tileSize = max(self.step, tileSize // self.step * self.step)
+        self.threshold = threshold
+        self.serial = 0
+        """The serial number of the last frame seen. Starts at 1 for the first frame."""
+        self._lock = threading.Lock()
+        self._frame: Optional[np.ndarray] = None
+        self._sample: Optional[np.ndarray] = None
+        self._changedAt: Optional[np.ndarray] = None
+
+    def update(self, frame: np.ndarray) -> int:
+        """
+        Compare a new frame with the previous one.
+
+        :param frame: A BGR(A) image of the whole screen.
+        :return: The serial number of the frame.
+        """
+        cell = self.tileSize // self.step
+        # nearest-neighbour resizing is the cheapest way to get a contiguous subsampled copy
+        sample = cv2.resize(frame, (frame.shape[1] // self.step, frame.shape[0] // self.step),
+                            interpolation=cv2.INTER_NEAREST)
+        # the last row and column of tiles may be cut off by the edge of the frame
+        rows, columns = -(-sample.shape[0] // cell), -(-sample.shape[1] // cell)
+        with self._lock:
+            self.serial += 1
+            if self._sample is None or self._sample.shape != sample.shape:
+                self._changedAt = np.full((rows, columns), self.serial, dtype=np.int64)
+            else:
+                # the previous sample is not needed anymore, so the difference is written over it; channels are
+                # laid side by side so every tile is one block of the 2D difference
+                difference = cv2.absdiff(sample, self._sample, self._sample).reshape(sample.shape[0], -1)
+                _, changed = cv2.threshold(difference, self.threshold - 1, 255, cv2.THRESH_BINARY, difference)
+                depth = sample.shape[2] if sample.ndim == 3 else 1
+                changed = cv2.copyMakeBorder(changed, 0, rows * cell - sample.shape[0], 0,
+                                             (columns * cell - sample.shape[1]) * depth, cv2.BORDER_CONSTANT, value=0)
+                # any changed pixel leaves a non-zero average over its tile
+                changed = cv2.resize(changed, (columns, rows), interpolation=cv2.INTER_AREA) > 0
+                self._changedAt[changed] = self.serial
+            self._sample = sample
+            self._frame = frame
+            return self.serial
+
+    def serialOf(self, frame: np.ndarray) -> Optional[int]:
+        """
+        Get the serial number of a frame.
+
+        :param frame: A frame returned by the frame provider.
+        :return: Its serial number, or None if it is not the last frame this detector compared.
+        """
+        with self._lock:
+            return self.serial if frame is self._frame else None
+
+    def dirtyTiles(self, since: int) -> np.ndarray:
+        """
+        Find the tiles that changed after a frame.
+
+        :param since: The serial number of the frame.
+        :return: A boolean array with one element per tile, True where the tile changed.
+        """
+        with self._lock:
+            if self._changedAt is None:
+                return np.zeros((0, 0), dtype=bool)
+            return self._changedAt > since
+
+    def regions(self, since: int, padding: int = 1) -> List[Box]:
+        """
+        Find the parts of the screen that changed after a frame, as few rectangles.
+
+        :param since: The serial number of the frame.
+        :param padding: The amount of tiles added around every changed area, so objects that only partly
+            moved into a changed tile are still covered whole.
+        :return: The changed rectangles, in pixels of the frame.
+        """
+        with self._lock:
+            if self._changedAt is None or self._frame is None:
+                return []
+            dirty = (self._changedAt > since).astype(np.uint8)
+            height, width = self._frame.shape[:2]
+        if not dirty.any():
+            return []
+        if padding:
+            dirty = cv2.dilate(dirty, np.ones((2 * padding + 1, 2 * padding + 1), dtype=np.uint8))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(dirty, connectivity=8)
+        boxes = []
+        for left, top, columns, rows, _ in stats[1:count]:
+            x, y = left * self.tileSize, top * self.tileSize
+            right = min(width, (left + columns) * self.tileSize)
+            bottom = min(height, (top + rows) * self.tileSize)
+            boxes.append(Box(int(x), int(y), int(right - x), int(bottom - y)))
+        return boxes
+
+    def changed(self, box: Box, since: int) -> bool:
+        """
+        Check whether a part of the screen changed after a frame.
+
+        :param box: The part of the screen, in pixels.
+        :param since: The serial number of the frame.
+        :return: True if any tile overlapping the box changed, or if the box is outside the compared frames.
+        """
+        with self._lock:
+            if self._changedAt is None:
+                return True
+            rows, columns = self._changedAt.shape
+            top, left = box.top // self.tileSize, box.left // self.tileSize
+            bottom = min(rows, (box.top + box.height - 1) // self.tileSize + 1)
+            right = min(columns, (box.left + box.width - 1) // self.tileSize + 1)
+            if top >= bottom or left >= right:
+                return True
+            return bool((self._changedAt[top:bottom, left:right] > since).any())
@@ -0,0 +1,131 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from mss import mss
+
+import metrics
+from vision.changes import ChangeDetector
+
+Region = Tuple[int, int, int, int]
+"""A (left, top, width, height) rectangle, relative to the top-left of the monitor."""
+
+_captureTime = metrics.histogram("wafer_capture_seconds", "Time spent capturing the screen.")
+_cacheHits = metrics.counter("wafer_frame_cache_hits_total", "Frames served from the cache instead of captured.")
+
+
+class MSSCapture:
+    """
+    Screen capture source backed by mss.
+
+    mss handles may not be shared between threads, so one long-lived handle is kept per thread instead of
+    opening a new one for every capture.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _handle(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = mss()
+            self._local.sct = sct
+        return sct
+
+    def monitor(self, monitor: int) -> Dict[str, int]:
+        """
+        Get the geometry of a monitor.
+
+        :param monitor: The number of the monitor. Index 0 means all monitors.
+        :return: A dictionary with the left, top, width and height of the monitor.
+        """
+        return self._handle().monitors[monitor]
+
+    def grab(self, area: Dict[str, int]) -> np.ndarray:
+        """
+        Capture an area of the screen.
+
+        :param area: A dictionary with the absolute left, top, width and height of the area.
+        :return: A (height, width, 4) BGRA view over the captured buffer. No copy is made.
+        """
+        shot = self._handle().grab(area)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self) -> None:
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+class FrameProvider:
+    """
+    Hands out captures of one monitor and caches the latest full frame so every detector
+    that runs within the same tick reads the same frame. Every new full frame is compared with the previous
+    one, so detectors can skip the parts of the screen that did not change (see `changes`).
+    """
+
+    def __init__(self, monitor: int = 1, ttl: float = 0.05, source=None):
+        """
+        Initialize a frame provider.
+
+        :param monitor: The number of the monitor to capture.
+        :param ttl: How many seconds a captured frame may be reused for.
+        :param source: The capture source. Defaults to an `MSSCapture`.
+        """
+        self.monitor = monitor
+        self.ttl = ttl
+        self.source = source if source is not None else MSSCapture()
+        self._lock = threading.Lock()
+        self.changes = ChangeDetector()
+        """Which parts of the screen changed between the full frames captured."""
+        self._frame: Optional[np.ndarray] = None
+        self._frameTime = 0.0
+
+    def grab(self, region: Optional[Region] = None, maxAge: Optional[float] = None) -> np.ndarray:
+        """
+        Get the current frame, or a region of it.
+
+        A cached full frame is reused while it is younger than the TTL. Regions are sliced out of a fresh cached
+        frame when one exists, and captured on their own otherwise.
+
+        :param region: The (left, top, width, height) region to return. Defaults to the whole monitor.
+        :param maxAge: Overrides the TTL for this call. Zero always captures a new frame.
+        :return: A BGRA image. The array is shared and must not be modified.
+        :rtype: numpy.ndarray
+        """
+        maxAge = self.ttl if maxAge is None else maxAge
+        with self._lock:
+            fresh = self._frame is not None and time.monotonic() - self._frameTime <= maxAge
+            if fresh:
+                _cacheHits.inc()
+            if region is None:
+                if not fresh:
+                    with _captureTime.time():
+                        self._frame = self.source.grab(self.source.monitor(self.monitor))
+                    self._frameTime = time.monotonic()
+                    self.changes.update(self._frame)
+                return self._frame
+            left, top, width, height = (int(v) for v in region)
+            if fresh:
+                return self._frame[top:top + height, left:left + width]
+            mon = self.source.monitor(self.monitor)
+            with _captureTime.time():
+                return self.source.grab({
+                    "left": mon["left"] + left,
+                    "top": mon["top"] + top,
+                    "width": width,
+                    "height": height
+                })
+
+    def invalidate(self) -> None:
+        """
+        Drop the cached frame. Called after the bot changes the screen, such as when a window is opened.
+        """
+        with self._lock:
+            self._frame = None
+
+    def close(self) -> None:
+        self.invalidate()
+        self.source.close()
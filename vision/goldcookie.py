@@ -0,0 +1,127 @@
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+import metrics
+from vision.templates import Box
+
+GOLD_COOKIE_COLOR_1 = (193, 155, 71)
+GOLD_COOKIE_COLOR_2 = (225, 201, 111)
+"""The RGB colors that identify a golden cookie."""
+
+_detectTime = metrics.histogram("wafer_golden_cookie_detect_seconds",
+                                "Time spent searching a frame for golden cookies.")
+
+
+class GoldenCookieDetector:
+    """
+    Locates golden cookies on a frame by color rather than by template.
+
+    Golden cookies rotate, bounce and fade, and share their texture with the large cookie, so template
+    matching is unreliable. Instead, every pixel close to one of the known golden cookie colors is marked in
+    a mask, neighbouring hits are grouped with connected components and one centroid is reported per group.
+    """
+
+    def __init__(self, colors: Sequence[Tuple[int, int, int]], tolerance: int = 8, margin: int = 100,
+                 step: int = 2, minPixels: int = 4, mergeRadius: int = 100):
+        """
+        Initialize the detector.
+
+        :param colors: The RGB colors that identify a golden cookie.
+        :param tolerance: The maximum per-channel difference for a pixel to count as one of `colors`.
+        :param margin: The amount of pixels ignored along every edge of the frame.
+        :param step: Only every `step`-th row and column is inspected.
+        :param minPixels: The minimum amount of matching pixels for a group to count as a cookie.
+        :param mergeRadius: Groups whose centroids are closer than this many pixels are reported once.
+        """
+        self.tolerance = tolerance
+        self.margin = margin
+        self.step = max(1, step)
+        self.minPixels = minPixels
+        self.mergeRadius = mergeRadius
+        self._bounds = []
+        for r, g, b in colors:
+            # frames are in BGR(A) order; alpha is accepted as-is
+            color = np.array([b, g, r, 0], dtype=np.int32)
+            low = np.clip(color - tolerance, 0, 255)
+            high = np.clip(color + tolerance, 0, 255)
+            low[3], high[3] = 0, 255
+            self._bounds.append((low.astype(np.float64), high.astype(np.float64)))
+        # hits from one cookie are scattered over its texture, so they are pooled into coarse cells which are
+        # then grown until the cells of one cookie touch
+        self._cell = max(1, mergeRadius // (4 * self.step))
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+
+    def mask(self, view: np.ndarray) -> np.ndarray:
+        """
+        Build the color mask of a part of a frame, after subsampling it by `step`.
+
+        :param view: A BGR or BGRA image, already cropped.
+        :return: A uint8 array holding 255 where a pixel matches a golden cookie color.
+        """
+        if self.step > 1:
+            # nearest-neighbour resizing is the cheapest way to get a contiguous subsampled copy
+            view = cv2.resize(view, (view.shape[1] // self.step, view.shape[0] // self.step),
+                              interpolation=cv2.INTER_NEAREST)
+        channels = view.shape[2]
+        result = None
+        for low, high in self._bounds:
+            m = cv2.inRange(view, low[:channels], high[:channels])
+            result = m if result is None else cv2.bitwise_or(result, m)
+        return result
+
+    def detect(self, frame: np.ndarray, regions: Optional[Sequence[Box]] = None) -> List[Tuple[int, int]]:
+        """
+        Find the golden cookies on a frame.
+
+        :param frame: A BGR or BGRA image of the screen.
+        :param regions: Only search these parts of the frame, such as the parts that changed since the last
+            search. Defaults to the whole frame.
+        :return: One (x, y) coordinate per golden cookie, relative to the frame.
+        """
+        with _detectTime.time():
+            height, width = frame.shape[:2]
+            if regions is None:
+                regions = [Box(0, 0, width, height)]
+            coords: List[Tuple[int, int]] = []
+            for left, top, w, h in regions:
+                # the margin along the edges of the frame is never searched
+                x0, y0 = max(left, self.margin), max(top, self.margin)
+                x1, y1 = min(left + w, width - self.margin), min(top + h, height - self.margin)
+                if x1 - x0 < self.step or y1 - y0 < self.step:
+                    continue
+                for x, y in self._detect(frame[y0:y1, x0:x1]):
+                    x, y = x + x0, y + y0
+                    # a cookie on the border between two regions is found in both
+                    if not any(abs(x - cx) < self.mergeRadius and abs(y - cy) < self.mergeRadius
+                               for cx, cy in coords):
+                        coords.append((x, y))
+            return coords
+
+    def _detect(self, view: np.ndarray) -> List[Tuple[int, int]]:
+        hits = self.mask(view)
+        if not cv2.countNonZero(hits):
+            return []
+
+        ys, xs = np.nonzero(hits)
+        cells = np.zeros(((hits.shape[0] - 1) // self._cell + 1, (hits.shape[1] - 1) // self._cell + 1),
+                         dtype=np.uint8)
+        cells[ys // self._cell, xs // self._cell] = 255
+        count, labels = cv2.connectedComponents(cv2.dilate(cells, self._kernel), connectivity=8)
+        owners = labels[ys // self._cell, xs // self._cell]
+        pixels = np.bincount(owners, minlength=count)
+        sumX = np.bincount(owners, weights=xs, minlength=count)
+        sumY = np.bincount(owners, weights=ys, minlength=count)
+
+        coords: List[Tuple[int, int]] = []
+        # largest groups first so stray pixels near a cookie merge into it rather than the reverse
+        for label in np.argsort(-pixels):
+            if label == 0 or pixels[label] < self.minPixels:
+                continue
+            x = int(sumX[label] / pixels[label]) * self.step
+            y = int(sumY[label] / pixels[label]) * self.step
+            if any(abs(x - cx) < self.mergeRadius and abs(y - cy) < self.mergeRadius for cx, cy in coords):
+                continue
+            coords.append((x, y))
+        return coords
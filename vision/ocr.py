@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+GLYPH_SIZE = 16
+"""Glyphs are scaled to a square of this many pixels before being compared."""
+
+
+class GlyphOCR:
+    """
+    Reads single lines of text in the game's font by comparing each character with known glyphs.
+
+    The line is split into glyphs at the empty columns between them, and every glyph is scaled to a fixed size
+    and compared with the atlas by normalized correlation, which takes well under a millisecond per line. The
+    game's font is not shipped, so the atlas starts empty and grows from lines read by a slower reader such as
+    Tesseract (see `learn`). It is saved to disk so the slow reader is only needed for the first few reads.
+    """
+
+    def __init__(self, path: Optional[str] = "vision/glyphs.npz", threshold: float = 0.9,
+                 samplesPerChar: int = 8, spaceRatio: float = 0.35):
+        """
+        Initialize the reader and load its atlas.
+
+        :param path: Where the atlas is stored. None keeps it in memory only.
+        :param threshold: The minimum correlation for a glyph to be recognized, from 0 to 1.
+        :param samplesPerChar: The most samples kept per character, as anti-aliasing varies with position.
+        :param spaceRatio: Gaps wider than this fraction of the line height are read as spaces.
+        """
+        self.path = path
+        self.threshold = threshold
+        self.samplesPerChar = samplesPerChar
+        self.spaceRatio = spaceRatio
+        self.logger = logging.getLogger("wafer")
+        self._lock = threading.Lock()
+        self.atlas = np.zeros((0, GLYPH_SIZE * GLYPH_SIZE), dtype=np.float32)
+        """One normalized glyph per row."""
+        self.labels: List[str] = []
+        """The character of each row of the atlas."""
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                self.atlas = data["atlas"].astype(np.float32)
+                self.labels = [str(c) for c in data["labels"]]
+
+    @staticmethod
+    def segment(mask: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Split a line of text into glyphs.
+
+        :param mask: A 2D array that is non-zero where the text is.
+        :return: The first and last+1 column of every glyph, left to right.
+        """
+        columns = np.flatnonzero(mask.any(axis=0))
+        if not len(columns):
+            return []
+        breaks = np.flatnonzero(np.diff(columns) > 1)
+        starts = np.concatenate(([columns[0]], columns[breaks + 1]))
+        ends = np.concatenate((columns[breaks], [columns[-1]])) + 1
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    def _features(self, mask: np.ndarray, spans: List[Tuple[int, int]]) -> Tuple[np.ndarray, List[bool]]:
+        """
+        Scale every glyph to `GLYPH_SIZE` and normalize it, and find where spaces fall between them.
+
+        :return: One feature row per glyph, and whether a space comes before each glyph.
+        """
+        rows = np.flatnonzero(mask.any(axis=1))
+        textHeight = rows[-1] + 1 - rows[0]
+        # glyphs are cut at the full height of the strip rather than of the text, so they keep their position
+        # on the line whether or not it has letters reaching below it, and "." stays apart from other glyphs
+        height = mask.shape[0]
+        features = np.empty((len(spans), GLYPH_SIZE * GLYPH_SIZE), dtype=np.float32)
+        spaces = []
+        for i, (start, end) in enumerate(spans):
+            glyph = (mask[:, start:end] > 0).astype(np.float32)
+            width = end - start
+            if width < height:
+                pad = (height - width) // 2
+                glyph = cv2.copyMakeBorder(glyph, 0, 0, pad, height - width - pad, cv2.BORDER_CONSTANT, value=0)
+            glyph = cv2.resize(glyph, (GLYPH_SIZE, GLYPH_SIZE), interpolation=cv2.INTER_AREA).ravel()
+            glyph -= glyph.mean()
+            norm = np.linalg.norm(glyph)
+            features[i] = glyph / norm if norm else glyph
+            spaces.append(i > 0 and start - spans[i - 1][1] > self.spaceRatio * textHeight)
+        return features, spaces
+
+    def read(self, mask: np.ndarray) -> Optional[str]:
+        """
+        Read a line of text.
+
+        :param mask: A 2D array that is non-zero where the text is.
+        :return: The text, or None if a glyph could not be recognized.
+        """
+        spans = self.segment(mask)
+        if not spans:
+            return ""
+        with self._lock:
+            atlas, labels = self.atlas, self.labels
+        if not len(atlas):
+            return None
+        features, spaces = self._features(mask, spans)
+        scores = features @ atlas.T
+        best = scores.argmax(axis=1)
+        if (scores[np.arange(len(best)), best] < self.threshold).any():
+            return None
+        return "".join((" " if space else "") + labels[index] for index, space in zip(best, spaces))
+
+    def learn(self, mask: np.ndarray, text: str) -> bool:
+        """
+        Add the glyphs of a line whose text is known to the atlas.
+
+        :param mask: A 2D array that is non-zero where the text is.
+        :param text: The text of the line. Spaces are ignored.
+        :return: True if the text matched the glyphs found and was learned.
+        """
+        chars = [c for c in text if not c.isspace()]
+        spans = self.segment(mask)
+        if not spans or len(spans) != len(chars):
+            return False
+        features, _ = self._features(mask, spans)
+        with self._lock:
+            atlas, labels = list(self.atlas), list(self.labels)
+            added = False
+            for feature, char in zip(features, chars):
+                known = [i for i, label in enumerate(labels) if label == char]
+                if len(known) >= self.samplesPerChar:
+                    continue
+                if known and max(float(atlas[i] @ feature) for i in known) > 0.99:
+                    continue  # already known in this exact form
+                atlas.append(feature)
+                labels.append(char)
+                added = True
+            if added:
+                self.atlas = np.array(atlas, dtype=np.float32)
+                self.labels = labels
+        if added and self.path:
+            self.save()
+        return True
+
+    def reset(self) -> None:
+        """
+        Forget every glyph, and delete the atlas from disk.
+        """
+        with self._lock:
+            self.atlas = np.zeros((0, GLYPH_SIZE * GLYPH_SIZE), dtype=np.float32)
+            self.labels = []
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def save(self) -> None:
+        """
+        Write the atlas to disk.
+        """
+        with self._lock:
+            atlas, labels = self.atlas, np.array(self.labels)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.path + ".tmp.npz"
+        np.savez_compressed(temporary, atlas=atlas, labels=labels)
+        os.replace(temporary, self.path)
@@ -0,0 +1,354 @@
+import math
+import os
+import random
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from controls import Point, RecordingBackend
+from garden.garden import plotLimits
+from vision.templates import Box
+
+STORE_BUILDINGS = ["cursor", "grandma", "farm", "mine", "factory", "bank", "temple", "wizard tower", "shipment",
+                   "alchemy lab", "portal"]
+"""The building images drawn in the store, top to bottom."""
+GARDEN_PLOT_SPACING = 60
+"""Pixels between the plots of the garden grid, as in the game."""
+_BACKGROUND = (64, 32, 12)
+_OCCLUDER = (40, 40, 40)
+
+
+class GoldenCookie:
+    """
+    A golden cookie drawn on a synthetic screen.
+    """
+    __slots__ = ("x", "y", "angle", "scale", "occlusion", "vx", "vy", "spin", "spawnedAt", "expiresAt")
+
+    def __init__(self, x: float, y: float, angle: float = 0.0, scale: float = 1.0, occlusion: float = 0.0,
+                 vx: float = 0.0, vy: float = 0.0, spin: float = 0.0, spawnedAt: float = 0.0,
+                 expiresAt: float = math.inf):
+        self.x = x
+        self.y = y
+        """The center of the cookie, in pixels."""
+        self.angle = angle
+        """The rotation of the cookie, in degrees."""
+        self.scale = scale
+        self.occlusion = occlusion
+        """The fraction of the cookie, from its right edge, hidden behind something else."""
+        self.vx = vx
+        self.vy = vy
+        """The velocity of the cookie, in pixels per second."""
+        self.spin = spin
+        """The rotation speed of the cookie, in degrees per second."""
+        self.spawnedAt = spawnedAt
+        self.expiresAt = expiresAt
+        """When the cookie disappears, in seconds of screen time."""
+
+    @property
+    def radius(self) -> float:
+        return 48 * self.scale
+
+    def contains(self, point: Tuple[float, float]) -> bool:
+        return (point[0] - self.x) ** 2 + (point[1] - self.y) ** 2 <= self.radius ** 2
+
+    def __repr__(self):
+        return f"GoldenCookie(x={self.x:.1f}, y={self.y:.1f}, angle={self.angle:.1f}, scale={self.scale}, " \
+               f"occlusion={self.occlusion})"
+
+
+class SceneTruth(NamedTuple):
+    """
+    Where everything was drawn on a synthetic frame, to check detections against.
+    """
+    time: float
+    """The screen time of the frame, in seconds."""
+    goldenCookies: List[Point]
+    """The centers of the golden cookies."""
+    templates: Dict[str, Box]
+    """Where each image from the asset folder was drawn, by template name."""
+    gardenPlots: Dict[Tuple[int, int], Point]
+    """The centers of the garden plots, by grid position. Empty while the garden is closed."""
+    marketButtons: Dict[int, Tuple[Point, Point]]
+    """The centers of the buy and sell buttons, by stock id. Empty while the market is hidden."""
+    cpsText: str
+    """The text drawn after the CPS label."""
+
+
+class SyntheticScreen:
+    """
+    Draws a fake game screen from the shipped assets, so the vision code can run without the game or a display.
+
+    The screen is a capture source, so it can be handed to a `FrameProvider` (see `helpers.useFrameSource`).
+    Everything static is drawn once; golden cookies move, spin and expire as `advance` moves screen time forward,
+    and are drawn on top of the static layer whenever a frame is requested after a change.
+    """
+
+    def __init__(self, width: int = 1920, height: int = 1080, directory: str = "img", seed: int = 0,
+                 cpsText: str = "1.234 million", gardenOpen: bool = False, farmLevel: int = 9,
+                 marketOpen: bool = False, stockCount: int = 16, marketColumns: int = 3):
+        """
+        Initialize the screen.
+
+        :param width: The width of the screen.
+        :param height: The height of the screen.
+        :param directory: The folder containing the .png assets.
+        :param seed: Seed of the background noise and random golden cookies.
+        :param cpsText: The text drawn after the CPS label, such as "1.234 million".
+        :param gardenOpen: Whether the garden grid is drawn. The view garden button is drawn otherwise.
+        :param farmLevel: The farm level, which decides how many plots are drawn.
+        :param marketOpen: Whether the stock market buttons are drawn.
+        :param stockCount: The amount of stocks in the market.
+        :param marketColumns: The amount of stocks per row of the market.
+        """
+        self.width = width
+        self.height = height
+        self.directory = directory
+        self.rng = random.Random(seed)
+        self.cpsText = cpsText
+        self.gardenOpen = gardenOpen
+        self.farmLevel = farmLevel
+        self.marketOpen = marketOpen
+        self.stockCount = stockCount
+        self.marketColumns = marketColumns
+        self.time = 0.0
+        """Screen time, in seconds."""
+        self.goldenCookies: List[GoldenCookie] = []
+
+        self._images: Dict[str, np.ndarray] = {}
+        self._noise = np.random.default_rng(seed).integers(0, 12, (height, width, 1), dtype=np.uint8)
+        self._static: Optional[np.ndarray] = None
+        self._staticTruth: Optional[SceneTruth] = None
+        self._frame: Optional[np.ndarray] = None
+        self._goldCookie = self._loadGoldCookie()
+
+    def _image(self, name: str) -> np.ndarray:
+        # drawn without their alpha channel, as that is how the templates are loaded
+        if name not in self._images:
+            image = cv2.imread(os.path.join(self.directory, f"{name}.png"), cv2.IMREAD_COLOR)
+            if image is None:
+                raise FileNotFoundError(f"Could not load {name}.png from {self.directory}.")
+            self._images[name] = image
+        return self._images[name]
+
+    def _loadGoldCookie(self) -> np.ndarray:
+        rgba = np.array(Image.open(os.path.join(self.directory, "goldCookie.png")).convert("RGBA"))
+        return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGRA)
+
+    def invalidate(self) -> None:
+        """
+        Redraw everything on the next frame. Must be called after changing the scene settings.
+        """
+        self._static = None
+        self._frame = None
+
+    def _paste(self, frame: np.ndarray, name: str, left: int, top: int, templates: Dict[str, Box]) -> Box:
+        image = self._image(name)
+        height, width = image.shape[:2]
+        frame[top:top + height, left:left + width, :3] = image
+        box = Box(left, top, width, height)
+        templates.setdefault(name, box)
+        return box
+
+    def _drawStatic(self) -> None:
+        frame = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        frame[..., :3] = _BACKGROUND
+        frame[..., :3] += self._noise
+        frame[..., 3] = 255
+        templates: Dict[str, Box] = {}
+
+        self._paste(frame, "mainCookie", 230, 390, templates)
+        label = self._paste(frame, "cps", 200, 200, templates)
+        frame[label.top:label.top + label.height, label.left + label.width:label.left + 400, :3] = 0
+        cv2.putText(frame, self.cpsText, (label.left + label.width + 8, label.top + label.height - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255, 255), 2, cv2.LINE_AA)
+
+        top = 150
+        for name in STORE_BUILDINGS:
+            box = self._paste(frame, name, self.width - 300, top, templates)
+            top += box.height + 8
+
+        gardenPlots: Dict[Tuple[int, int], Point] = {}
+        if self.gardenOpen:
+            self._paste(frame, "closeGarden", 700, 100, templates)
+            plot = self._image("gardenPlot")
+            x1, y1, x2, y2 = plotLimits(self.farmLevel)
+            for y in range(y1, y2):
+                for x in range(x1, x2):
+                    left, top = 700 + x * GARDEN_PLOT_SPACING, 160 + y * GARDEN_PLOT_SPACING
+                    box = self._paste(frame, "gardenPlot", left, top, templates)
+                    gardenPlots[(x, y)] = Point(left + plot.shape[1] / 2, top + plot.shape[0] / 2)
+        else:
+            self._paste(frame, "viewGarden", 700, 100, templates)
+
+        marketButtons: Dict[int, Tuple[Point, Point]] = {}
+        if self.marketOpen:
+            for stockId in range(self.stockCount):
+                row, column = divmod(stockId, self.marketColumns)
+                left, top = 760 + column * 250, 580 + row * 70
+                buy = self._paste(frame, "buyStockButton", left, top, templates)
+                sell = self._paste(frame, "sellStockButton", left + 75, top + 4, templates)
+                marketButtons[stockId] = (Point(buy.left + buy.width / 2, buy.top + buy.height / 2),
+                                          Point(sell.left + sell.width / 2, sell.top + sell.height / 2))
+
+        self._static = frame
+        self._staticTruth = SceneTruth(0.0, [], templates, gardenPlots, marketButtons, self.cpsText)
+
+    def _drawGoldenCookie(self, frame: np.ndarray, cookie: GoldenCookie) -> bool:
+        sprite = self._goldCookie
+        size = int(math.ceil(sprite.shape[0] * cookie.scale * math.sqrt(2)))
+        matrix = cv2.getRotationMatrix2D((sprite.shape[1] / 2, sprite.shape[0] / 2), cookie.angle, cookie.scale)
+        matrix[:, 2] += (size - sprite.shape[1]) / 2, (size - sprite.shape[0]) / 2
+        # nearest-neighbour sampling keeps the exact texture colors the detector looks for
+        rotated = cv2.warpAffine(sprite, matrix, (size, size), flags=cv2.INTER_NEAREST,
+                                 borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0))
+        left, top = int(round(cookie.x - size / 2)), int(round(cookie.y - size / 2))
+        x0, y0 = max(0, left), max(0, top)
+        x1, y1 = min(self.width, left + size), min(self.height, top + size)
+        if x0 >= x1 or y0 >= y1:
+            return False
+        patch = rotated[y0 - top:y1 - top, x0 - left:x1 - left]
+        target = frame[y0:y1, x0:x1]
+        opaque = patch[..., 3] > 0
+        target[opaque, :3] = patch[opaque, :3]
+        if cookie.occlusion > 0:
+            hidden = int(round(cookie.radius * 2 * (1 - cookie.occlusion)))
+            ox = max(x0, int(round(cookie.x - cookie.radius)) + hidden)
+            frame[y0:y1, ox:x1, :3] = _OCCLUDER
+        return True
+
+    def render(self) -> Tuple[np.ndarray, SceneTruth]:
+        """
+        Draw the current frame.
+
+        :return: The BGRA frame and where everything on it was drawn. The frame must not be modified.
+        """
+        if self._static is None:
+            self._drawStatic()
+        if self._frame is None:
+            frame = self._static.copy()
+            for cookie in self.goldenCookies:
+                self._drawGoldenCookie(frame, cookie)
+            self._frame = frame
+        return self._frame, self.truth()
+
+    def truth(self) -> SceneTruth:
+        """
+        Get where everything on the current frame is drawn.
+        """
+        if self._static is None:
+            self._drawStatic()
+        cookies = [Point(c.x, c.y) for c in self.goldenCookies
+                   if 0 <= c.x < self.width and 0 <= c.y < self.height]
+        return self._staticTruth._replace(time=self.time, goldenCookies=cookies)
+
+    def addGoldenCookie(self, x: float, y: float, **kwargs) -> GoldenCookie:
+        """
+        Add a golden cookie. See `GoldenCookie` for the keyword arguments.
+
+        :param x: The x coordinate of its center.
+        :param y: The y coordinate of its center.
+        :return: The new cookie.
+        """
+        kwargs.setdefault("spawnedAt", self.time)
+        cookie = GoldenCookie(x, y, **kwargs)
+        self.goldenCookies.append(cookie)
+        self._frame = None
+        return cookie
+
+    def spawnGoldenCookies(self, count: int, maxOcclusion: float = 0.0, maxSpeed: float = 0.0,
+                           lifetime: Tuple[float, float] = (math.inf, math.inf), margin: int = 150) \
+            -> List[GoldenCookie]:
+        """
+        Add golden cookies at random positions and rotations, away from each other.
+
+        :param count: The amount of cookies.
+        :param maxOcclusion: The largest fraction of a cookie that may be hidden.
+        :param maxSpeed: The fastest a cookie may move, in pixels per second.
+        :param lifetime: The shortest and longest a cookie may stay on screen, in seconds.
+        :param margin: The distance kept from the edges of the screen.
+        :return: The new cookies.
+        """
+        cookies = []
+        for _ in range(count):
+            for attempt in range(100):
+                x = self.rng.uniform(margin, self.width - margin)
+                y = self.rng.uniform(margin, self.height - margin)
+                if all((x - c.x) ** 2 + (y - c.y) ** 2 > (2.5 * c.radius) ** 2 for c in self.goldenCookies):
+                    break
+            heading = self.rng.uniform(0, 2 * math.pi)
+            speed = self.rng.uniform(0, maxSpeed)
+            cookies.append(self.addGoldenCookie(
+                x, y, angle=self.rng.uniform(0, 360), scale=self.rng.uniform(0.8, 1.1),
+                occlusion=self.rng.uniform(0, maxOcclusion), vx=speed * math.cos(heading),
+                vy=speed * math.sin(heading), spin=self.rng.uniform(-30, 30),
+                expiresAt=self.time + self.rng.uniform(*lifetime)))
+            if math.isnan(cookies[-1].expiresAt):
+                # drawn from an infinite lifetime, which would otherwise expire the cookie on the next advance
+                cookies[-1].expiresAt = math.inf
+        return cookies
+
+    def advance(self, seconds: float) -> None:
+        """
+        Move screen time forward, moving golden cookies and removing the ones that expired.
+
+        :param seconds: How far to move time forward.
+        """
+        self.time += seconds
+        for cookie in self.goldenCookies:
+            cookie.x += cookie.vx * seconds
+            cookie.y += cookie.vy * seconds
+            cookie.angle = (cookie.angle + cookie.spin * seconds) % 360
+            # bounce off the edges so cookies stay on screen until they expire
+            if not cookie.radius <= cookie.x <= self.width - cookie.radius:
+                cookie.vx = -cookie.vx
+            if not cookie.radius <= cookie.y <= self.height - cookie.radius:
+                cookie.vy = -cookie.vy
+        self.goldenCookies = [c for c in self.goldenCookies if c.expiresAt > self.time]
+        self._frame = None
+
+    def press(self, point: Tuple[float, float]) -> Optional[GoldenCookie]:
+        """
+        Click the screen. A golden cookie under the point is removed, as in the game.
+
+        :param point: Where the click happened.
+        :return: The cookie that was clicked, if any.
+        """
+        for cookie in self.goldenCookies:
+            if cookie.contains(point):
+                self.goldenCookies.remove(cookie)
+                self._frame = None
+                return cookie
+        return None
+
+    def monitor(self, monitor: int) -> Dict[str, int]:
+        return {"left": 0, "top": 0, "width": self.width, "height": self.height}
+
+    def grab(self, area: Dict[str, int]) -> np.ndarray:
+        frame, _ = self.render()
+        return frame[area["top"]:area["top"] + area["height"], area["left"]:area["left"] + area["width"]]
+
+    def close(self) -> None:
+        pass
+
+
+class SyntheticInputBackend(RecordingBackend):
+    """
+    Records input like `RecordingBackend`, and passes clicks on to a synthetic screen so clicked golden cookies
+    disappear.
+    """
+
+    def __init__(self, screen: SyntheticScreen, pause: float = 0.0):
+        super().__init__(pause, Point(screen.width, screen.height))
+        self.screen = screen
+        self.hits: List[GoldenCookie] = []
+        """The golden cookies that were clicked."""
+
+    def clickMany(self, points: Iterable[Optional[Point]], interval: float = 0.0, pause: bool = True) -> None:
+        points = list(points)
+        super().clickMany(points, interval, pause)
+        for point in points:
+            cookie = self.screen.press(point if point is not None else self.position)
+            if cookie is not None:
+                self.hits.append(cookie)
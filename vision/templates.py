@@ -0,0 +1,325 @@
+import glob
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import metrics
+
+_matchTime = metrics.histogram("wafer_template_match_seconds",
+                               "Time spent matching a template against a frame.")
+
+
+class Box(NamedTuple):
+    """A rectangle on the screen, in pixels."""
+    left: int
+    top: int
+    width: int
+    height: int
+
+
+class Template:
+    """
+    An image asset, decoded and preprocessed once so that matching never touches the disk.
+    """
+    __slots__ = ("name", "color", "gray", "width", "height", "colorNorm", "grayNorm")
+
+    def __init__(self, name: str, image: np.ndarray):
+        """
+        Create a template from a decoded image.
+
+        :param name: The name of the template, which is the file name without its extension.
+        :param image: The image in BGR order.
+        """
+        self.name = name
+        self.color: np.ndarray = np.ascontiguousarray(image)
+        self.gray: np.ndarray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self.height, self.width = self.gray.shape
+        # Norm of the zero-mean template; a zero norm means the template is flat and can never correlate.
+        self.colorNorm = float(np.linalg.norm(self.color - self.color.mean(axis=(0, 1))))
+        self.grayNorm = float(np.linalg.norm(self.gray - self.gray.mean()))
+
+
+class TemplateRegistry:
+    """
+    Holds every image in the asset folder, loaded at startup, and matches them against frames
+    with `cv2.matchTemplate`.
+    """
+
+    def __init__(self, directory: str = "img"):
+        """
+        Initialize the registry and load all templates.
+
+        :param directory: The folder containing the .png assets.
+        """
+        self.directory = directory
+        self.logger = logging.getLogger("wafer")
+        self.templates: Dict[str, Template] = {}
+        # the last frame converted to grayscale and its conversion, so several lookups on the same frame convert
+        # it once; kept as one tuple that is replaced whole, so threads sharing the registry never see a frame
+        # paired with another frame's conversion
+        self._grayCache: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.load()
+
+    def load(self) -> None:
+        """
+        Decode and preprocess every .png in the asset folder.
+
+        :rtype: None
+        """
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.png"))):
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                self.logger.error(f"Could not load template {path}.")
+                continue
+            name = os.path.splitext(os.path.basename(path))[0]
+            self.templates[name] = Template(name, image)
+
+    def get(self, name: str) -> Template:
+        """
+        Get a template by name. Paths such as "img/cps.png" are accepted and resolve to "cps".
+
+        :param name: The name or path of the template.
+        :return: The template.
+        """
+        key = os.path.splitext(os.path.basename(name))[0]
+        if key not in self.templates:
+            raise KeyError(f"Unknown template {name}.")
+        return self.templates[key]
+
+    def _prepare(self, frame: np.ndarray, grayscale: bool, region: Optional[Box] = None) -> np.ndarray:
+        cache = self._grayCache
+        if region is not None:
+            x, y, w, h = region
+            if grayscale and cache is not None and frame is cache[0]:
+                # the whole frame was already converted, slicing it is free
+                return cache[1][y:y + h, x:x + w]
+            return self._convert(frame[y:y + h, x:x + w], grayscale)
+        if grayscale and frame.ndim == 3:
+            if cache is None or frame is not cache[0]:
+                cache = (frame, self._convert(frame, True))
+                self._grayCache = cache
+            return cache[1]
+        return self._convert(frame, grayscale)
+
+    @staticmethod
+    def _convert(image: np.ndarray, grayscale: bool) -> np.ndarray:
+        channels = image.shape[2] if image.ndim == 3 else 1
+        if grayscale:
+            if channels == 1:
+                return image
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if channels == 4 else cv2.COLOR_BGR2GRAY)
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR) if channels == 4 else image
+
+    def _scores(self, frame: np.ndarray, template: Template, grayscale: bool,
+                region: Optional[Box] = None) -> Optional[np.ndarray]:
+        image = self._prepare(frame, grayscale, region)
+        needle = template.gray if grayscale else template.color
+        if image.shape[0] < template.height or image.shape[1] < template.width:
+            return None
+        if (template.grayNorm if grayscale else template.colorNorm) == 0:
+            return None
+        return cv2.matchTemplate(image, needle, cv2.TM_CCOEFF_NORMED)
+
+    def match(self, frame: np.ndarray, name: str, grayscale: bool = True, confidence: float = 0.9,
+              region: Optional[Box] = None) -> Optional[Box]:
+        """
+        Find the best match of a template on a frame.
+
+        :param frame: A BGR, BGRA or grayscale image.
+        :param name: The name or path of the template.
+        :param grayscale: Whether to compare in grayscale rather than in color.
+        :param confidence: The minimum normalized correlation for a match, from 0 to 1.
+        :param region: Only search inside this part of the frame. The returned box is still relative to the frame.
+        :return: The bounding box of the best match, or None if nothing reached the confidence.
+        """
+        template = self.get(name)
+        with _matchTime.time():
+            scores = self._scores(frame, template, grayscale, region)
+        if scores is None:
+            return None
+        _, best, _, (x, y) = cv2.minMaxLoc(scores)
+        if best < confidence:
+            return None
+        if region is not None:
+            x, y = x + region.left, y + region.top
+        return Box(x, y, template.width, template.height)
+
+    def matchAll(self, frame: np.ndarray, name: str, grayscale: bool = True, confidence: float = 0.9) -> List[Box]:
+        """
+        Find every non-overlapping match of a template on a frame.
+
+        :param frame: A BGR, BGRA or grayscale image.
+        :param name: The name or path of the template.
+        :param grayscale: Whether to compare in grayscale rather than in color.
+        :param confidence: The minimum normalized correlation for a match, from 0 to 1.
+        :return: The bounding boxes of the matches, sorted top to bottom and then left to right.
+        """
+        template = self.get(name)
+        with _matchTime.time():
+            scores = self._scores(frame, template, grayscale)
+        if scores is None:
+            return []
+        # only keep local maxima, then drop any that overlap a better match
+        peaks = cv2.dilate(scores, np.ones((template.height, template.width), dtype=np.uint8))
+        ys, xs = np.nonzero((scores >= confidence) & (scores >= peaks))
+        boxes: List[Box] = []
+        for i in np.argsort(-scores[ys, xs]):
+            x, y = int(xs[i]), int(ys[i])
+            if any(abs(x - b.left) < template.width and abs(y - b.top) < template.height for b in boxes):
+                continue
+            boxes.append(Box(x, y, template.width, template.height))
+        return sorted(boxes, key=lambda b: (b.top, b.left))
+
+
+class HintStats:
+    """
+    Counters describing how useful the location hint of one template has been.
+    """
+    __slots__ = ("hits", "misses", "fullSearches", "unchanged", "hintTime", "fullTime")
+
+    def __init__(self):
+        self.hits = 0
+        """Lookups answered by searching around the last known location."""
+        self.unchanged = 0
+        """Lookups answered without searching, as the screen around the last known location did not change."""
+        self.misses = 0
+        """Lookups where a hint existed but the template was not around it anymore."""
+        self.fullSearches = 0
+        """Lookups that searched the whole frame."""
+        self.hintTime = 0.0
+        """Seconds spent searching around hints."""
+        self.fullTime = 0.0
+        """Seconds spent searching whole frames."""
+
+    def timeSaved(self) -> float:
+        """
+        Estimate the seconds saved by the hint, assuming every hit and unchanged lookup would otherwise have
+        cost an average full-frame search.
+
+        :return: The estimated time saved, in seconds.
+        """
+        if not self.fullSearches:
+            return 0.0
+        return (self.hits + self.unchanged) * (self.fullTime / self.fullSearches) - self.hintTime
+
+    def __repr__(self):
+        return f"{self.hits} hits, {self.unchanged} unchanged, {self.misses} misses, " \
+               f"{self.fullSearches} full searches, " \
+               f"~{self.timeSaved() * 1000:.0f}ms saved"
+
+
+class LocationHints:
+    """
+    Remembers where each template was last found. Lookups search a small padded window around that location
+    first and only fall back to the whole frame when the template is not there anymore.
+
+    Meant for UI elements that rarely move, such as the main cookie or the garden buttons. When the frame comes
+    with a change detector, a location found on an earlier frame is trusted without searching as long as the
+    screen around it did not change, and searched again at least every `revalidateInterval` seconds.
+    """
+
+    def __init__(self, registry: TemplateRegistry, padding: int = 32, revalidateInterval: float = 2.0):
+        """
+        Initialize the hint layer.
+
+        :param registry: The registry used for matching.
+        :param padding: The amount of pixels searched around the last known location, on every side.
+        :param revalidateInterval: The most seconds a location is trusted without searching for it.
+        """
+        self.registry = registry
+        self.padding = padding
+        self.revalidateInterval = revalidateInterval
+        self.boxes: Dict[str, Box] = {}
+        self.stats: Dict[str, HintStats] = {}
+        # the serial number of the frame, the time, and the grayscale and confidence each location was last found
+        # with; a location is only trusted for lookups at most as strict as the one that found it
+        self._validated: Dict[str, Tuple[int, float, bool, float]] = {}
+        # guards the hints and stats, which several threads update; matching itself runs outside of it
+        self._lock = threading.Lock()
+
+    def match(self, frame: np.ndarray, name: str, grayscale: bool = True, confidence: float = 0.9,
+              changes=None) -> Optional[Box]:
+        """
+        Find the best match of a template on a frame, trying around its last known location first.
+
+        :param frame: A BGR, BGRA or grayscale image.
+        :param name: The name or path of the template.
+        :param grayscale: Whether to compare in grayscale rather than in color.
+        :param confidence: The minimum normalized correlation for a match, from 0 to 1.
+        :param changes: The `vision.changes.ChangeDetector` that compared the frame, if any.
+        :return: The bounding box of the best match, or None if nothing reached the confidence.
+        """
+        key = self.registry.get(name).name
+        with self._lock:
+            stats = self.stats.setdefault(key, HintStats())
+            hint = self.boxes.get(key)
+            validated = self._validated.get(key)
+        serial = changes.serialOf(frame) if changes is not None else None
+        if hint is not None:
+            if serial is not None and validated is not None and validated[2] == grayscale \
+                    and confidence <= validated[3] and time.monotonic() - validated[1] < self.revalidateInterval \
+                    and not changes.changed(hint, since=validated[0]):
+                with self._lock:
+                    stats.unchanged += 1
+                return hint
+
+            start = time.perf_counter()
+            box = self.registry.match(frame, key, grayscale, confidence, region=self.window(hint, frame))
+            with self._lock:
+                stats.hintTime += time.perf_counter() - start
+                if box is not None:
+                    stats.hits += 1
+                    self._found(key, box, serial, grayscale, confidence)
+                    return box
+                stats.misses += 1
+
+        start = time.perf_counter()
+        box = self.registry.match(frame, key, grayscale, confidence)
+        with self._lock:
+            stats.fullTime += time.perf_counter() - start
+            stats.fullSearches += 1
+            if box is not None:
+                self._found(key, box, serial, grayscale, confidence)
+        return box
+
+    def _found(self, key: str, box: Box, serial: Optional[int], grayscale: bool, confidence: float) -> None:
+        # called with the lock held
+        self.boxes[key] = box
+        if serial is not None:
+            self._validated[key] = (serial, time.monotonic(), grayscale, confidence)
+        else:
+            self._validated.pop(key, None)
+
+    def window(self, box: Box, frame: np.ndarray) -> Box:
+        """
+        Get the padded search window around a box, clamped to the frame.
+
+        :param box: The last known bounding box.
+        :param frame: The frame being searched.
+        :return: The search window.
+        """
+        left = max(0, box.left - self.padding)
+        top = max(0, box.top - self.padding)
+        right = min(frame.shape[1], box.left + box.width + self.padding)
+        bottom = min(frame.shape[0], box.top + box.height + self.padding)
+        return Box(left, top, right - left, bottom - top)
+
+    def forget(self, name: Optional[str] = None) -> None:
+        """
+        Drop the hint of one template, or of every template.
+
+        :param name: The name or path of the template. Defaults to every template.
+        """
+        key = None if name is None else self.registry.get(name).name
+        with self._lock:
+            if key is None:
+                self.boxes.clear()
+                self._validated.clear()
+            else:
+                self.boxes.pop(key, None)
+                self._validated.pop(key, None)
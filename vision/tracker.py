@@ -0,0 +1,283 @@
+import argparse
+import logging
+import math
+import statistics
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from controls import Point
+from vision.templates import Box
+
+GOLDEN_COOKIE_LIFETIME = 13.0
+"""How long a golden cookie stays on screen without upgrades, in seconds."""
+
+
+class Track:
+    """
+    One golden cookie followed across frames.
+    """
+    __slots__ = ("id", "x", "y", "vx", "vy", "firstSeen", "lastSeen", "frames", "missed")
+
+    def __init__(self, id: int, x: float, y: float, timestamp: float):
+        self.id = id
+        self.x = x
+        self.y = y
+        """Where the cookie was last detected, in pixels."""
+        self.vx = 0.0
+        self.vy = 0.0
+        """The estimated velocity of the cookie, in pixels per second."""
+        self.firstSeen = timestamp
+        self.lastSeen = timestamp
+        self.frames = 1
+        """The amount of frames the cookie was detected in."""
+        self.missed = 0
+        """The amount of frames in a row the cookie was not detected in."""
+
+    def predict(self, timestamp: float) -> Tuple[float, float]:
+        """
+        Predict where the cookie is.
+
+        :param timestamp: When, in seconds.
+        :return: The predicted (x, y) position.
+        """
+        elapsed = timestamp - self.lastSeen
+        return self.x + self.vx * elapsed, self.y + self.vy * elapsed
+
+    def remaining(self, timestamp: float, lifetime: float) -> float:
+        """
+        Estimate how long the cookie stays on screen, assuming it appeared when it was first seen.
+
+        :param timestamp: The current time, in seconds.
+        :param lifetime: How long a cookie stays on screen, in seconds.
+        :return: The remaining seconds.
+        """
+        return max(0.0, lifetime - (timestamp - self.firstSeen))
+
+    def __repr__(self):
+        return f"Track(id={self.id}, x={self.x:.1f}, y={self.y:.1f}, vx={self.vx:.1f}, vy={self.vy:.1f}, " \
+               f"frames={self.frames})"
+
+
+class GoldenCookieTracker:
+    """
+    Follows golden cookies across frames so they are clicked where they will be rather than where they were.
+
+    Every frame's detections are matched to the known cookies by distance from their predicted position, and
+    the velocity of each cookie is smoothed from its matches. Cookies are clicked oldest first, since the
+    one that appeared first is the one that disappears first.
+    """
+
+    def __init__(self, maxDistance: float = 100.0, smoothing: float = 0.5, maxMissed: int = 3,
+                 lifetime: float = GOLDEN_COOKIE_LIFETIME):
+        """
+        Initialize the tracker.
+
+        :param maxDistance: The farthest a detection may be from a cookie's predicted position to match it.
+        :param smoothing: How much a new velocity measurement counts against the previous ones, from 0 to 1.
+        :param maxMissed: Cookies not detected in this many frames in a row are forgotten. They are kept for a
+            few frames so one the detector briefly loses keeps its age and velocity.
+        :param lifetime: How long a cookie stays on screen, in seconds.
+        """
+        self.maxDistance = maxDistance
+        self.smoothing = smoothing
+        self.maxMissed = maxMissed
+        self.lifetime = lifetime
+        self.tracks: List[Track] = []
+        self._nextId = 0
+
+    def update(self, detections: Sequence[Tuple[int, int]], timestamp: float) -> List[Track]:
+        """
+        Match the detections of a new frame to the known cookies.
+
+        :param detections: The (x, y) position of every golden cookie found on the frame.
+        :param timestamp: When the frame was captured, in seconds.
+        :return: The cookies detected on this frame.
+        """
+        pairs = []
+        for i, track in enumerate(self.tracks):
+            px, py = track.predict(timestamp)
+            for j, (x, y) in enumerate(detections):
+                distance = math.hypot(x - px, y - py)
+                if distance <= self.maxDistance:
+                    pairs.append((distance, i, j))
+        # closest pairs first; with cookies kept apart on screen this matches the optimal assignment
+        pairs.sort()
+        matchedTracks, matchedDetections = set(), set()
+        for _, i, j in pairs:
+            if i in matchedTracks or j in matchedDetections:
+                continue
+            matchedTracks.add(i)
+            matchedDetections.add(j)
+            self._correct(self.tracks[i], detections[j], timestamp)
+
+        kept = []
+        for i, track in enumerate(self.tracks):
+            if i not in matchedTracks:
+                track.missed += 1
+                if track.missed >= self.maxMissed:
+                    continue
+            kept.append(track)
+        for j, (x, y) in enumerate(detections):
+            if j not in matchedDetections:
+                kept.append(Track(self._nextId, x, y, timestamp))
+                self._nextId += 1
+        self.tracks = kept
+        return [track for track in self.tracks if not track.missed]
+
+    def _correct(self, track: Track, detection: Tuple[int, int], timestamp: float) -> None:
+        elapsed = timestamp - track.lastSeen
+        if elapsed > 0:
+            vx = (detection[0] - track.x) / elapsed
+            vy = (detection[1] - track.y) / elapsed
+            if track.frames == 1:
+                track.vx, track.vy = vx, vy
+            else:
+                track.vx += self.smoothing * (vx - track.vx)
+                track.vy += self.smoothing * (vy - track.vy)
+        track.x, track.y = detection
+        track.lastSeen = timestamp
+        track.frames += 1
+        track.missed = 0
+
+    def targets(self, timestamp: float, interval: float = 0.0) -> List[Point]:
+        """
+        Decide where to click the cookies detected on the last frame.
+
+        :param timestamp: When the first click will happen, in seconds.
+        :param interval: Seconds between clicks.
+        :return: The predicted position of every cookie at the time it is clicked, shortest-lived first.
+        """
+        visible = sorted((track for track in self.tracks if not track.missed),
+                         key=lambda track: (track.remaining(timestamp, self.lifetime), track.id))
+        points = []
+        for i, track in enumerate(visible):
+            x, y = track.predict(timestamp + i * interval)
+            points.append(Point(int(round(x)), int(round(y))))
+        return points
+
+    def searchRegions(self, timestamp: float) -> List[Box]:
+        """
+        Get the parts of the screen where the cookies detected on the last frame can be by now.
+
+        :param timestamp: The current time, in seconds.
+        :return: One square per cookie, `maxDistance` pixels around its predicted position on every side.
+        """
+        boxes = []
+        for track in self.tracks:
+            if track.missed:
+                continue
+            x, y = track.predict(timestamp)
+            left, top = max(0, int(x - self.maxDistance)), max(0, int(y - self.maxDistance))
+            boxes.append(Box(left, top, int(x + self.maxDistance) - left, int(y + self.maxDistance) - top))
+        return boxes
+
+
+class TrackingEvaluation(NamedTuple):
+    """
+    How well golden cookies on a synthetic screen were clicked.
+    """
+    spawned: int
+    """The amount of cookies that appeared."""
+    clicked: int
+    """The amount of cookies that were clicked before they disappeared."""
+    missedClicks: int
+    """The amount of clicks that hit no cookie."""
+    timesToClick: List[float]
+    """The seconds between a cookie appearing and being clicked, for every clicked cookie."""
+
+    @property
+    def recall(self) -> float:
+        return self.clicked / self.spawned if self.spawned else 1.0
+
+    def __str__(self):
+        if not self.timesToClick:
+            return f"recall {self.recall * 100:.1f}% ({self.clicked}/{self.spawned}), " \
+                   f"{self.missedClicks} missed clicks"
+        times = sorted(self.timesToClick)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        return f"recall {self.recall * 100:.1f}% ({self.clicked}/{self.spawned}), " \
+               f"{self.missedClicks} missed clicks, time to click median {statistics.median(times):.2f}s " \
+               f"p95 {p95:.2f}s"
+
+
+def evaluate(tracker: Optional[GoldenCookieTracker], duration: float = 60.0, spawnRate: float = 0.5,
+             maxSpeed: float = 150.0, maxOcclusion: float = 0.3, lifetime: Tuple[float, float] = (2.0, 13.0),
+             scanInterval: float = 0.1, latency: float = 0.05, clickInterval: float = 0.05,
+             seed: int = 0) -> TrackingEvaluation:
+    """
+    Run the golden cookie clicker against a synthetic screen and compare what it clicked with what was drawn.
+
+    Cookies take `latency` seconds to be clicked after the frame they were found on was captured, and keep
+    moving in the meantime.
+
+    :param tracker: The tracker to click with, or None to click the detections of every frame as they are.
+    :param duration: Seconds of screen time to run for.
+    :param spawnRate: The mean amount of cookies appearing per second.
+    :param maxSpeed: The fastest a cookie moves, in pixels per second.
+    :param maxOcclusion: The largest fraction of a cookie that may be hidden.
+    :param lifetime: The shortest and longest a cookie stays on screen, in seconds.
+    :param scanInterval: Seconds between captures.
+    :param latency: Seconds between a capture and the first click.
+    :param clickInterval: Seconds between clicks.
+    :param seed: The seed of the screen, so strategies can be compared on the same cookies.
+    :return: The evaluation.
+    """
+    # imported here so the tracker itself does not need the detector or the synthetic screen
+    from vision.goldcookie import GOLD_COOKIE_COLOR_1, GOLD_COOKIE_COLOR_2, GoldenCookieDetector
+    from vision.synthetic import SyntheticInputBackend, SyntheticScreen
+
+    screen = SyntheticScreen(seed=seed)
+    backend = SyntheticInputBackend(screen)
+    detector = GoldenCookieDetector((GOLD_COOKIE_COLOR_1, GOLD_COOKIE_COLOR_2))
+    rng = np.random.default_rng(seed)
+    spawned, timesToClick, missedClicks = 0, [], 0
+    while screen.time < duration:
+        if rng.random() < spawnRate * scanInterval:
+            screen.spawnGoldenCookies(1, maxOcclusion=maxOcclusion, maxSpeed=maxSpeed, lifetime=lifetime)
+            spawned += 1
+        started = screen.time
+        frame, _ = screen.render()
+        detections = detector.detect(frame)
+        if tracker is None:
+            points = [Point(x, y) for x, y in detections]
+        else:
+            tracker.update(detections, screen.time)
+            points = tracker.targets(screen.time + latency, clickInterval)
+        if points:
+            screen.advance(latency)
+            for i, point in enumerate(points):
+                if i:
+                    screen.advance(clickInterval)
+                hits = len(backend.hits)
+                backend.click(point, pause=False)
+                if len(backend.hits) > hits:
+                    timesToClick.append(screen.time - backend.hits[-1].spawnedAt)
+                else:
+                    missedClicks += 1
+        screen.advance(max(0.0, started + scanInterval - screen.time))
+    return TrackingEvaluation(spawned, len(timesToClick), missedClicks, timesToClick)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare golden cookie clicking with and without tracking on a "
+                                                 "synthetic screen.")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of screen time per run")
+    parser.add_argument("--speed", type=float, default=250.0, help="fastest cookie speed, in pixels per second")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds from a capture to the first click")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between clicks, for both strategies")
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(format="[%(levelname)s][%(asctime)s] %(message)s", level=logging.INFO,
+                        datefmt="%m/%d/%Y %H:%M:%S")
+    for name, makeTracker in (("single frame", lambda: None), ("tracked", GoldenCookieTracker)):
+        runs = [evaluate(makeTracker(), duration=args.duration, maxSpeed=args.speed, latency=args.latency,
+                         clickInterval=args.interval, seed=seed) for seed in range(args.seeds)]
+        total = TrackingEvaluation(sum(r.spawned for r in runs), sum(r.clicked for r in runs),
+                                   sum(r.missedClicks for r in runs), [t for r in runs for t in r.timesToClick])
+        logging.getLogger("wafer").info(f"{name:12} {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,41 @@
-import base64
 import logging
 import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, timedelta
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Optional
 
-import pyautogui
+import numpy as np
 
 import building as bu
+import controls
 import helpers
+import metrics
+from clicker import MainCookieClicker
 from config import Config
 from garden.garden import Garden
+from garden.scheduler import TendScheduler
+from production import CPSCalculator
+from savestate import SaveState, getSaveState
+from savewatch import SaveWatcher
 from smarket.market import Market
+from tasks import TaskScheduler
+from vision.goldcookie import GOLD_COOKIE_COLOR_1, GOLD_COOKIE_COLOR_2, GoldenCookieDetector
+from vision.templates import Box
+from vision.tracker import GoldenCookieTracker
+
+
+_lockWait = metrics.histogram("wafer_lock_wait_seconds", "Time tasks waited for the screen and input lock.")
+_marketDataAge = metrics.gauge("wafer_market_data_age_seconds",
+                               "How old the save was when the market was last evaluated.")
+_cookiesPerSecond = metrics.gauge("wafer_cookies_per_second", "The cookies per second measured from the save.")
 
 
 class Wafer:
     """
     The main app class. Links all "modules" together and handles initialization.
     """
-    GOLD_COOKIE_COLOR_1 = (193, 155, 71)
-    GOLD_COOKIE_COLOR_2 = (225, 201, 111)
+    GOLD_COOKIE_CLICK_INTERVAL = 0.05
 
     gardenEnabled: bool
     mainAutoClickerEnabled: bool
@@ -31,15 +46,29 @@ class Wafer:
         Initialize the Wafer class with any configuration options. See config file for argument details.
         """
         self.config = config
+        helpers.configureFrames(config)
+        controls.configureInput(config)
+        metrics.configureMetrics(config)
         self.cookieCoords = None
         self.logger = logging.getLogger("wafer")
         self._lock = threading.Lock()
         self.running = True
-        self.mainClickingPaused = False
+        self.clicker = MainCookieClicker(config.mainClickerCPS)
+        self.tasks = TaskScheduler()
+        self.tendScheduler = TendScheduler()
+        self.cpsCalculator = CPSCalculator()
+        self.goldenCookieDetector = GoldenCookieDetector(
+            (GOLD_COOKIE_COLOR_1, GOLD_COOKIE_COLOR_2), tolerance=config.goldenCookieTolerance)
+        self.goldenCookieTracker = GoldenCookieTracker()
+        self._goldenCookieSerial: Optional[int] = None
+        self._lastFullGoldenCookieScan = 0.0
 
         self.buildings: Dict[str, bu.Building] = {}
         self.gardenData = None
         self.marketData = None
+        self.garden: Optional[Garden] = None
+        self.market: Optional[Market] = None
+        self.save = getSaveState(config.saveLocation)
         self.loadSave()
         print("You have 3 seconds to switch windows.")
         time.sleep(3)
@@ -61,34 +90,25 @@ class Wafer:
                 executor.submit(self.clickMainCookie)
             executor.submit(self.runTasks)
 
-    def findGoldenCookies(self) -> List[pyautogui.Point]:
+    def findGoldenCookies(self, frame: Optional[np.ndarray] = None,
+                          regions: Optional[List[Box]] = None) -> List[controls.Point]:
         """
         Search the screen for golden cookies and log their coordinates.
 
-        :return: A list of `pyautogui.Point` objects corresponding to the coordinates of the golden cookies on-screen.
+        :param frame: The frame to search. Defaults to the current frame.
+        :param regions: Only search these parts of the frame. Defaults to the whole frame.
+        :return: A list of `controls.Point` objects corresponding to the coordinates of the golden cookies on-screen.
         :rtype: list
         """
-        coords: List[pyautogui.Point] = []
-        sc = helpers.screenshot()
-
-        # Avoid getting multiple triggers from the same golden cookie
-        restrictions = []
+        if frame is None:
+            frame = helpers.frameProvider().grab()
 
         # Must search using color instead of by image because golden cookies rotate, bounce around,
         # etc. while also sharing the texture with the large normal cookie leading to confusion.
-        for x in range(100, sc.width - 100, 2):
-            for y in range(100, sc.height - 100, 2):
-                pixel = sc.getpixel((x, y))
-                if (pixel == self.GOLD_COOKIE_COLOR_1 or pixel == self.GOLD_COOKIE_COLOR_2)\
-                        and not any([(res[0] < x < res[2]) and (res[1] < y < res[2]) for res in restrictions]):
-                    self.logger.info(f"Located golden cookie at ({x}, {y}).")
-                    coords.append(pyautogui.Point(x=x, y=y))
-                    restrictions.append((
-                        x-100,
-                        y-100,
-                        x+100,
-                        y+100
-                    ))
+        coords: List[controls.Point] = []
+        for x, y in self.goldenCookieDetector.detect(frame, regions):
+            self.logger.info(f"Located golden cookie at ({x}, {y}).")
+            coords.append(controls.Point(x=x, y=y))
         return coords
 
     def clickMainCookie(self) -> None:
@@ -101,7 +121,7 @@ class Wafer:
         """
         self.logger.info("Locating main cookie...")
         for i in range(20):
-            self.cookieCoords = helpers.locate("img/mainCookie.png", confidence=0.5)
+            self.cookieCoords = helpers.locate("mainCookie", confidence=0.5)
             if self.cookieCoords:
                 self.logger.info("Found main cookie.")
                 break
@@ -111,13 +131,13 @@ class Wafer:
         else:
             self.logger.info("Beginning main cookie autoclicker.")
 
-        while self.running and self.mainAutoClickerEnabled:
+        if self.running and self.mainAutoClickerEnabled:
             try:
-                while not self.mainClickingPaused:
-                    pyautogui.click(self.cookieCoords)
-            except pyautogui.FailSafeException:
+                self.clicker.run(self.cookieCoords)
+            except controls.FailSafeException:
                 self.logger.critical("Detected failsafe. Stopping.")
                 self.running = False
+                self.tasks.stop()
 
     def loadSave(self) -> None:
         """
@@ -126,98 +146,167 @@ class Wafer:
         :rtype: None
         """
 
-        with open(self.config.saveLocation, "rb") as file:
-            # Data has a lot of extra information at the end for some reason after the %.
-            data = file.read().split(b"%")[0]
-            missing_padding = len(data) % 4
-            if missing_padding:
-                data += b'=' * (4 - missing_padding)
-            data = str(base64.urlsafe_b64decode(data)).split("|")
-            buildings = data[5].split(";")
-            index = 0
-            for typ in bu.BUILDING_TYPES:
-                building = buildings[index].split(",")
-                bui = typ(int(building[0]), int(building[1]), int(building[2]), int(building[3]),
-                          int(building[6]))
-                self.buildings[bui.name.lower()] = bui
-                index += 1
-            farmBuildingData = buildings[2]
-            self.gardenData = farmBuildingData.split(",")[4]
-
-            bankBuildingData = buildings[5]
-            self.marketData = bankBuildingData.split(",")[4]
+        self.save.refresh()
+        self.buildings = self.save.buildings
+        self.gardenData = self.save.gardenData
+        self.marketData = self.save.marketData
+
+    def getCPS(self) -> Optional[float]:
+        """
+        Get the current cookies per second, measured from the save.
+
+        :return: The CPS, or None until two saves far enough apart have been compared.
+        """
+        return self.cpsCalculator.cps
+
+    def _updateProduction(self, save: SaveState) -> None:
+        """
+        Measure production from a new save and record it.
+
+        :param save: The save the game wrote.
+        """
+        self.cpsCalculator.update(save.buildings, save.modifiedTime)
+        cps = self.getCPS()
+        if cps is not None:
+            _cookiesPerSecond.set(cps)
 
     def runTasks(self) -> None:
         """
-        Decide which features of the bot are enabled and activate the corresponding functions.
-        This function also handles the interval at which each task will be run.
+        Decide which features of the bot are enabled and schedule the corresponding functions.
+        The scheduler sleeps until the next task is due instead of polling.
 
-        - Golden cookies are searched for every second.
-        - Farm is currently managed every minute, but in the future may change depending on soil.
-        Will run in an infinite loop, but will exit if failsafe is detected.
+        - Golden cookies are searched for every `goldenCookieScanInterval` seconds (10 times a second by default).
+        - The garden is checked whenever the game writes a save in which it changed, and tended only when a
+          plant is about to decay. The next time that can happen is predicted from the plants' growth.
+        - The market is evaluated whenever the game writes a save in which it changed.
+        Will run until stopped, but will exit if failsafe is detected.
 
         :rtype: None
         """
-        # TODO: Change tend time based on soil type
-        nextTend = datetime.now()
-        nextGoldenCookieSearch = datetime.now()
-        nextMarketCheck = datetime.now()
-
-        market = Market(self.config, self.marketData, self.buildings)
+        watcher = SaveWatcher(self.save, debounce=self.config.saveWatchDebounce,
+                              pollInterval=self.config.saveWatchPollInterval)
+        if self.config.goldenCookieClickerEnabled:
+            self.tasks.schedule("goldenCookies", self._scanGoldenCookies)
+        if self.config.gardenEnabled:
+            self.tasks.schedule("garden", self._checkGarden)
+            watcher.subscribe("garden", lambda save: self.tasks.runSoon("garden"))
+        if self.config.stockMarketEnabled:
+            # the market opens its trade ledger and price history, so it is only built when it is used
+            self.market = Market(self.config, self.marketData, self.buildings)
+            self.tasks.schedule("market", self._checkMarket)
+            watcher.subscribe("market", lambda save: self.tasks.runSoon("market"))
+        if self.mainAutoClickerEnabled:
+            watcher.subscribe("clicks", lambda save: self.clicker.checkSave(save.cookieClicks, save.modifiedTime))
+        self._updateProduction(self.save)
+        # production grows with every save, so this follows each save the game writes
+        watcher.subscribe("cookies", self._updateProduction)
+        if metrics.registry.enabled:
+            self.tasks.schedule("metrics", self._logMetrics, delay=self.config.metricsLogInterval)
+        watcher.start()
 
         try:
-            while self.running:
-                if self.config.goldenCookieClickerEnabled:
-                    if nextGoldenCookieSearch <= datetime.now():
-                        gCookies = self.findGoldenCookies()
-                        if len(gCookies) > 0:
-                            with self._lock:
-                                self.mainClickingPaused = True
-                                for gCookie in gCookies:
-                                    pyautogui.click(gCookie)
-                                    time.sleep(0.2)
-                                self.mainClickingPaused = False
-                        nextGoldenCookieSearch += timedelta(seconds=1)
-                if self.config.gardenEnabled:
-                    if nextTend <= datetime.now():
-                        with self._lock:
-                            self.loadSave()
-                        nextTend += timedelta(minutes=1)
-                        farmLevel = self.buildings["farm"].level
-                        farm = Garden(self.gardenData, farmLevel)
-                        with self._lock:
-                            self.logger.info("Tending garden.")
-                            self.mainClickingPaused = True
-                            self.tendGarden(farm)
-                            self.mainClickingPaused = False
-                if self.config.stockMarketEnabled:
-                    if nextMarketCheck <= datetime.now():
-                        # [print(stock) for stock in market.stocks]
-                        with self._lock:
-                            self.loadSave()
-                            data = self.marketData.split(" ")
-                            market.updateStocks(data[1].split("!"), self.buildings)
-                            self.mainClickingPaused = True
-                            activity = market.evaluateStocks()
-                            self.mainClickingPaused = False
-
-                        if activity != 0:
-                            # avoid double-buying stocks by ensuring a tick has gone by and the save file has updated
-                            # before the next check
-                            nextMarketCheck += timedelta(minutes=1)
-                        else:
-                            nextMarketCheck += timedelta(seconds=30)
-        except pyautogui.FailSafeException:
+            self.tasks.run(lambda: self.running)
+        except controls.FailSafeException:
             self.logger.critical("Detected failsafe. Stopping.")
             self.running = False
         except Exception as e:
             self.logger.exception("Issue running tasks!")
+        finally:
+            watcher.stop()
+            self.clicker.stop()
+            metrics.registry.close()
+
+    def _scanGoldenCookies(self) -> float:
+        """
+        Click any golden cookies on screen. Cookies are followed across scans, so each one is clicked where it
+        is predicted to be at the time of the click, and the one that appeared first is clicked first.
+        Only the parts of the screen that changed are searched, except for a full search every
+        `fullScanInterval` seconds.
+
+        :return: Seconds until the next scan.
+        :rtype: float
+        """
+        provider = helpers.frameProvider()
+        frame = provider.grab()
+        captured = time.monotonic()
+        serial = provider.changes.serialOf(frame)
+        regions = None
+        if serial is not None and self._goldenCookieSerial is not None \
+                and captured - self._lastFullGoldenCookieScan < self.config.fullScanInterval:
+            # only search where the screen changed since the last scan, and where cookies were last seen
+            regions = provider.changes.regions(since=self._goldenCookieSerial)
+            regions += self.goldenCookieTracker.searchRegions(captured)
+        else:
+            self._lastFullGoldenCookieScan = captured
+        self._goldenCookieSerial = serial
+        gCookies = self.goldenCookieTracker.update(self.findGoldenCookies(frame, regions), captured)
+        if len(gCookies) > 0:
+            with metrics.timedAcquire(self._lock, _lockWait), self.clicker.paused():
+                # cookies keep moving while the lock is acquired, so aim where they will be when clicked
+                targets = self.goldenCookieTracker.targets(time.monotonic(), self.GOLD_COOKIE_CLICK_INTERVAL)
+                controls.clickMany(targets, interval=self.GOLD_COOKIE_CLICK_INTERVAL)
+                helpers.invalidateFrames()
+        return self.config.goldenCookieScanInterval
+
+    def _logMetrics(self) -> float:
+        """
+        Log a summary of the metrics recorded since the last summary.
+
+        :return: Seconds until the next summary.
+        :rtype: float
+        """
+        metrics.registry.logSummary()
+        return self.config.metricsLogInterval
+
+    def _checkGarden(self) -> Optional[float]:
+        """
+        Update the garden from the save and tend it if a plant is about to decay.
+
+        :return: Seconds until a plant is predicted to need tending, or None to wait for the next save.
+        :rtype: float
+        """
+        with metrics.timedAcquire(self._lock, _lockWait):
+            self.loadSave()
+        farmLevel = self.buildings["farm"].level
+        if self.garden is None:
+            self.garden = Garden(self.gardenData, farmLevel)
+        else:
+            self.garden.update(self.gardenData, farmLevel)
+        if any(self.tendScheduler.needsHarvest(plot) for plot in self.garden.plots):
+            with metrics.timedAcquire(self._lock, _lockWait), self.clicker.paused():
+                self.logger.info("Tending garden.")
+                self.tendGarden(self.garden)
+        nextTend = self.tendScheduler.nextActionTime(self.garden)
+        if nextTend is None or nextTend <= datetime.now():
+            # The prediction says a plant is due but the save has not caught up yet,
+            # so wait for the next save instead.
+            return None
+        self.logger.info(f"Next garden action at {nextTend:%H:%M:%S}.")
+        return (nextTend - datetime.now()).total_seconds()
+
+    def _checkMarket(self) -> None:
+        """
+        Update the market from the save and trade.
+
+        :return: None, as the market only changes when the game writes a save.
+        """
+        # [print(stock) for stock in market.stocks]
+        with metrics.timedAcquire(self._lock, _lockWait):
+            self.loadSave()
+            data = self.marketData.split(" ")
+            self.market.updateStocks(data[1].split("!"), self.buildings, self.save.modifiedTime)
+            _marketDataAge.set(time.time() - self.save.modifiedTime)
+            # Stocks bought here are only reflected in the next save, which will trigger
+            # the next evaluation, so nothing is bought twice.
+            with self.clicker.paused():
+                self.market.evaluateStocks()
+        return None
 
     def tendGarden(self, farm: Garden) -> None:
         """
         Manage events occuring inside of the garden minigame.
 
-        Harvest all plants with <= 3 ticks left to live.
+        Harvest all mortal plants with <= 3 ticks left to live.
 
         :param farm: The `Garden` object that represents the current state of the garden.
         :type farm: Garden
@@ -225,28 +314,19 @@ class Wafer:
         """
         # TODO: Add ability to plant crops.
         try:
-            coords = []
-            for plot in farm.plots:
-                if plot.isMature:
-                    if plot.ticksUntilDecay <= 3:
-                        if not farm.farmPlotCoords:
-                            self._openGarden()
-                            coord = farm.getPlotCoords(plot)
-                            self._closeGarden()
-                        else:
-                            coord = farm.getPlotCoords(plot)
-                        if coord:
-                            coords.append([plot, coord])
-            if len(coords) > 0:
-                self._openGarden()
-                for c_data in coords:
-                    plot = c_data[0]
-                    coord = c_data[1]
-                    self.logger.info(
-                        f"Harvesting plot of {plot.data.name} located at ({plot.x}, {plot.y}) due to near-death.")
-                    pyautogui.click(coord)
+            plots = [plot for plot in farm.plots if self.tendScheduler.needsHarvest(plot)]
+            if len(plots) > 0 and self._openGarden():
+                # the grid can only be located while the garden is open, so it is done on the same visit
+                coords = []
+                for plot in plots:
+                    coord = farm.getPlotCoords(plot)
+                    if coord:
+                        self.logger.info(
+                            f"Harvesting plot of {plot.data.name} located at ({plot.x}, {plot.y}) due to near-death.")
+                        coords.append(coord)
+                controls.clickMany(coords)
                 self._closeGarden()
-        except pyautogui.FailSafeException:
+        except controls.FailSafeException:
             return  # handled in the runTasks function anyway since another function would have caught it as well
         except Exception as e:
             self.logger.exception(e)
@@ -263,9 +343,10 @@ class Wafer:
         """
         for i in range(20):
             if self.running:
-                coords = helpers.locate("img/closeGarden.png")
+                coords = helpers.locate("closeGarden")
                 if coords:
-                    pyautogui.click(coords)
+                    controls.click(coords)
+                    helpers.invalidateFrames()
                     return True
         return False
 
@@ -278,9 +359,10 @@ class Wafer:
         """
         for i in range(20):
             if self.running:
-                coords = helpers.locate("img/viewGarden.png", confidence=0.8)
+                coords = helpers.locate("viewGarden", confidence=0.8)
                 if coords:
-                    pyautogui.click(coords)
+                    controls.click(coords)
+                    helpers.invalidateFrames()
                     return True
         return False
 
@@ -295,23 +377,26 @@ class Wafer:
         timesScrolled = 0
         scrollAmount = 250
         point = None
-        cursor = helpers.locate("img/cursor.png")
+        cursor = helpers.locate("cursor")
         while self.running and timesScrolled < 4 and not point:
-            point = helpers.locate(f"img/{name.lower()}.png")
+            point = helpers.locate(name.lower())
             if not point:
-                pyautogui.moveTo(cursor)
-                pyautogui.scroll(-scrollAmount)
+                if cursor:
+                    controls.moveTo(cursor)
+                controls.scroll(-scrollAmount)
+                helpers.invalidateFrames()
                 timesScrolled += 1
         if point:
             x, y = point.x, point.y
             if timesScrolled > 0:
                 # There is an offset that happens for some reason when the window is scrolled
                 y -= scrollAmount * 0.5
-            pyautogui.moveTo(x=x, y=y)
-            pyautogui.click(interval=0.25, clicks=clicks)
+            controls.moveTo(controls.Point(x, y))
+            controls.click(interval=0.25, clicks=clicks)
         if cursor:
-            pyautogui.moveTo(cursor)
-        pyautogui.scroll(scrollAmount*timesScrolled)
+            controls.moveTo(cursor)
+        controls.scroll(scrollAmount*timesScrolled)
+        helpers.invalidateFrames()
         if not point:
             return False
         else: